@@ -1,18 +1,29 @@
+import logging
 import os
-from flask import Flask, request, make_response, send_from_directory
+import tempfile
+from flask import Flask, Response, request, make_response, send_from_directory
 from flask_cors import CORS
 # from app.extensions import db, migrate  # Não necessário para RTA
 from app.config import Config
 
 # Importar routes da API
-from app.routes.api_rta_routes import api_rta_bp
-from app.routes.api_trello_routes import api_trello_bp
+from app.routes.api_rta_routes import api_rta_bp, fila_jobs_rta, rta_service
+from app.routes.api_trello_routes import api_trello_bp, caixa_saida_trello, trello_readiness
+from app.routes.api_vin_routes import api_vin_bp
+from app.util.memoria import relatorio_memoria
+from app.util.logs import configurar_logging
+from app.util.metricas import instrumentar, registro
+
+logger = logging.getLogger(__name__)
 
 def create_app():
     # Configurar caminho absoluto para arquivos estáticos
     static_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
     app = Flask(__name__, static_folder=static_folder, static_url_path='')
     app.config.from_object(Config)
+    configurar_logging(app.config)
+    registro.configurar(app.config.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'auto-rta-metrics'))
+    instrumentar(app)
 
     # Configurar CORS de forma simples e robusta
     CORS(app)
@@ -33,19 +44,28 @@ def create_app():
     # Registrar blueprints da API
     app.register_blueprint(api_rta_bp)
     app.register_blueprint(api_trello_bp)
+    app.register_blueprint(api_vin_bp)
+
+    # A fila de jobs e a caixa de saída do Trello são criadas aqui; as threads de
+    # cada processo são iniciadas pelo post_worker_init do gunicorn ou pelo start.py
+    # (iniciar_rta_jobs e iniciar_trello_outbox)
+    fila_jobs_rta(app.config)
+    if app.config.get('TRELLO_OUTBOX'):
+        caixa_saida_trello(app.config)
+
+    # Pré-carregar os templates RTA para que a primeira requisição não pague o parse do PDF
+    if app.config.get('RTA_WARMUP'):
+        rta_service.warm_up(flatten=app.config.get('RTA_APPEARANCE_MODE') == 'flatten')
     
     # Rota para servir o frontend em produção
     @app.route('/')
     def serve_frontend():
         static_path = app.static_folder
         index_path = os.path.join(static_path, 'index.html')
-        print(f"DEBUG: Static folder: {static_path}")
-        print(f"DEBUG: Index path: {index_path}")
-        print(f"DEBUG: Index exists: {os.path.exists(index_path)}")
-        
         if os.path.exists(index_path):
             return send_from_directory(static_path, 'index.html')
         else:
+            logger.warning('Frontend não encontrado', extra={'index_path': index_path})
             return {'message': 'Frontend not built yet. Run the build script first.', 'status': 'development', 'static_folder': static_path}, 200
     
     @app.route('/<path:path>')
@@ -71,7 +91,21 @@ def create_app():
     # Rota de health check
     @app.route('/api/health')
     def health_check():
-        return {'status': 'ok', 'message': 'Backend API funcionando', 'version': '1.0.0'}
+        # Prontidão do Trello vem do cache do auth-check: o health nunca chama o Trello
+        return {'status': 'ok', 'message': 'Backend API funcionando', 'version': '1.0.0',
+                'trello': trello_readiness(app.config)}
+
+    # Memória única x compartilhada do master e de cada worker do gunicorn; fora
+    # do gunicorn o processo pai (shell, IDE) não entra no relatório
+    @app.route('/api/memory')
+    def memory_report():
+        gunicorn = request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')
+        return relatorio_memoria(os.getppid() if gunicorn else None)
+
+    # Métricas no formato do Prometheus, somadas entre os workers do gunicorn
+    @app.route('/api/metrics')
+    def metrics():
+        return Response(registro.render(), mimetype='text/plain; version=0.0.4')
 
     # Rota de informações da API
     @app.route('/api/info')
@@ -81,7 +115,14 @@ def create_app():
             'version': '1.0.0',
             'endpoints': {
                 'rta': '/api/rta',
-                'trello': '/api/trello'
+                'rta_batch': '/api/rta/batch',
+                'rta_jobs': '/api/rta/jobs',
+                'trello': '/api/trello',
+                'trello_batch': '/api/trello/batch',
+                'trello_outbox': '/api/trello/outbox',
+                'vin': '/api/vin/<vin>',
+                'vin_batch': '/api/vin/batch',
+                'metrics': '/api/metrics'
             }
         }
 
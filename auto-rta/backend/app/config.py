@@ -17,7 +17,109 @@ class Config:
     
     # Configurações de upload/download
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+    # Templates RTA: carregar todos na criação do app (RTA_WARMUP=false desliga)
+    RTA_WARMUP = os.getenv("RTA_WARMUP", "True").lower() in ['true', '1', 'yes']
+    # Saída do PDF: 'full' reescreve o documento, 'incremental' anexa só os campos
+    # alterados ao template original (sobrescrito por ?output= na requisição)
+    RTA_OUTPUT_MODE = os.getenv("RTA_OUTPUT_MODE", "full").lower()
+    # Aparência dos campos: 'viewer' (NeedAppearances), 'server' (gerada no servidor)
+    # ou 'flatten' (desenhada na página, PDF não editável); sobrescrito por ?appearance=
+    RTA_APPEARANCE_MODE = os.getenv("RTA_APPEARANCE_MODE", "viewer").lower()
+    # Número máximo de registros aceitos por /api/rta/batch
+    RTA_BATCH_MAX_RECORDS = int(os.getenv("RTA_BATCH_MAX_RECORDS", "500"))
+    # Pool de processos para preencher PDFs (0 = preencher na thread da requisição)
+    RTA_POOL_WORKERS = int(os.getenv("RTA_POOL_WORKERS", "0"))
+    # Reciclar cada processo do pool após N preenchimentos (0 = nunca)
+    RTA_POOL_MAX_TASKS_PER_CHILD = int(os.getenv("RTA_POOL_MAX_TASKS_PER_CHILD", "0"))
+    # Cache de RTAs gerados (MB em memória por processo; 0 desliga) e nível opcional em disco
+    RTA_CACHE_MAX_MB = int(os.getenv("RTA_CACHE_MAX_MB", "64"))
+    RTA_CACHE_DIR = os.getenv("RTA_CACHE_DIR")
+    RTA_CACHE_DISK_MAX_MB = int(os.getenv("RTA_CACHE_DISK_MAX_MB", "512"))
+    # Fila assíncrona /api/rta/jobs: diretório do SQLite e dos PDFs (padrão no tmp do
+    # sistema), threads por processo, tempo de vida dos resultados e limite da fila
+    RTA_JOBS_DIR = os.getenv("RTA_JOBS_DIR")
+    RTA_JOBS_WORKERS = int(os.getenv("RTA_JOBS_WORKERS", "2"))
+    RTA_JOBS_TTL_SECONDS = int(os.getenv("RTA_JOBS_TTL_SECONDS", "3600"))
+    RTA_JOBS_MAX_QUEUED = int(os.getenv("RTA_JOBS_MAX_QUEUED", "1000"))
+    
+    # Logs: nível, formato ('json' estruturado ou 'text' para desenvolvimento),
+    # fração dos registros DEBUG mantidos e tamanho da fila do handler assíncrono
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    
+    # Métricas (/api/metrics): diretório onde cada worker do gunicorn grava seu
+    # snapshot para a agregação (padrão no tmp do sistema)
+    METRICS_DIR = os.getenv("METRICS_DIR")
     
+    # Conexões com a API do Trello (pool keep-alive por processo): conexões mantidas
+    # por host, tentativas em falha de conexão/5xx, fator do backoff exponencial e
+    # segundos ociosos até o TCP keep-alive testar a conexão (0 = padrão do sistema)
+    TRELLO_POOL_MAXSIZE = int(os.getenv("TRELLO_POOL_MAXSIZE", "10"))
+    TRELLO_RETRIES = int(os.getenv("TRELLO_RETRIES", "3"))
+    TRELLO_RETRY_BACKOFF = float(os.getenv("TRELLO_RETRY_BACKOFF", "0.3"))
+    TRELLO_KEEPALIVE_IDLE = int(os.getenv("TRELLO_KEEPALIVE_IDLE", "60"))
+    # Limitador de requisições do Trello (token bucket compartilhado pelos workers via
+    # arquivos em TRELLO_RATE_DIR): limites por API key e por token na janela (segundos),
+    # rajada permitida e espera máxima por uma vez antes de desistir (LimiteExcedido)
+    TRELLO_RATE_LIMIT = os.getenv("TRELLO_RATE_LIMIT", "True").lower() in ['true', '1', 'yes']
+    TRELLO_RATE_DIR = os.getenv("TRELLO_RATE_DIR")
+    TRELLO_RATE_LIMIT_KEY = int(os.getenv("TRELLO_RATE_LIMIT_KEY", "300"))
+    TRELLO_RATE_LIMIT_TOKEN = int(os.getenv("TRELLO_RATE_LIMIT_TOKEN", "100"))
+    TRELLO_RATE_WINDOW = float(os.getenv("TRELLO_RATE_WINDOW", "10"))
+    TRELLO_RATE_BURST = int(os.getenv("TRELLO_RATE_BURST", "10"))
+    TRELLO_RATE_MAX_WAIT = float(os.getenv("TRELLO_RATE_MAX_WAIT", "30"))
+    # Anexos enviados em paralelo por card (1 = um de cada vez)
+    TRELLO_ATTACHMENT_CONCURRENCY = int(os.getenv("TRELLO_ATTACHMENT_CONCURRENCY", "4"))
+    # Cache do /api/trello/auth-check (e da prontidão no /api/health): segundos em que
+    # o resultado vale, limite para servir o antigo enquanto atualiza em segundo plano
+    # e arquivo compartilhado entre os workers (padrão no tmp do sistema)
+    TRELLO_AUTH_CHECK_TTL = int(os.getenv("TRELLO_AUTH_CHECK_TTL", "60"))
+    TRELLO_AUTH_CHECK_MAX_STALE = int(os.getenv("TRELLO_AUTH_CHECK_MAX_STALE", "600"))
+    TRELLO_AUTH_CHECK_FILE = os.getenv("TRELLO_AUTH_CHECK_FILE")
+    # /api/trello/batch: leads aceitos por lote e cards criados ao mesmo tempo
+    TRELLO_BATCH_MAX_LEADS = int(os.getenv("TRELLO_BATCH_MAX_LEADS", "500"))
+    TRELLO_BATCH_CONCURRENCY = int(os.getenv("TRELLO_BATCH_CONCURRENCY", "4"))
+    # Caixa de saída do /api/trello (desligada: o card é criado na própria requisição, 201;
+    # ligada: 202 e entrega em segundo plano): diretório do SQLite e dos anexos (num disco
+    # efêmero as entregas pendentes se perdem no redeploy: use um volume persistente),
+    # threads entregadoras por processo, limite de entregas pendentes, tentativas,
+    # backoff inicial (dobra a cada tentativa) e tempo de vida das entregues
+    TRELLO_OUTBOX = os.getenv("TRELLO_OUTBOX", "False").lower() in ['true', '1', 'yes']
+    TRELLO_OUTBOX_DIR = os.getenv("TRELLO_OUTBOX_DIR")
+    TRELLO_OUTBOX_WORKERS = int(os.getenv("TRELLO_OUTBOX_WORKERS", "2"))
+    TRELLO_OUTBOX_MAX_PENDING = int(os.getenv("TRELLO_OUTBOX_MAX_PENDING", "1000"))
+    TRELLO_OUTBOX_MAX_ATTEMPTS = int(os.getenv("TRELLO_OUTBOX_MAX_ATTEMPTS", "8"))
+    TRELLO_OUTBOX_BACKOFF_SECONDS = float(os.getenv("TRELLO_OUTBOX_BACKOFF_SECONDS", "5"))
+    TRELLO_OUTBOX_TTL_SECONDS = int(os.getenv("TRELLO_OUTBOX_TTL_SECONDS", str(7 * 86400)))
+    # Repassar as imagens do multipart ao Trello enquanto chegam, sem spool nem caixa de
+    # saída (sobrescrito por ?stream=), e o buffer máximo por anexo em envio (KB)
+    TRELLO_STREAM_UPLOADS = os.getenv("TRELLO_STREAM_UPLOADS", "False").lower() in ['true', '1', 'yes']
+    TRELLO_STREAM_BUFFER_KB = int(os.getenv("TRELLO_STREAM_BUFFER_KB", "256"))
+    # Recompressão das fotos anexadas (requer Pillow; pillow-heif para HEIC): lado
+    # máximo em pixels, qualidade JPEG e threads do pool de imagens por processo
+    TRELLO_IMAGE_RECOMPRESS = os.getenv("TRELLO_IMAGE_RECOMPRESS", "True").lower() in ['true', '1', 'yes']
+    TRELLO_IMAGE_MAX_DIM = int(os.getenv("TRELLO_IMAGE_MAX_DIM", "2048"))
+    TRELLO_IMAGE_QUALITY = int(os.getenv("TRELLO_IMAGE_QUALITY", "82"))
+    TRELLO_IMAGE_WORKERS = int(os.getenv("TRELLO_IMAGE_WORKERS", "2"))
+
+    # Decodificação de VIN (/api/vin): API vPIC do NHTSA (aponte para um stand-in nos
+    # testes), cache em disco (SQLite) e em memória (VINs), validade do cache (e dos VINs
+    # não decodificados, só em memória), VINs por chamada ao DecodeVINValuesBatch
+    # (máx. 50), espera para juntar consultas simultâneas, chamadas ao NHTSA ao mesmo
+    # tempo e VINs aceitos por /api/vin/batch
+    NHTSA_API_BASE = os.getenv("NHTSA_API_BASE", "https://vpic.nhtsa.dot.gov/api/vehicles")
+    VIN_CACHE_DIR = os.getenv("VIN_CACHE_DIR")
+    VIN_CACHE_SIZE = int(os.getenv("VIN_CACHE_SIZE", "2048"))
+    VIN_CACHE_TTL_SECONDS = int(os.getenv("VIN_CACHE_TTL_SECONDS", str(30 * 86400)))
+    VIN_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("VIN_CACHE_NEGATIVE_TTL_SECONDS", "3600"))
+    VIN_BATCH_SIZE = int(os.getenv("VIN_BATCH_SIZE", "50"))
+    VIN_BATCH_WINDOW_MS = int(os.getenv("VIN_BATCH_WINDOW_MS", "20"))
+    VIN_DECODE_WORKERS = int(os.getenv("VIN_DECODE_WORKERS", "2"))
+    VIN_BATCH_MAX = int(os.getenv("VIN_BATCH_MAX", "500"))
+
     # Configurações do Trello (se necessário)
     TRELLO_API_KEY = os.getenv("TRELLO_API_KEY")
     TRELLO_API_TOKEN = os.getenv("TRELLO_API_TOKEN")
@@ -1,11 +1,107 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, url_for
+from werkzeug.utils import secure_filename
 from app.services.rta_service import RTAService
+from app.services.rta_pool import get_rta_pool
+from app.services.rta_cache import get_rta_cache, rta_cache_key
+from app.services.rta_appearance import APPEARANCE_MODES
+from app.services.rta_jobs import get_rta_jobs
+from app.services.rta_schema import INSURANCE_COMPANIES, rta_validator
+from app.util.metricas import medir
+from concurrent.futures import Future
+from collections import deque
+import gzip
 import io
+import json
+import logging
+import unicodedata
+import zipfile
+from urllib.parse import quote
 from datetime import datetime
 
 api_rta_bp = Blueprint('api_rta', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
 rta_service = RTAService()
 
+
+def _validar_rta(data):
+    """
+    Regras de validação do /api/rta (campos obrigatórios do RTA_SCHEMA e seguradora)
+    :return: dict com o erro (corpo da resposta 400) ou None se válido
+    """
+    if not isinstance(data, dict):
+        return {'error': 'Dados não fornecidos'}
+
+    missing_fields = rta_validator.missing(data)
+    if missing_fields:
+        return {
+            'error': 'Campos obrigatórios faltando',
+            'missing_fields': missing_fields
+        }
+
+    # Validar seguradora
+    if data.get('insurance_company') not in INSURANCE_COMPANIES:
+        return {
+            'error': 'Seguradora deve ser "allstate", "progressive", "geico" ou "liberty"'
+        }
+    return None
+
+
+def _preparar_rta(data):
+    """Combina endereços separados em campos únicos para compatibilidade com o serviço"""
+    if all(key in data for key in ['owner_street', 'owner_city', 'owner_state', 'owner_zipcode']):
+        data['owner_residential_address'] = f"{data['owner_street']}, {data['owner_city']}, {data['owner_state']}, {data['owner_zipcode']}"
+    
+    if all(key in data for key in ['seller_street', 'seller_city', 'seller_state', 'seller_zipcode']):
+        data['seller_address'] = f"{data['seller_street']}, {data['seller_city']}, {data['seller_state']}, {data['seller_zipcode']}"
+
+
+def _nome_arquivo_rta(data):
+    return f'rta_{data.get("insurance_company")}_{data.get("owner_name", "documento").replace(" ", "_")}.pdf'
+
+
+def _submeter_rta(pool, data, incremental, appearance):
+    """Future com os bytes do PDF: no pool de processos, se configurado, ou na própria thread"""
+    if pool is not None:
+        return pool.submit(data, incremental, appearance)
+    future = Future()
+    try:
+        future.set_result(rta_service.preencher_rta(data, incremental=incremental, appearance=appearance).getvalue())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _content_disposition(response, download_name):
+    """Content-Disposition de download (mesma regra do send_file para nomes não-ASCII)"""
+    simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+    if simple == download_name:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    else:
+        quoted = quote(download_name, safe="!#$&+^`|~")
+        response.headers.set('Content-Disposition', 'attachment', filename=simple, **{'filename*': f"UTF-8''{quoted}"})
+
+
+def _output_mode():
+    """Modo de saída: ?output=incremental|full (padrão em RTA_OUTPUT_MODE)"""
+    return request.args.get('output') or current_app.config.get('RTA_OUTPUT_MODE', 'full')
+
+
+def _appearance_mode():
+    """Aparência dos campos: ?appearance=viewer|server|flatten (padrão em RTA_APPEARANCE_MODE)"""
+    return request.args.get('appearance') or current_app.config.get('RTA_APPEARANCE_MODE', 'viewer')
+
+
+def _validar_modos(output_mode, appearance):
+    """Retorna dict de erro para combinações inválidas de ?output= e ?appearance="""
+    if output_mode not in ['full', 'incremental']:
+        return {'error': 'output deve ser "full" ou "incremental"'}
+    if appearance not in APPEARANCE_MODES:
+        return {'error': 'appearance deve ser "viewer", "server" ou "flatten"'}
+    if appearance == 'flatten' and output_mode == 'incremental':
+        return {'error': 'appearance "flatten" requer output "full"'}
+    return None
+
+
 @api_rta_bp.route('/rta', methods=['POST'])
 def generate_rta():
     """
@@ -32,229 +128,304 @@ def generate_rta():
         if not data:
             return jsonify({'error': 'Dados não fornecidos'}), 400
         
-        # Validar campos obrigatórios base
-        required_fields = [
-            'insurance_company', 'owner_name', 'owner_dob', 'owner_license', 
-            'owner_street', 'owner_city', 'owner_state', 'owner_zipcode', 'owner_license_issued_state',
-            'vin', 'body_style', 'color', 'year', 'make', 'model', 'cylinders', 'passengers', 'doors', 'odometer',
-            'seller_name', 'seller_street', 'seller_city', 'seller_state', 'seller_zipcode',
-            'gross_sale_price', 'purchase_date', 'insurance_effective_date', 'insurance_policy_change_date',
-            'vehicle_financing_status'
-        ]
-        
-        # Se o veículo for quitado, adicionar campos do título anterior como obrigatórios
-        if data.get('vehicle_financing_status') == 'paid_off':
-            required_fields.extend(['previous_title_number', 'previous_title_state', 'previous_title_country'])
-        
-        missing_fields = []
-        
-        for field in required_fields:
-            if field not in data or (data[field] == '' or data[field] is None):
-                missing_fields.append(field)
-        
-        if missing_fields:
-            return jsonify({
-                'error': 'Campos obrigatórios faltando',
-                'missing_fields': missing_fields
-            }), 400
-        
-        # Validar seguradora
-        if data.get('insurance_company') not in ['allstate', 'progressive', 'geico', 'liberty']:
-            return jsonify({
-                'error': 'Seguradora deve ser "allstate", "progressive", "geico" ou "liberty"'
-            }), 400
-        
-        # Combinar endereços separados em campos únicos para compatibilidade com o serviço
-        if all(key in data for key in ['owner_street', 'owner_city', 'owner_state', 'owner_zipcode']):
-            data['owner_residential_address'] = f"{data['owner_street']}, {data['owner_city']}, {data['owner_state']}, {data['owner_zipcode']}"
-        
-        if all(key in data for key in ['seller_street', 'seller_city', 'seller_state', 'seller_zipcode']):
-            data['seller_address'] = f"{data['seller_street']}, {data['seller_city']}, {data['seller_state']}, {data['seller_zipcode']}"
+        erro = _validar_rta(data)
+        if erro:
+            return jsonify(erro), 400
+        _preparar_rta(data)
         
+        output_mode = _output_mode()
+        appearance = _appearance_mode()
+        erro = _validar_modos(output_mode, appearance)
+        if erro:
+            return jsonify(erro), 400
+
         # Gerar PDF
-        pdf_io = rta_service.preencher_rta(data)
+        incremental = output_mode == 'incremental'
+        pool = get_rta_pool(current_app.config)
+        cache = get_rta_cache(current_app.config)
+        cache_status = None
+        if cache is not None:
+            # Mesmo payload + mesmo template => mesmos bytes; a chave serve de ETag
+            key = rta_cache_key(data, output_mode, rta_service.template_checksum(data['insurance_company']), appearance)
+            if key in request.if_none_match:
+                response = Response(status=304)
+                response.set_etag(key)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            if pool is not None:
+                body, hit = cache.get_or_create(key, lambda: _submeter_rta(pool, data, incremental, appearance).result())
+                tamanho = len(body)
+            else:
+                # Na falta, a resposta envia as partes do render; o cache guarda o arquivo montado
+                def render():
+                    documento = rta_service.preparar_rta(data)
+                    with medir('serialize'):
+                        return documento.render(incremental, appearance)
+                tamanho, body, hit = cache.get_or_stream(key, render)
+            cache_status = 'HIT' if hit else 'MISS'
+        elif pool is not None:
+            # O pool devolve o PDF pronto em bytes; a resposta usa o mesmo objeto, sem cópia
+            with medir('pool'):
+                body = pool.submit(data, incremental, appearance).result()
+            tamanho = len(body)
+        else:
+            # Envia as partes do PDF (blocos pré-serializados do template) conforme
+            # são geradas, sem montar o arquivo inteiro num buffer
+            documento = rta_service.preparar_rta(data)
+            with medir('serialize'):
+                tamanho, body = documento.render(incremental, appearance)
+
+        response = Response(body, mimetype='application/pdf')
+        response.headers['Content-Length'] = str(tamanho)
+        _content_disposition(response, _nome_arquivo_rta(data))
+        if cache_status:
+            response.set_etag(key)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.headers['X-RTA-Cache'] = cache_status
+        return response
         
+    except Exception as e:
+        logger.exception('Erro ao gerar RTA')
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+class _ZipStream(io.RawIOBase):
+    """Destino não-seekable do ZipFile: acumula bytes até serem drenados para a resposta"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _ler_lote_rta():
+    """
+    Lê o corpo do /api/rta/batch: lista JSON ou {"records": [...]}, opcionalmente
+    comprimido com gzip (Content-Encoding: gzip ou Content-Type: application/gzip)
+    """
+    raw = request.get_data()
+    ct = request.content_type or ''
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip' or 'gzip' in ct:
+        limite = current_app.config.get('MAX_CONTENT_LENGTH') or 16 * 1024 * 1024
+        with gzip.GzipFile(fileobj=io.BytesIO(raw)) as gz:
+            raw = gz.read(limite + 1)
+        if len(raw) > limite:
+            raise ValueError('Lote descomprimido excede o tamanho máximo permitido')
+    payload = json.loads(raw or b'null')
+    if isinstance(payload, dict):
+        payload = payload.get('records')
+    if not isinstance(payload, list):
+        raise ValueError('Envie uma lista de registros ou {"records": [...]}')
+    return payload
+
+
+@api_rta_bp.route('/rta/batch', methods=['POST'])
+def generate_rta_batch():
+    """
+    Gera vários RTAs de uma vez e devolve um ZIP em streaming
+
+    Cada registro segue o mesmo formato e as mesmas regras do /api/rta. Registros
+    inválidos ou com erro não interrompem o lote: aparecem no manifest.json do ZIP.
+    """
+    try:
+        records = _ler_lote_rta()
+    except (ValueError, OSError, EOFError) as e:
+        return jsonify({'error': f'Lote inválido: {str(e)}'}), 400
+
+    max_records = current_app.config.get('RTA_BATCH_MAX_RECORDS', 500)
+    if not records:
+        return jsonify({'error': 'Dados não fornecidos'}), 400
+    if len(records) > max_records:
+        return jsonify({'error': f'Máximo de {max_records} registros por lote'}), 413
+
+    output_mode = _output_mode()
+    appearance = _appearance_mode()
+    erro = _validar_modos(output_mode, appearance)
+    if erro:
+        return jsonify(erro), 400
+    incremental = output_mode == 'incremental'
+
+    pool = get_rta_pool(current_app.config)
+    # Com pool, mantém alguns registros em andamento por processo; sem pool, um de cada vez
+    janela = pool.workers * 2 if pool is not None else 1
+
+    def generate():
+        sink = _ZipStream()
+        manifest = []
+        pendentes = deque()
+
+        def escrever(zf, index, data, future):
+            entry = {'index': index}
+            try:
+                pdf_bytes = future.result()
+                nome = f'{index:04d}_{secure_filename(_nome_arquivo_rta(data))}'
+                zf.writestr(nome, pdf_bytes)
+                entry.update({'status': 'ok', 'file': nome})
+            except Exception as e:
+                logger.exception('Erro ao gerar RTA do lote', extra={'record': index})
+                entry.update({'status': 'error', 'error': f'Erro interno: {str(e)}'})
+            manifest.append(entry)
+            return sink.drain()
+
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for index, data in enumerate(records):
+                erro = _validar_rta(data)
+                if erro:
+                    manifest.append({'index': index, 'status': 'error', **erro})
+                    continue
+                _preparar_rta(data)
+                pendentes.append((index, data, _submeter_rta(pool, data, incremental, appearance)))
+                while len(pendentes) >= janela:
+                    chunk = escrever(zf, *pendentes.popleft())
+                    if chunk:
+                        yield chunk
+            while pendentes:
+                chunk = escrever(zf, *pendentes.popleft())
+                if chunk:
+                    yield chunk
+            manifest.sort(key=lambda m: m['index'])
+            zf.writestr('manifest.json', json.dumps({
+                'total': len(records),
+                'ok': sum(1 for m in manifest if m['status'] == 'ok'),
+                'errors': sum(1 for m in manifest if m['status'] == 'error'),
+                'records': manifest
+            }, ensure_ascii=False, indent=2))
+        yield sink.drain()
+
+    return Response(
+        generate(),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=rta_batch.zip'}
+    )
+
+
+def fila_jobs_rta(config):
+    """Fila de jobs de RTA do processo (também criada pelo create_app)"""
+
+    def gerar(params):
+        incremental = params['output'] == 'incremental'
+        return _submeter_rta(get_rta_pool(config), params['data'], incremental, params['appearance']).result()
+
+    return get_rta_jobs(config, gerar)
+
+
+def _job_json(job):
+    """Representação pública de um job da fila"""
+    def iso(ts):
+        return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+    resposta = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'created_at': iso(job['created']),
+        'started_at': iso(job['started']),
+        'finished_at': iso(job['finished']),
+        'queue_ms': round((job['started'] - job['created']) * 1000, 1) if job['started'] else None,
+        'run_ms': round((job['finished'] - job['started']) * 1000, 1) if job['finished'] and job['started'] else None,
+        'status_url': url_for('api_rta.get_rta_job', job_id=job['id']),
+    }
+    if job['status'] == 'done':
+        resposta.update({
+            'size': job['size'],
+            'download_url': url_for('api_rta.download_rta_job', job_id=job['id']),
+        })
+    if job['error']:
+        resposta['error'] = job['error']
+    return resposta
+
+
+@api_rta_bp.route('/rta/jobs', methods=['POST'])
+def create_rta_job():
+    """
+    Enfileira a geração de um RTA e responde na hora com o id do job (202)
+
+    Mesmo payload e parâmetros (?output=, ?appearance=) do /api/rta. Acompanhe
+    em GET /api/rta/jobs/<id> e baixe o PDF em /api/rta/jobs/<id>/download.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Dados não fornecidos'}), 400
+
+    erro = _validar_rta(data)
+    if erro:
+        return jsonify(erro), 400
+    _preparar_rta(data)
+
+    output_mode = _output_mode()
+    appearance = _appearance_mode()
+    erro = _validar_modos(output_mode, appearance)
+    if erro:
+        return jsonify(erro), 400
+
+    fila = fila_jobs_rta(current_app.config)
+    job = fila.submit({'data': data, 'output': output_mode, 'appearance': appearance}, _nome_arquivo_rta(data))
+    if job is None:
+        response = jsonify({'error': 'Fila de RTAs cheia, tente novamente em instantes'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    response = jsonify(_job_json(job))
+    response.headers['Location'] = url_for('api_rta.get_rta_job', job_id=job['id'])
+    return response, 202
+
+
+@api_rta_bp.route('/rta/jobs', methods=['GET'])
+def get_rta_jobs_stats():
+    """Profundidade da fila e latência (espera e execução) dos jobs recentes"""
+    return jsonify(fila_jobs_rta(current_app.config).stats())
+
+
+@api_rta_bp.route('/rta/jobs/<job_id>', methods=['GET'])
+def get_rta_job(job_id):
+    """Status de um job de RTA"""
+    job = fila_jobs_rta(current_app.config).get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    return jsonify(_job_json(job))
+
+
+@api_rta_bp.route('/rta/jobs/<job_id>/download', methods=['GET'])
+def download_rta_job(job_id):
+    """PDF gerado por um job concluído"""
+    fila = fila_jobs_rta(current_app.config)
+    job = fila.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    if job['status'] != 'done':
+        return jsonify(_job_json(job)), 409
+    try:
         return send_file(
-            pdf_io,
+            fila.result_path(job_id),
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=f'rta_{data.get("insurance_company")}_{data.get("owner_name", "documento").replace(" ", "_")}.pdf'
+            download_name=job['filename'],
+            etag=job_id,
         )
-        
-    except Exception as e:
-        print(f"Erro ao gerar RTA: {str(e)}")
-        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+    except FileNotFoundError:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
 
 @api_rta_bp.route('/rta/fields', methods=['GET'])
 def get_rta_fields():
     """
-    Retorna a estrutura dos campos necessários para o RTA
+    Retorna a estrutura dos campos necessários para o RTA (gerada do RTA_SCHEMA
+    e serializada uma única vez; revalidação via ETag)
     """
-    fields = {
-        'required': [
-            {
-                'name': 'owner_name',
-                'type': 'string',
-                'label': 'Nome do Proprietário',
-                'placeholder': 'Sobrenome, Nome, Nome do Meio',
-                'validation': 'required'
-            },
-            {
-                'name': 'owner_dob',
-                'type': 'date',
-                'label': 'Data de Nascimento',
-                'placeholder': 'YYYY-MM-DD',
-                'validation': 'required'
-            },
-            {
-                'name': 'owner_license',
-                'type': 'string',
-                'label': 'CNH/Driver License',
-                'placeholder': 'Número da carteira de motorista',
-                'validation': 'required'
-            },
-            {
-                'name': 'owner_residential_address',
-                'type': 'string',
-                'label': 'Endereço Residencial',
-                'placeholder': 'Rua Número, Cidade, Estado, CEP',
-                'validation': 'required'
-            },
-            {
-                'name': 'vin',
-                'type': 'string',
-                'label': 'VIN',
-                'placeholder': '17 caracteres',
-                'validation': 'required|length:17'
-            },
-            {
-                'name': 'body_style',
-                'type': 'string',
-                'label': 'Tipo de Carroceria',
-                'placeholder': 'Ex: Sedan, SUV, Hatchback',
-                'validation': 'required'
-            },
-            {
-                'name': 'color',
-                'type': 'select',
-                'label': 'Cor',
-                'options': [
-                    'Black', 'White', 'Brown', 'Blue', 'Yellow', 'Gray',
-                    'Purple', 'Green', 'Orange', 'Red', 'Silver', 'Gold'
-                ],
-                'validation': 'required'
-            },
-            {
-                'name': 'year',
-                'type': 'number',
-                'label': 'Ano',
-                'placeholder': '2024',
-                'validation': 'required|min:1900|max:2030'
-            },
-            {
-                'name': 'make',
-                'type': 'string',
-                'label': 'Marca',
-                'placeholder': 'Ex: Toyota, Honda, Ford',
-                'validation': 'required'
-            },
-            {
-                'name': 'model',
-                'type': 'string',
-                'label': 'Modelo',
-                'placeholder': 'Ex: Corolla, Civic, Focus',
-                'validation': 'required'
-            }
-        ],
-        'optional': [
-            {
-                'name': 'owner_license_issued_state',
-                'type': 'string',
-                'label': 'Estado Emissor da CNH',
-                'placeholder': 'Ex: MA, CA, FL'
-            },
-            {
-                'name': 'gross_sale_price',
-                'type': 'string',
-                'label': 'Preço de Venda',
-                'placeholder': 'Ex: $25,000'
-            },
-            {
-                'name': 'purchase_date',
-                'type': 'date',
-                'label': 'Data de Compra',
-                'placeholder': 'YYYY-MM-DD'
-            },
-            {
-                'name': 'insurance_effective_date',
-                'type': 'date',
-                'label': 'Data Início do Seguro',
-                'placeholder': 'YYYY-MM-DD'
-            },
-            {
-                'name': 'insurance_policy_change_date',
-                'type': 'date',
-                'label': 'Data Alteração da Apólice',
-                'placeholder': 'YYYY-MM-DD'
-            },
-            {
-                'name': 'seller_name',
-                'type': 'string',
-                'label': 'Nome do Vendedor',
-                'placeholder': 'Nome completo do vendedor'
-            },
-            {
-                'name': 'seller_address',
-                'type': 'string',
-                'label': 'Endereço do Vendedor',
-                'placeholder': 'Endereço completo do vendedor'
-            },
-            {
-                'name': 'odometer',
-                'type': 'number',
-                'label': 'Quilometragem',
-                'placeholder': 'Milhas no odômetro'
-            },
-            {
-                'name': 'cylinders',
-                'type': 'number',
-                'label': 'Cilindros',
-                'placeholder': 'Número de cilindros do motor'
-            },
-            {
-                'name': 'passengers',
-                'type': 'number',
-                'label': 'Passageiros',
-                'placeholder': 'Número de passageiros'
-            },
-            {
-                'name': 'doors',
-                'type': 'number',
-                'label': 'Portas',
-                'placeholder': 'Número de portas'
-            },
-            {
-                'name': 'previous_title_number',
-                'type': 'string',
-                'label': 'Número do Título Anterior',
-                'placeholder': 'Número do título anterior'
-            },
-            {
-                'name': 'previous_title_state',
-                'type': 'string',
-                'label': 'Estado do Título Anterior',
-                'placeholder': 'Estado emissor do título anterior'
-            },
-            {
-                'name': 'previous_title_country',
-                'type': 'string',
-                'label': 'País do Título Anterior',
-                'placeholder': 'País emissor do título anterior'
-            }
-        ]
-    }
-    
-    return jsonify(fields)
+    if rta_validator.fields_etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(rta_validator.fields_json, mimetype='application/json')
+    response.set_etag(rta_validator.fields_etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
 
 @api_rta_bp.route('/rta/validate', methods=['POST'])
 def validate_rta_data():
@@ -264,56 +435,11 @@ def validate_rta_data():
     try:
         data = request.get_json()
         
-        if not data:
+        if not data or not isinstance(data, dict):
             return jsonify({'error': 'Dados não fornecidos'}), 400
         
-        errors = []
-        warnings = []
-        
-        # Validar campos obrigatórios
-        required_fields = [
-            'owner_name', 'owner_dob', 'owner_license', 'owner_residential_address',
-            'vin', 'body_style', 'color', 'year', 'make', 'model'
-        ]
-        
-        for field in required_fields:
-            if field not in data or not data[field]:
-                errors.append(f'Campo obrigatório: {field}')
-        
-        # Validar VIN
-        if 'vin' in data and data['vin']:
-            if len(str(data['vin'])) != 17:
-                errors.append('VIN deve ter exatamente 17 caracteres')
-        
-        # Validar ano
-        if 'year' in data and data['year']:
-            try:
-                year = int(data['year'])
-                if year < 1900 or year > 2030:
-                    errors.append('Ano deve estar entre 1900 e 2030')
-            except (ValueError, TypeError):
-                errors.append('Ano deve ser um número válido')
-        
-        # Validar datas
-        date_fields = ['owner_dob', 'purchase_date', 'insurance_effective_date', 'insurance_policy_change_date']
-        for field in date_fields:
-            if field in data and data[field]:
-                try:
-                    datetime.strptime(data[field], '%Y-%m-%d')
-                except ValueError:
-                    errors.append(f'Data inválida para {field}. Use formato YYYY-MM-DD')
-        
-        # Validar cor
-        valid_colors = ['Black', 'White', 'Brown', 'Blue', 'Yellow', 'Gray', 'Purple', 'Green', 'Orange', 'Red', 'Silver', 'Gold']
-        if 'color' in data and data['color'] not in valid_colors:
-            errors.append(f'Cor inválida. Cores válidas: {", ".join(valid_colors)}')
-        
-        # Avisos para campos opcionais importantes
-        optional_important = ['odometer', 'cylinders', 'passengers', 'doors']
-        for field in optional_important:
-            if field not in data or not data[field]:
-                warnings.append(f'Campo opcional mas recomendado: {field}')
-        
+        errors, warnings = rta_validator.validate(data)
+
         return jsonify({
             'valid': len(errors) == 0,
             'errors': errors,
@@ -1,9 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, url_for
+import logging
 import os
 import requests
 import re
 import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from werkzeug.datastructures import FileStorage
+from werkzeug.sansio.multipart import Field, File
 from werkzeug.utils import secure_filename
+from app.services.imagens import get_processador_imagens
+from app.services.trello_auth import VerificacaoTrello, get_trello_auth_cache
+from app.services.trello_outbox import EntregaAdiada, EntregaIncerta, EntregaRecusada, get_trello_outbox
+from app.services.trello_stream import TAMANHO_BLOCO, CanalAnexo, corpo_multipart, eventos_multipart
+from app.util.metricas import medir, registro, server_timing
+from app.util.limite_trello import LimiteExcedido
+from app.util.sessao_http import get_trello_session
 
 # Helpers locais para formatar descrição com base no payload enviado
 def _formatar_veiculos(veiculos):
@@ -66,6 +79,11 @@ def _formatar_pessoas(pessoas):
     return "\n".join(linhas)
 
 api_trello_bp = Blueprint('api_trello', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
+
+def _trello_base() -> str:
+    """URL base da API do Trello (TRELLO_API_BASE permite apontar para um stand-in local)."""
+    return os.getenv('TRELLO_API_BASE', 'https://api.trello.com/1').rstrip('/')
 
 def _sanitize(text: str) -> str:
     """Evita vazar credenciais em mensagens de erro."""
@@ -81,37 +99,226 @@ def _sanitize(text: str) -> str:
     out = out.replace('key=', 'key=***').replace('token=', 'token=***')
     return out
 
+def _anexar_arquivo(sessao, base, card_id, key, token, f, processador=None):
+    """
+    Envia um anexo ao card; retorna (ok, resultado ou erro, segundos). Com o
+    processador de imagens, fotos são reduzidas e regravadas sem metadados
+    antes do envio e o resultado informa os bytes economizados.
+    """
+    t0 = time.perf_counter()
+    try:
+        fname = secure_filename(f.filename or 'imagem')
+        conteudo, mimetype, info = f.stream, f.mimetype or 'application/octet-stream', None
+        if processador is not None:
+            conteudo = f.stream.read()
+            with medir('image_recompress'):
+                processada = processador.processar(conteudo, fname)
+            if processada is not None:
+                conteudo, fname, mimetype, info = processada
+                registro.inc('auto_rta_image_bytes_total', {'kind': 'original'}, info['original_bytes'])
+                registro.inc('auto_rta_image_bytes_total', {'kind': 'output'}, info['bytes'])
+        files_payload = {'file': (fname, conteudo, mimetype)}
+        with medir('trello_attachment', externo=('trello', 'create_attachment')) as m:
+            aresp = sessao.post(
+                f"{base}/cards/{card_id}/attachments",
+                params={'key': key, 'token': token, 'name': fname},
+                files=files_payload,
+                timeout=30
+            )
+            m.status = aresp.status_code
+        if aresp.ok:
+            aj = aresp.json()
+            resultado = {'id': aj.get('id'), 'name': aj.get('name')}
+            if info is not None:
+                resultado.update(info)
+            return True, resultado, time.perf_counter() - t0
+        return False, {'status': aresp.status_code, 'text': aresp.text[:200]}, time.perf_counter() - t0
+    except requests.exceptions.RequestException as e:
+        return False, {'error': _sanitize(str(e))[:200]}, time.perf_counter() - t0
+
+def _paralelo_anexos(quantidade):
+    return max(1, min(quantidade, current_app.config.get('TRELLO_ATTACHMENT_CONCURRENCY') or 1))
+
+def _enviar_anexos(sessao, base, card_id, key, token, files, paralelo, processador=None):
+    """Envia os anexos com até `paralelo` uploads simultâneos; resultados na ordem de files"""
+    def anexar(f):
+        return _anexar_arquivo(sessao, base, card_id, key, token, f, processador)
+
+    if paralelo == 1:
+        return [anexar(f) for f in files]
+    with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix='trello-anexo') as executor:
+        return list(executor.map(anexar, files))
+
+def _verificar_trello(config):
+    """Consulta membro e lista ao mesmo tempo; retorna (status, http_code)"""
+    key = os.getenv('TRELLO_KEY')
+    token = os.getenv('TRELLO_TOKEN')
+    list_id = os.getenv('TRELLO_ID_LIST')
+    base = _trello_base()
+    sessao = get_trello_session(config)
+
+    def membro():
+        with medir('trello_member', externo=('trello', 'get_member')) as m:
+            me = sessao.get(f'{base}/members/me', params={'key': key, 'token': token}, timeout=15)
+            m.status = me.status_code
+        return me
+
+    def lista():
+        with medir('trello_list', externo=('trello', 'get_list')) as m:
+            lst = sessao.get(f'{base}/lists/{list_id}', params={'key': key, 'token': token}, timeout=15)
+            m.status = lst.status_code
+        return lst
+
+    try:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='trello-auth') as executor:
+            futuro_lista = executor.submit(lista) if list_id else None
+            me = membro()
+            lst = futuro_lista.result() if futuro_lista else None
+    except requests.exceptions.RequestException as e:
+        return {'ok': False, 'error': _sanitize(str(e))}, 502
+
+    status = {'me_ok': me.ok, 'me_status': me.status_code}
+    if me.ok:
+        status['member'] = me.json().get('username')
+    if lst is not None:
+        status['list_ok'] = lst.ok
+        status['list_status'] = lst.status_code
+        if lst.ok:
+            status['list_name'] = lst.json().get('name')
+    else:
+        status['list_ok'] = None
+        status['list_status'] = None
+
+    http_code = 200 if status.get('me_ok') and (status.get('list_ok') in (True, None)) else 401
+    status['ok'] = http_code == 200
+    return status, http_code
+
+def _chave_trello():
+    return VerificacaoTrello.chave(_trello_base(), os.getenv('TRELLO_KEY'), os.getenv('TRELLO_TOKEN'),
+                                   os.getenv('TRELLO_ID_LIST'))
+
+def _cache_auth(config):
+    # Sem current_app: a atualização em segundo plano roda fora do contexto da aplicação
+    return get_trello_auth_cache(config, lambda: _verificar_trello(config))
+
+def trello_readiness(config):
+    """Prontidão do Trello pelo último auth-check em cache (sem chamadas externas)"""
+    cache = _cache_auth(config)
+    entrada = cache.ultimo(_chave_trello())
+    if entrada is None:
+        return {'ready': None, 'checked_at': None}
+    idade = time.time() - entrada['checked_at']
+    return {
+        'ready': entrada['http_code'] == 200,
+        'checked_at': datetime.fromtimestamp(entrada['checked_at']).isoformat(),
+        'age_seconds': round(idade, 1),
+        'stale': idade >= cache.ttl,
+    }
+
 @api_trello_bp.route('/trello/auth-check', methods=['GET'])
 def trello_auth_check():
+    """
+    Valida key/token e a lista (se informada). O resultado fica em cache por
+    TRELLO_AUTH_CHECK_TTL e é atualizado em segundo plano; ?refresh=1 consulta o
+    Trello na hora.
+    """
     key = os.getenv('TRELLO_KEY')
     token = os.getenv('TRELLO_TOKEN')
-    list_id = os.getenv('TRELLO_ID_LIST')
-    base = 'https://api.trello.com/1'
 
     if not key or not token:
         return jsonify({'ok': False, 'error': 'Credenciais ausentes (TRELLO_KEY/TRELLO_TOKEN)'}), 400
 
+    refresh = request.args.get('refresh', '').lower() in ['1', 'true', 'yes']
+    cache = _cache_auth(current_app.config)
+    entrada, cached = cache.obter(_chave_trello(), refresh=refresh)
+    status = dict(entrada['status'], cached=cached,
+                  checked_at=datetime.fromtimestamp(entrada['checked_at']).isoformat())
+    response = jsonify(status)
+    response.headers['Age'] = str(int(time.time() - entrada['checked_at']))
+    return response, entrada['http_code']
+
+def _montar_card(data):
+    """Nome e descrição do card a partir do payload do formulário"""
+    name = data.get('nome') or data.get('name') or 'Sem Nome'
+
+    # Dados principais
+    linhas = []
+    # Documento - Estado
+    doc_val = data.get('documento', '-')
+    doc_uf = data.get('documento_estado') or ''
+    if doc_uf:
+        linhas.append(f"Documento: {doc_val} - {doc_uf}")
+    else:
+        linhas.append(f"Documento: {doc_val}")
+    # Endereço detalhado
+    rua = data.get('endereco_rua') or ''
+    apt = data.get('endereco_apt') or ''
+    cidade = data.get('endereco_cidade') or ''
+    est = data.get('endereco_estado') or ''
+    zipc = data.get('endereco_zipcode') or ''
+    endereco_fmt = rua
+    if apt:
+        endereco_fmt += f", {apt}"
+    cidade_linha = ", ".join([p for p in [cidade, est] if p])
+    if cidade_linha:
+        endereco_fmt += f" - {cidade_linha}"
+    if zipc:
+        endereco_fmt += f" {zipc}"
+    if endereco_fmt.strip():
+        linhas.append(f"Endereço: {endereco_fmt}")
+    if data.get('data_nascimento'):
+        linhas.append(f"Data de Nascimento: {_format_us_date(data.get('data_nascimento'))}")
+    if data.get('genero'):
+        linhas.append(f"Gênero: {data.get('genero')}")
+    if data.get('estado_civil'):
+        linhas.append(f"Estado Civil: {data.get('estado_civil')}")
+    # Telefone removido do fluxo
+    if data.get('tempo_de_seguro'):
+        linhas.append(f"Tempo de Seguro: {data.get('tempo_de_seguro')}")
+    if data.get('tempo_no_endereco'):
+        linhas.append(f"Tempo no Endereço: {data.get('tempo_no_endereco')}")
+    if data.get('documento_estado'):
+        linhas.append(f"Estado do Documento: {data.get('documento_estado')}")
+    if data.get('email'):
+        linhas.append(f"Email: {data.get('email')}")
+
+    # Cônjuge
+    if data.get('nome_conjuge'):
+        linhas.append("\nCônjuge:")
+        linhas.append(f"Nome: {data.get('nome_conjuge')}")
+        if data.get('data_nascimento_conjuge'):
+            linhas.append(f"Data de Nascimento: {_format_us_date(data.get('data_nascimento_conjuge'))}")
+        if data.get('documento_conjuge'):
+            linhas.append(f"Documento: {data.get('documento_conjuge')}")
+
+    # Veículos e Pessoas
+    linhas.append(_formatar_veiculos(data.get('veiculos')))
+    linhas.append(_formatar_pessoas(data.get('pessoas')))
+
+    if data.get('observacoes'):
+        linhas.append("\nObservações:\n" + str(data.get('observacoes')))
+
+    desc = "\n".join([l for l in linhas if l is not None and l != ''])
+    return name, desc
+
+def _criar_card(sessao, url, params):
+    """Cria o card; retorna (card_id, None) ou (None, resposta de erro)"""
+    with medir('trello_card', externo=('trello', 'create_card')) as m:
+        resp = sessao.post(url, params=params, timeout=20)
+        m.status = resp.status_code
     try:
-        me = requests.get(f'{base}/members/me', params={'key': key, 'token': token}, timeout=15)
-        status = {'me_ok': me.ok, 'me_status': me.status_code}
-        if me.ok:
-            status['member'] = me.json().get('username')
-
-        if list_id:
-            lst = requests.get(f'{base}/lists/{list_id}', params={'key': key, 'token': token}, timeout=15)
-            status['list_ok'] = lst.ok
-            status['list_status'] = lst.status_code
-            if lst.ok:
-                status['list_name'] = lst.json().get('name')
-        else:
-            status['list_ok'] = None
-            status['list_status'] = None
+        resp.raise_for_status()
+    except requests.exceptions.HTTPError:
+        # Retorna mensagem mais clara sem vazar credenciais
+        return None, (jsonify({'error': f'Trello retornou {resp.status_code}', 'detail': _detalhe_erro(resp)}),
+                      resp.status_code)
+    return resp.json().get('id'), None
 
-        http_code = 200 if status.get('me_ok') and (status.get('list_ok') in (True, None)) else 401
-        status['ok'] = http_code == 200
-        return jsonify(status), http_code
-    except requests.exceptions.RequestException as e:
-        return jsonify({'ok': False, 'error': _sanitize(str(e))}), 502
+def _detalhe_erro(resp):
+    try:
+        return resp.json()
+    except Exception:
+        return {'text': resp.text[:500]}
 
 @api_trello_bp.route('/trello', methods=['POST'])
 def create_trello_card():
@@ -119,11 +326,19 @@ def create_trello_card():
 
     - application/json: body é o payload JSON; sem imagens
     - multipart/form-data: campo 'payload' (JSON) + 'images' (múltiplos arquivos)
+
+    Sem TRELLO_OUTBOX (padrão) o card é criado na requisição (201); com ela o
+    card e os anexos vão para a caixa de saída e a resposta é 202 com o id de
+    acompanhamento (GET /api/trello/outbox/<id>).
+    Com TRELLO_STREAM_UPLOADS ou ?stream=1 as imagens do multipart são
+    repassadas ao Trello enquanto chegam (ver _create_trello_card_stream).
     """
     try:
         files = []
         data = {}
         ct = request.content_type or ''
+        if 'multipart/form-data' in ct and _stream_mode():
+            return _create_trello_card_stream()
         if 'multipart/form-data' in ct:
             # FormData com JSON + arquivos
             raw = request.form.get('payload') or request.form.get('data')
@@ -142,71 +357,23 @@ def create_trello_card():
         key = os.getenv('TRELLO_KEY')
         token = os.getenv('TRELLO_TOKEN')
         list_id = os.getenv('TRELLO_ID_LIST')
-        url = os.getenv('TRELLO_URL', 'https://api.trello.com/1/cards')
+        url = os.getenv('TRELLO_URL') or f'{_trello_base()}/cards'
 
         if not all([key, token, list_id]):
             return jsonify({'error': 'Trello credentials not configured (TRELLO_KEY/TRELLO_TOKEN/TRELLO_ID_LIST)'}), 500
 
-        name = data.get('nome') or data.get('name') or 'Sem Nome'
+        name, desc = _montar_card(data)
 
-        # Dados principais
-        linhas = []
-        # Documento - Estado
-        doc_val = data.get('documento', '-')
-        doc_uf = data.get('documento_estado') or ''
-        if doc_uf:
-            linhas.append(f"Documento: {doc_val} - {doc_uf}")
-        else:
-            linhas.append(f"Documento: {doc_val}")
-        # Endereço detalhado
-        rua = data.get('endereco_rua') or ''
-        apt = data.get('endereco_apt') or ''
-        cidade = data.get('endereco_cidade') or ''
-        est = data.get('endereco_estado') or ''
-        zipc = data.get('endereco_zipcode') or ''
-        endereco_fmt = rua
-        if apt:
-            endereco_fmt += f", {apt}"
-        cidade_linha = ", ".join([p for p in [cidade, est] if p])
-        if cidade_linha:
-            endereco_fmt += f" - {cidade_linha}"
-        if zipc:
-            endereco_fmt += f" {zipc}"
-        if endereco_fmt.strip():
-            linhas.append(f"Endereço: {endereco_fmt}")
-        if data.get('data_nascimento'):
-            linhas.append(f"Data de Nascimento: {_format_us_date(data.get('data_nascimento'))}")
-        if data.get('genero'):
-            linhas.append(f"Gênero: {data.get('genero')}")
-        if data.get('estado_civil'):
-            linhas.append(f"Estado Civil: {data.get('estado_civil')}")
-        # Telefone removido do fluxo
-        if data.get('tempo_de_seguro'):
-            linhas.append(f"Tempo de Seguro: {data.get('tempo_de_seguro')}")
-        if data.get('tempo_no_endereco'):
-            linhas.append(f"Tempo no Endereço: {data.get('tempo_no_endereco')}")
-        if data.get('documento_estado'):
-            linhas.append(f"Estado do Documento: {data.get('documento_estado')}")
-        if data.get('email'):
-            linhas.append(f"Email: {data.get('email')}")
-
-        # Cônjuge
-        if data.get('nome_conjuge'):
-            linhas.append("\nCônjuge:")
-            linhas.append(f"Nome: {data.get('nome_conjuge')}")
-            if data.get('data_nascimento_conjuge'):
-                linhas.append(f"Data de Nascimento: {_format_us_date(data.get('data_nascimento_conjuge'))}")
-            if data.get('documento_conjuge'):
-                linhas.append(f"Documento: {data.get('documento_conjuge')}")
-
-        # Veículos e Pessoas
-        linhas.append(_formatar_veiculos(data.get('veiculos')))
-        linhas.append(_formatar_pessoas(data.get('pessoas')))
-
-        if data.get('observacoes'):
-            linhas.append("\nObservações:\n" + str(data.get('observacoes')))
-
-        desc = "\n".join([l for l in linhas if l is not None and l != ''])
+        if current_app.config.get('TRELLO_OUTBOX'):
+            # Grava na caixa de saída e responde na hora; o entregador envia ao Trello
+            item = caixa_saida_trello(current_app.config).submit({'name': name, 'desc': desc}, files)
+            if item is None:
+                response = jsonify({'error': 'Caixa de saída do Trello cheia, tente novamente em instantes'})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            response = jsonify(_outbox_json(item))
+            response.headers['Location'] = url_for('api_trello.get_trello_outbox_item', item_id=item['id'])
+            return response, 202
 
         params = {
             'key': key,
@@ -216,46 +383,401 @@ def create_trello_card():
             'desc': desc
         }
 
-        resp = requests.post(url, params=params, timeout=20)
-        try:
-            resp.raise_for_status()
-        except requests.exceptions.HTTPError:
-            # Retorna mensagem mais clara sem vazar credenciais
-            try:
-                detail = resp.json()
-            except Exception:
-                detail = {'text': resp.text[:500]}
-            return jsonify({'error': f'Trello retornou {resp.status_code}', 'detail': detail}), resp.status_code
-
-        json_resp = resp.json()
-        card_id = json_resp.get('id')
+        sessao = get_trello_session(current_app.config)
+        card_id, erro = _criar_card(sessao, url, params)
+        if erro:
+            return erro
 
-        # Se houver arquivos, anexar ao card
+        # Se houver arquivos, anexar ao card (em paralelo, mantendo a ordem do upload)
         attach_results = []
         attach_errors = []
         if files and card_id:
-            base = 'https://api.trello.com/1'
-            for f in files:
-                try:
-                    fname = secure_filename(f.filename or 'imagem')
-                    files_payload = {'file': (fname, f.stream, f.mimetype or 'application/octet-stream')}
-                    aresp = requests.post(
-                        f"{base}/cards/{card_id}/attachments",
-                        params={'key': key, 'token': token, 'name': fname},
-                        files=files_payload,
-                        timeout=30
-                    )
-                    if aresp.ok:
-                        aj = aresp.json()
-                        attach_results.append({'id': aj.get('id'), 'name': aj.get('name')})
-                    else:
-                        attach_errors.append({'status': aresp.status_code, 'text': aresp.text[:200]})
-                except requests.exceptions.RequestException as e:
-                    attach_errors.append({'error': _sanitize(str(e))[:200]})
+            paralelo = _paralelo_anexos(len(files))
+            processador = get_processador_imagens(current_app.config)
+            for ok, item, segundos in _enviar_anexos(sessao, _trello_base(), card_id, key, token, files, paralelo,
+                                                     processador):
+                (attach_results if ok else attach_errors).append(item)
+                if paralelo > 1:
+                    # As threads não têm o contexto da requisição: o Server-Timing é somado aqui
+                    server_timing('trello_attachment', segundos)
 
         return jsonify({'ok': True, 'card_id': card_id, 'attachments': attach_results, 'attachment_errors': attach_errors}), 201
 
+    except LimiteExcedido as e:
+        # Fila do limitador longa demais: o cliente tenta de novo depois (nada foi enviado ao Trello)
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(int(e.retry_after + 0.999))
+        return response, 503
     except requests.exceptions.RequestException as e:
+        # A URL da exceção carrega key/token: só a mensagem sanitizada vai para o log
+        logger.warning('Erro ao comunicar com Trello', extra={'error': _sanitize(str(e))})
         return jsonify({'error': f'Erro ao comunicar com Trello: {_sanitize(str(e))}'}), 502
     except Exception as e:
+        logger.exception('Erro ao criar card no Trello')
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+
+def _stream_mode():
+    valor = request.args.get('stream')
+    if valor is None:
+        return bool(current_app.config.get('TRELLO_STREAM_UPLOADS'))
+    return valor.lower() in ('1', 'true', 'yes')
+
+def _anexar_stream(sessao, base, card_id, key, token, fname, mimetype, canal):
+    """Upload de um anexo cujo conteúdo chega pelo canal; retorna (ok, resultado ou erro, segundos)"""
+    t0 = time.perf_counter()
+    try:
+        content_type, corpo = corpo_multipart(canal, fname, mimetype)
+        with medir('trello_attachment', externo=('trello', 'create_attachment')) as m:
+            aresp = sessao.post(
+                f"{base}/cards/{card_id}/attachments",
+                params={'key': key, 'token': token, 'name': fname},
+                data=corpo,
+                headers={'Content-Type': content_type},
+                timeout=30
+            )
+            m.status = aresp.status_code
+        if aresp.ok:
+            aj = aresp.json()
+            return True, {'id': aj.get('id'), 'name': aj.get('name')}, time.perf_counter() - t0
+        return False, {'status': aresp.status_code, 'text': aresp.text[:200]}, time.perf_counter() - t0
+    except Exception as e:
+        return False, {'error': _sanitize(str(e))[:200]}, time.perf_counter() - t0
+    finally:
+        # Upload encerrado: o parser descarta o que ainda chegar desta imagem
+        canal.abandonar()
+
+def _create_trello_card_stream():
+    """
+    POST /api/trello multipart sem montar request.files: o card é criado ao
+    receber o campo 'payload' (que precisa vir antes das imagens) e cada
+    imagem é enviada ao Trello, em chunked encoding, enquanto é recebida.
+    A memória por requisição fica limitada aos buffers dos canais
+    (TRELLO_STREAM_BUFFER_KB por anexo em envio), sem spool em disco; por
+    isso as imagens seguem sem recompressão neste modo.
+    """
+    config = current_app.config
+    boundary = request.mimetype_params.get('boundary')
+    if not boundary:
+        return jsonify({'error': 'multipart/form-data sem boundary'}), 400
+
+    key = os.getenv('TRELLO_KEY')
+    token = os.getenv('TRELLO_TOKEN')
+    list_id = os.getenv('TRELLO_ID_LIST')
+    url = os.getenv('TRELLO_URL') or f'{_trello_base()}/cards'
+    if not all([key, token, list_id]):
+        return jsonify({'error': 'Trello credentials not configured (TRELLO_KEY/TRELLO_TOKEN/TRELLO_ID_LIST)'}), 500
+
+    sessao = get_trello_session(config)
+    base = _trello_base()
+    blocos = max(1, (config.get('TRELLO_STREAM_BUFFER_KB') or 256) * 1024 // TAMANHO_BLOCO)
+    card_id = None
+    campo = None
+    valor = bytearray()
+    canal = None
+    futuros = []
+    with ThreadPoolExecutor(max_workers=max(1, config.get('TRELLO_ATTACHMENT_CONCURRENCY') or 1),
+                            thread_name_prefix='trello-stream') as executor:
+        try:
+            for evento in eventos_multipart(request.stream, boundary.encode(), request.max_form_memory_size):
+                if isinstance(evento, Field):
+                    campo, valor = evento.name, bytearray()
+                elif isinstance(evento, File):
+                    campo = None
+                    if evento.name != 'images':
+                        continue
+                    if card_id is None:
+                        return jsonify({'error': "Campo 'payload' deve vir antes das imagens no form-data"}), 400
+                    fname = secure_filename(evento.filename or 'imagem') or 'imagem'
+                    mimetype = evento.headers.get('Content-Type') or 'application/octet-stream'
+                    canal = CanalAnexo(blocos)
+                    futuros.append(executor.submit(_anexar_stream, sessao, base, card_id, key, token,
+                                                   fname, mimetype, canal))
+                elif canal is not None:
+                    if evento.data:
+                        canal.escrever(evento.data)
+                    if not evento.more_data:
+                        canal.fechar()
+                        canal = None
+                elif campo in ('payload', 'data') and card_id is None:
+                    valor += evento.data
+                    if evento.more_data:
+                        continue
+                    try:
+                        data = json.loads(valor)
+                    except Exception:
+                        return jsonify({'error': 'payload inválido (JSON malformado)'}), 400
+                    name, desc = _montar_card(data)
+                    params = {'key': key, 'token': token, 'idList': list_id, 'name': name, 'desc': desc}
+                    card_id, erro = _criar_card(sessao, url, params)
+                    if erro:
+                        return erro
+        except BaseException as e:
+            # Cliente desconectou ou multipart inválido: interrompe o upload em andamento
+            if canal is not None:
+                canal.fechar(e if isinstance(e, Exception) else ConnectionAbortedError())
+            raise
+
+    if card_id is None:
+        return jsonify({'error': "Campo 'payload' ausente no form-data"}), 400
+
+    attach_results = []
+    attach_errors = []
+    for futuro in futuros:
+        ok, item, segundos = futuro.result()
+        (attach_results if ok else attach_errors).append(item)
+        server_timing('trello_attachment', segundos)
+    return jsonify({'ok': True, 'card_id': card_id, 'attachments': attach_results, 'attachment_errors': attach_errors}), 201
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+def caixa_saida_trello(config):
+    """Caixa de saída do /api/trello no processo (também criada pelo create_app)"""
+
+    def credenciais():
+        key = os.getenv('TRELLO_KEY')
+        token = os.getenv('TRELLO_TOKEN')
+        list_id = os.getenv('TRELLO_ID_LIST')
+        if not all([key, token, list_id]):
+            # Configuração pode ser corrigida sem perder a submissão
+            raise EntregaAdiada('Trello credentials not configured (TRELLO_KEY/TRELLO_TOKEN/TRELLO_ID_LIST)')
+        return key, token, list_id
+
+    def procurar_card(sessao, key, token, list_id, marcador):
+        """card_id do card da lista com o marcador na descrição, ou None"""
+        try:
+            with medir('trello_list_cards', externo=('trello', 'get_list_cards')) as m:
+                resp = sessao.get(f'{_trello_base()}/lists/{list_id}/cards',
+                                  params={'key': key, 'token': token, 'fields': 'id,desc'}, timeout=20)
+                m.status = resp.status_code
+            resp.raise_for_status()
+            cards = resp.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Sem saber se o card existe, não cria outro: tenta a busca de novo depois
+            raise EntregaIncerta(f'Erro ao procurar o card no Trello: {_sanitize(str(e))}',
+                                 getattr(e, 'retry_after', None))
+        for existente in cards:
+            if marcador in (existente.get('desc') or ''):
+                return existente.get('id')
+        return None
+
+    def criar_card(card, marcador, procurar):
+        key, token, list_id = credenciais()
+        sessao = get_trello_session(config)
+        if procurar:
+            card_id = procurar_card(sessao, key, token, list_id, marcador)
+            if card_id:
+                return card_id
+        url = os.getenv('TRELLO_URL') or f'{_trello_base()}/cards'
+        # O marcador permite achar o card se a resposta do POST se perder
+        params = {'key': key, 'token': token, 'idList': list_id, 'name': card['name'],
+                  'desc': f"{card['desc']}\n\nRef: {marcador}"}
+        try:
+            with medir('trello_card', externo=('trello', 'create_card')) as m:
+                resp = sessao.post(url, params=params, timeout=20)
+                m.status = resp.status_code
+        except (LimiteExcedido, requests.exceptions.ConnectTimeout) as e:
+            # O POST não chegou a ser enviado
+            raise EntregaAdiada(f'Erro ao comunicar com Trello: {_sanitize(str(e))}', getattr(e, 'retry_after', None))
+        except requests.exceptions.RequestException as e:
+            # Timeout de leitura ou conexão caída depois do envio: o card pode ter sido criado
+            raise EntregaIncerta(f'Erro ao comunicar com Trello: {_sanitize(str(e))}')
+        if resp.status_code == 429:
+            raise EntregaAdiada(f'Trello retornou {resp.status_code}', _retry_after(resp))
+        if resp.status_code >= 500:
+            raise EntregaIncerta(f'Trello retornou {resp.status_code}', _retry_after(resp))
+        if not resp.ok:
+            raise EntregaRecusada(f'Trello retornou {resp.status_code}: {_sanitize(resp.text[:200])}')
+        try:
+            card_id = resp.json().get('id')
+        except (ValueError, AttributeError):
+            card_id = None
+        if not card_id:
+            # 2xx sem o id: o card provavelmente existe, então procura em vez de repetir o POST
+            card_id = procurar_card(sessao, key, token, list_id, marcador)
+        if not card_id:
+            raise EntregaRecusada(f'Trello retornou {resp.status_code} sem o id do card: '
+                                  f'{_sanitize(resp.text[:200])}')
+        return card_id
+
+    def enviar_anexos(card_id, anexos):
+        key, token, _ = credenciais()
+        estados = [None] * len(anexos)
+        arquivos = []
+        for i, anexo in enumerate(anexos):
+            try:
+                stream = open(anexo['path'], 'rb')
+            except OSError:
+                estados[i] = ('error', {'error': 'Arquivo do anexo não encontrado na caixa de saída'})
+                continue
+            arquivos.append((i, FileStorage(stream=stream, filename=anexo['filename'], content_type=anexo['mimetype'])))
+        try:
+            resultados = _enviar_anexos(get_trello_session(config), _trello_base(), card_id, key, token,
+                                        [f for _, f in arquivos],
+                                        max(1, min(len(arquivos), config.get('TRELLO_ATTACHMENT_CONCURRENCY') or 1)),
+                                        get_processador_imagens(config))
+        finally:
+            for _, f in arquivos:
+                f.close()
+        for (i, _), (ok, item, _) in zip(arquivos, resultados):
+            if ok:
+                estados[i] = ('done', item)
+            elif 'error' in item or item['status'] == 429 or item['status'] >= 500:
+                estados[i] = ('retry', item)
+            else:
+                estados[i] = ('error', item)
+        return estados
+
+    return get_trello_outbox(config, criar_card, enviar_anexos)
+
+def _outbox_json(item):
+    """Representação pública de uma entrada da caixa de saída"""
+    def iso(ts):
+        return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+    anexos = item['attachments']
+    resposta = {
+        'ok': item['status'] == 'delivered',
+        'outbox_id': item['id'],
+        'status': item['status'],
+        'attempts': item['attempts'],
+        'created_at': iso(item['created']),
+        'next_attempt_at': iso(item['next_attempt']) if item['status'] == 'pending' else None,
+        'finished_at': iso(item['delivered']),
+        'status_url': url_for('api_trello.get_trello_outbox_item', item_id=item['id']),
+        'card_id': item['card_id'],
+        'attachments': [a['result'] for a in anexos if a['status'] == 'done'],
+        'attachment_errors': [a['result'] for a in anexos if a['status'] == 'error'],
+        'attachments_pending': sum(1 for a in anexos if a['status'] == 'pending'),
+    }
+    if item['error']:
+        resposta['error'] = item['error']
+    return resposta
+
+@api_trello_bp.route('/trello/outbox', methods=['GET'])
+def get_trello_outbox_stats():
+    """Entradas da caixa de saída por estado"""
+    return jsonify(caixa_saida_trello(current_app.config).stats())
+
+@api_trello_bp.route('/trello/outbox/<item_id>', methods=['GET'])
+def get_trello_outbox_item(item_id):
+    """Status da entrega de um card: card_id e resultado dos anexos quando entregue"""
+    item = caixa_saida_trello(current_app.config).get(item_id)
+    if item is None:
+        return jsonify({'error': 'Entrega não encontrada ou expirada'}), 404
+    return jsonify(_outbox_json(item))
+
+def _ler_lote_trello():
+    """Corpo do /api/trello/batch: lista de leads ou {"leads": [...]}"""
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('leads')
+    if not isinstance(payload, list):
+        raise ValueError('Envie uma lista de leads ou {"leads": [...]}')
+    return payload
+
+def _criar_card_lote(sessao, url, key, token, list_id, index, data):
+    """Cria o card de um lead do lote; retorna a linha de resultado (nunca levanta)"""
+    resultado = {'index': index}
+    try:
+        if not isinstance(data, dict):
+            return dict(resultado, status='error', error='Lead deve ser um objeto JSON')
+        name, desc = _montar_card(data)
+        resultado['name'] = name
+        with medir('trello_card', externo=('trello', 'create_card')) as m:
+            resp = sessao.post(url, params={'key': key, 'token': token, 'idList': list_id,
+                                            'name': name, 'desc': desc}, timeout=20)
+            m.status = resp.status_code
+        if not resp.ok:
+            return dict(resultado, status='error', http_status=resp.status_code,
+                        error=f'Trello retornou {resp.status_code}', detail=_detalhe_erro(resp))
+        try:
+            card_id = resp.json().get('id')
+        except (ValueError, AttributeError):
+            card_id = None
+        if not card_id:
+            # O card foi criado (2xx), só o id não veio: não é erro, e repetir duplicaria o card
+            return dict(resultado, status='ok', card_id=None, warning='Card criado, mas o Trello não retornou o id')
+        return dict(resultado, status='ok', card_id=card_id)
+    except LimiteExcedido as e:
+        return dict(resultado, status='error', http_status=503, error=str(e), retry_after=int(e.retry_after + 0.999))
+    except requests.exceptions.RequestException as e:
+        return dict(resultado, status='error', http_status=502,
+                    error=f'Erro ao comunicar com Trello: {_sanitize(str(e))}')
+    except Exception as e:
+        logger.exception('Erro ao criar card do lote no Trello', extra={'lead': index})
+        return dict(resultado, status='error', http_status=500, error=f'Erro interno: {str(e)}')
+
+@api_trello_bp.route('/trello/batch', methods=['POST'])
+def create_trello_cards_batch():
+    """
+    Cria vários cards de uma vez (migração de planilhas/CRM)
+
+    Cada lead segue o mesmo formato do JSON do /api/trello (sem imagens). Os
+    cards são criados direto no Trello (sem caixa de saída), com até
+    TRELLO_BATCH_CONCURRENCY em andamento, pela sessão compartilhada e pelo
+    limitador de requisições. A resposta é NDJSON em streaming: uma linha por
+    lead à medida que termina ({"index", "status": "ok", "card_id"} ou
+    {"index", "status": "error", "error"}) e, no fim, {"done": true, ...}.
+    Um 2xx sem o id do card (resposta que não é JSON) vem como "ok" com
+    card_id null e "warning": o card existe e não deve ser reenviado.
+    """
+    try:
+        leads = _ler_lote_trello()
+    except ValueError as e:
+        return jsonify({'error': f'Lote inválido: {str(e)}'}), 400
+
+    max_leads = current_app.config.get('TRELLO_BATCH_MAX_LEADS', 500)
+    if not leads:
+        return jsonify({'error': 'Dados não fornecidos'}), 400
+    if len(leads) > max_leads:
+        return jsonify({'error': f'Máximo de {max_leads} leads por lote'}), 413
+
+    key = os.getenv('TRELLO_KEY')
+    token = os.getenv('TRELLO_TOKEN')
+    list_id = os.getenv('TRELLO_ID_LIST')
+    url = os.getenv('TRELLO_URL') or f'{_trello_base()}/cards'
+    if not all([key, token, list_id]):
+        return jsonify({'error': 'Trello credentials not configured (TRELLO_KEY/TRELLO_TOKEN/TRELLO_ID_LIST)'}), 500
+
+    sessao = get_trello_session(current_app.config)
+    paralelo = max(1, min(len(leads), current_app.config.get('TRELLO_BATCH_CONCURRENCY') or 1))
+
+    def linha(obj):
+        return (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+
+    def generate():
+        t0 = time.perf_counter()
+        ok = erros = 0
+        executor = ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix='trello-lote')
+        pendentes = set()
+        proximos = iter(enumerate(leads))
+        try:
+            # Janela de `paralelo` leads em andamento: os resultados saem na ordem em que terminam
+            while True:
+                for index, data in proximos:
+                    pendentes.add(executor.submit(_criar_card_lote, sessao, url, key, token, list_id, index, data))
+                    if len(pendentes) >= paralelo:
+                        break
+                if not pendentes:
+                    break
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for future in prontos:
+                    resultado = future.result()
+                    if resultado['status'] == 'ok':
+                        ok += 1
+                    else:
+                        erros += 1
+                    yield linha(resultado)
+            yield linha({'done': True, 'total': len(leads), 'ok': ok, 'errors': erros,
+                         'elapsed_seconds': round(time.perf_counter() - t0, 3)})
+        finally:
+            # Cliente desconectou: os leads ainda não enviados não são criados
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,75 @@
+from flask import Blueprint, current_app, request, jsonify
+import logging
+
+from app.services.vin_decoder import get_vin_decoder, normalizar_vin
+
+api_vin_bp = Blueprint('api_vin', __name__, url_prefix='/api')
+logger = logging.getLogger(__name__)
+
+
+def _resposta_vin(info):
+    """(corpo, status) de um VIN: 200 decodificado, 404 desconhecido do NHTSA, 502 falha na consulta"""
+    if 'error' in info:
+        return dict(info, ok=False), 502
+    if not info['decoded']:
+        return dict(info, ok=False, error=info['error_text'] or 'Não foi possível decodificar o VIN'), 404
+    return dict(info, ok=True), 200
+
+
+@api_vin_bp.route('/vin/<vin>', methods=['GET'])
+def decode_vin(vin):
+    """
+    Decodifica um VIN (marca, modelo, ano, carroceria, cilindros e portas)
+
+    Respostas vêm do cache em memória/disco; VINs novos são consultados no
+    NHTSA junto com as demais consultas simultâneas (DecodeVINValuesBatch).
+    """
+    normalizado = normalizar_vin(vin)
+    if normalizado is None:
+        return jsonify({'ok': False, 'error': 'VIN inválido (11 a 17 letras/números, sem I, O e Q)'}), 400
+
+    info = get_vin_decoder(current_app.config).decodificar([normalizado])[normalizado]
+    corpo, status = _resposta_vin(info)
+    response = jsonify(corpo)
+    if status != 502:
+        # O resultado de um VIN não muda: o navegador pode reaproveitá-lo
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response, status
+
+
+@api_vin_bp.route('/vin/batch', methods=['POST'])
+def decode_vin_batch():
+    """
+    Decodifica vários VINs: lista JSON ou {"vins": [...]}
+
+    Resultados na ordem enviada, um por VIN ({"vin", "ok", ...} no mesmo
+    formato do GET /api/vin/<vin>, com "status" HTTP equivalente).
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('vins')
+    if not isinstance(payload, list):
+        return jsonify({'error': 'Envie uma lista de VINs ou {"vins": [...]}'}), 400
+
+    max_vins = current_app.config.get('VIN_BATCH_MAX', 500)
+    if not payload:
+        return jsonify({'error': 'Dados não fornecidos'}), 400
+    if len(payload) > max_vins:
+        return jsonify({'error': f'Máximo de {max_vins} VINs por lote'}), 413
+
+    normalizados = [normalizar_vin(vin) if isinstance(vin, str) else None for vin in payload]
+    infos = get_vin_decoder(current_app.config).decodificar([vin for vin in normalizados if vin])
+
+    results = []
+    for original, vin in zip(payload, normalizados):
+        if vin is None:
+            results.append({'vin': original, 'ok': False, 'status': 400, 'error': 'VIN inválido'})
+            continue
+        corpo, status = _resposta_vin(infos[vin])
+        results.append(dict(corpo, status=status))
+    return jsonify({
+        'total': len(results),
+        'ok': sum(1 for r in results if r['ok']),
+        'errors': sum(1 for r in results if not r['ok']),
+        'results': results,
+    })
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import os
+import threading
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ela os anexos seguem sem alteração
+    Image = None
+
+try:
+    # Fotos HEIC do iPhone, se pillow-heif estiver instalado
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Formatos recomprimidos; os demais (GIF, PDF, documentos...) seguem intactos
+_FORMATOS = frozenset(['JPEG', 'MPO', 'PNG', 'WEBP', 'HEIF', 'TIFF', 'BMP'])
+
+
+def recomprimir(dados, filename, max_dim=2048, qualidade=82):
+    """
+    Reduz a imagem para caber em max_dim x max_dim, aplica a orientação do
+    EXIF e regrava sem metadados (EXIF/GPS, ICC, XMP): JPEG na qualidade
+    indicada ou PNG otimizado quando há transparência.
+    :return: (bytes, filename, mimetype, info) ou None se não for uma imagem
+        processável (o arquivo segue sem alteração)
+    """
+    try:
+        imagem = Image.open(io.BytesIO(dados))
+        if imagem.format not in _FORMATOS or getattr(imagem, 'is_animated', False):
+            return None
+        original = imagem.size
+        # JPEG: decodifica já reduzido (escala 1/2, 1/4, 1/8), bem mais rápido que decodificar tudo
+        imagem.draft('RGB', (max_dim, max_dim))
+        imagem = ImageOps.exif_transpose(imagem)
+        imagem.thumbnail((max_dim, max_dim), Image.LANCZOS)
+
+        transparente = imagem.mode in ('RGBA', 'LA') or (imagem.mode == 'P' and 'transparency' in imagem.info)
+        saida = io.BytesIO()
+        base = os.path.splitext(filename)[0] or 'imagem'
+        if transparente:
+            imagem.save(saida, 'PNG', optimize=True, icc_profile=None)
+            filename, mimetype = f'{base}.png', 'image/png'
+        else:
+            if imagem.mode != 'RGB':
+                imagem = imagem.convert('RGB')
+            imagem.save(saida, 'JPEG', quality=qualidade, optimize=True, progressive=True)
+            filename, mimetype = f'{base}.jpg', 'image/jpeg'
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Não é imagem (ou está corrompida): segue como veio
+        return None
+
+    resultado = saida.getvalue()
+    return resultado, filename, mimetype, {
+        'original_bytes': len(dados),
+        'bytes': len(resultado),
+        'bytes_saved': len(dados) - len(resultado),
+        'original_size': list(original),
+        'size': list(imagem.size),
+    }
+
+
+class ProcessadorImagens:
+    """
+    Pool de threads para a recompressão dos anexos. Decodificar, redimensionar
+    e codificar no Pillow liberam o GIL, então threads bastam e evitam copiar
+    os bytes das imagens entre processos; o pool limita o uso de CPU por worker.
+    """
+
+    def __init__(self, workers=2, max_dim=2048, qualidade=82):
+        self.workers = workers
+        self.max_dim = max_dim
+        self.qualidade = qualidade
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Após um fork (gunicorn) o executor herdado não tem threads
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='imagem')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def processar(self, dados, filename):
+        """Recomprime no pool e espera o resultado (mesmo retorno de recomprimir)"""
+        return self._get_executor().submit(recomprimir, dados, filename, self.max_dim, self.qualidade).result()
+
+
+_processador = None
+_aviso_pillow = False
+_processador_lock = threading.Lock()
+
+
+def get_processador_imagens(config):
+    """Retorna o processador configurado ou None (TRELLO_IMAGE_RECOMPRESS desligado ou sem Pillow)"""
+    global _processador, _aviso_pillow
+    if not config.get('TRELLO_IMAGE_RECOMPRESS'):
+        return None
+    if Image is None:
+        if not _aviso_pillow:
+            _aviso_pillow = True
+            logger.warning('TRELLO_IMAGE_RECOMPRESS ligado mas Pillow não está instalado: anexos seguem sem alteração')
+        return None
+    if _processador is None:
+        with _processador_lock:
+            if _processador is None:
+                _processador = ProcessadorImagens(
+                    workers=config.get('TRELLO_IMAGE_WORKERS') or 2,
+                    max_dim=config.get('TRELLO_IMAGE_MAX_DIM') or 2048,
+                    qualidade=config.get('TRELLO_IMAGE_QUALITY') or 82,
+                )
+    return _processador
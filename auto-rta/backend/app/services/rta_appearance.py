@@ -0,0 +1,200 @@
+from pypdf.generic import ArrayObject, DecodedStreamObject, FloatObject, NameObject, DictionaryObject
+import unicodedata
+
+
+# Modos de aparência dos campos no PDF gerado:
+#   viewer  - NeedAppearances ligado, o visualizador desenha os campos
+#   server  - aparências geradas no servidor, formulário continua editável
+#   flatten - aparências desenhadas no conteúdo da página, sem formulário
+APPEARANCE_MODES = ('viewer', 'server', 'flatten')
+
+# Larguras AFM da Helvetica (códigos 32-126); as fontes padrão do /DR não
+# trazem /Widths e os templates só usam a família Helvetica (/Helv)
+_HELVETICA_WIDTHS = dict(zip(range(32, 127), (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)))
+
+# Flags de campo de texto (PDF 12.7.4.3)
+_FF_MULTILINE = 1 << 12
+_FF_PASSWORD = 1 << 13
+_FF_COMB = 1 << 24
+
+_AUTO_FONT_MAX = 12
+
+
+class FontMetrics:
+    """
+    Larguras dos glifos e métricas verticais de uma fonte do /DR, calculadas
+    uma vez por template para a geração de aparências
+    """
+
+    def __init__(self, font, ref, source_ref=None):
+        self.ref = ref
+        self.source_ref = source_ref
+        self.codec = 'cp1252' if font.get('/Encoding') == '/WinAnsiEncoding' else 'latin-1'
+
+        descriptor = font.get('/FontDescriptor')
+        descriptor = descriptor.get_object() if descriptor is not None else {}
+        self.ascent = float(descriptor.get('/Ascent', 718))
+        self.descent = float(descriptor.get('/Descent', -207))
+        self.cap_height = float(descriptor.get('/CapHeight', 718))
+        missing = float(descriptor.get('/MissingWidth', 0)) or 500
+
+        self.widths = [missing] * 256
+        if '/Widths' in font:
+            first = int(font.get('/FirstChar', 0))
+            for i, width in enumerate(font['/Widths']):
+                if 0 <= first + i < 256:
+                    self.widths[first + i] = float(width)
+        else:
+            # Fonte padrão: acentuadas usam a largura da letra base
+            for code in range(32, 256):
+                char = bytes((code,)).decode(self.codec, errors='ignore')
+                base = unicodedata.normalize('NFKD', char)[:1]
+                self.widths[code] = _HELVETICA_WIDTHS.get(ord(base) if base else 0, 556)
+
+    def encode(self, text):
+        return text.encode(self.codec, errors='replace')
+
+    def width(self, data, size):
+        return sum(self.widths[b] for b in data) * size / 1000
+
+
+def parse_da(da):
+    """Separa o /DA em (nome da fonte, tamanho, demais operadores)"""
+    tokens = str(da or '').split()
+    if 'Tf' not in tokens:
+        return None, 0.0, ' '.join(tokens)
+    i = tokens.index('Tf')
+    name, size = tokens[i - 2], float(tokens[i - 1])
+    return name, size, ' '.join(tokens[:i - 2] + tokens[i + 1:])
+
+
+def _escape(data):
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'\\r')
+
+
+def _num(value):
+    return f'{value:.4f}'.rstrip('0').rstrip('.') or '0'
+
+
+def _wrap(data, metrics, size, max_width):
+    """Quebra o texto em linhas que cabem na largura (campos multilinha)"""
+    linhas = []
+    for paragrafo in data.replace(b'\r\n', b'\n').replace(b'\r', b'\n').split(b'\n'):
+        atual = b''
+        for palavra in paragrafo.split(b' '):
+            candidato = atual + b' ' + palavra if atual else palavra
+            if atual and metrics.width(candidato, size) > max_width:
+                linhas.append(atual)
+                atual = palavra
+            else:
+                atual = candidato
+        linhas.append(atual)
+    return linhas
+
+
+def text_appearance(annot, text, metrics, default_da=None):
+    """
+    Monta o conteúdo do appearance stream de um campo de texto, no mesmo
+    layout que os visualizadores usam (recorte de 1pt, margem de 2pt)
+    :param annot: anotação do campo no template (/Rect, /DA, /Q, /Ff, /MaxLen)
+    :param text: valor do campo
+    :param metrics: FontMetrics da fonte do /DA
+    :return: (bytes do conteúdo, largura, altura)
+    """
+    x0, y0, x1, y1 = (float(v) for v in annot['/Rect'])
+    width, height = abs(x1 - x0), abs(y1 - y0)
+    font_name, size, resto = parse_da(annot.get('/DA') or default_da)
+    flags = int(annot.get('/Ff', 0))
+    quadding = int(annot.get('/Q', 0))
+    data = metrics.encode('' if flags & _FF_PASSWORD else str(text))
+
+    if size == 0:
+        size = min(_AUTO_FONT_MAX, (height - 4) * 1000 / (metrics.ascent - metrics.descent))
+        if not flags & _FF_MULTILINE and data:
+            size = min(size, (width - 4) / max(metrics.width(data, 1), 1e-6))
+        size = max(size, 4)
+
+    content = [
+        b'/Tx BMC',
+        b'q',
+        f'1 1 {_num(width - 2)} {_num(height - 2)} re'.encode(),
+        b'W',
+        b'n',
+        b'BT',
+        f'{font_name} {_num(size)} Tf {resto}'.strip().encode(),
+    ]
+    max_len = int(annot.get('/MaxLen', 0))
+    if flags & _FF_COMB and max_len and not flags & (_FF_MULTILINE | _FF_PASSWORD):
+        # Campo "comb": um caractere centralizado em cada célula
+        cell = width / max_len
+        y = (height - metrics.cap_height * size / 1000) / 2
+        anterior = 0.0
+        for i, byte in enumerate(data[:max_len]):
+            char = bytes((byte,))
+            x = i * cell + (cell - metrics.width(char, size)) / 2
+            content.append(f'{_num(x - anterior)} {_num(y if i == 0 else 0)} Td'.encode())
+            content.append(b'(' + _escape(char) + b') Tj')
+            anterior = x
+    else:
+        if flags & _FF_MULTILINE:
+            linhas = _wrap(data, metrics, size, width - 4)
+            leading = size * (metrics.ascent - metrics.descent) / 1000
+            y = height - 2 - metrics.ascent * size / 1000
+        else:
+            linhas = [data]
+            leading = 0
+            y = (height - metrics.cap_height * size / 1000) / 2
+        anterior_x, anterior_y = 0.0, 0.0
+        for linha in linhas:
+            largura = metrics.width(linha, size)
+            if quadding == 1:
+                x = (width - largura) / 2
+            elif quadding == 2:
+                x = width - 2 - largura
+            else:
+                x = 2
+            content.append(f'{_num(x - anterior_x)} {_num(y - anterior_y)} Td'.encode())
+            content.append(b'(' + _escape(linha) + b') Tj')
+            anterior_x, anterior_y = x, y
+            y -= leading
+    content += [b'ET', b'Q', b'EMC', b'']
+    return b'\n'.join(content), width, height
+
+
+def appearance_stream(content, width, height, font_name, font_ref):
+    """Form XObject do appearance stream gerado"""
+    stream = DecodedStreamObject()
+    stream.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): ArrayObject([FloatObject(0), FloatObject(0), FloatObject(width), FloatObject(height)]),
+        NameObject('/Resources'): DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject(font_name): font_ref}),
+        }),
+    })
+    stream.set_data(content)
+    return stream
+
+
+def placement_matrix(rect, bbox, matrix=None):
+    """
+    Matriz que posiciona um appearance stream sobre o /Rect da anotação ao
+    achatá-lo na página (algoritmo de PDF 12.5.5)
+    """
+    a, b, c, d, e, f = (float(v) for v in (matrix or (1, 0, 0, 1, 0, 0)))
+    bx0, by0, bx1, by1 = (float(v) for v in bbox)
+    pontos = [(x * a + y * c + e, x * b + y * d + f) for x in (bx0, bx1) for y in (by0, by1)]
+    xs, ys = [p[0] for p in pontos], [p[1] for p in pontos]
+    rx0, ry0, rx1, ry1 = (float(v) for v in rect)
+    rx0, rx1 = min(rx0, rx1), max(rx0, rx1)
+    ry0, ry1 = min(ry0, ry1), max(ry0, ry1)
+    sx = (rx1 - rx0) / (max(xs) - min(xs)) if max(xs) != min(xs) else 1
+    sy = (ry1 - ry0) / (max(ys) - min(ys)) if max(ys) != min(ys) else 1
+    return sx, sy, rx0 - min(xs) * sx, ry0 - min(ys) * sy
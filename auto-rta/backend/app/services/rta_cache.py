@@ -0,0 +1,213 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+def rta_cache_key(data, output_mode, template_checksum, appearance='viewer'):
+    """
+    Chave de conteúdo de um RTA: hash do payload normalizado (JSON com chaves
+    ordenadas), dos modos de saída e aparência e do checksum do template usado
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    h = hashlib.sha256()
+    h.update(template_checksum.encode())
+    h.update(b'\0')
+    h.update(output_mode.encode())
+    h.update(b'\0')
+    h.update(appearance.encode())
+    h.update(b'\0')
+    h.update(payload.encode('utf-8'))
+    return h.hexdigest()
+
+
+class RTACache:
+    """
+    Cache de PDFs gerados, endereçado pelo conteúdo (rta_cache_key).
+
+    Nível em memória LRU limitado por bytes e, opcionalmente, um nível em
+    disco. Requisições simultâneas para a mesma chave são agrupadas
+    (single-flight): só a primeira preenche o PDF, as demais aguardam o
+    resultado dela.
+    """
+
+    def __init__(self, max_bytes, directory=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight = {}
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pdf')
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+            self._put_memory(key, data)
+            return data
+        return None
+
+    def _put_memory(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _put_disk(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self.disk_max_bytes and self._disk_writes % 32 == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove os arquivos mais antigos até o diretório caber em disk_max_bytes"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def put(self, key, data):
+        self._put_memory(key, data)
+        if self.directory:
+            self._put_disk(key, data)
+
+    def get_or_create(self, key, produce):
+        """
+        Retorna o PDF da chave, gerando-o com produce() se não estiver em cache
+        :return: (bytes do PDF, True se veio do cache ou de outra requisição em andamento)
+        """
+        data = self.get(key)
+        if data is not None:
+            return data, True
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = Future()
+                self._inflight[key] = flight
+        if not leader:
+            return flight.result(), True
+
+        try:
+            data = produce()
+            self.put(key, data)
+            flight.set_result(data)
+            return data, False
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_or_stream(self, key, render):
+        """
+        Como get_or_create, mas a resposta recebe as partes do PDF em vez do
+        arquivo montado: numa falta o cache é preenchido assim que render()
+        termina e as partes seguem para o cliente, sem depender de a resposta
+        ser consumida ou fechada
+        :param render: função () -> (tamanho, lista de partes bytes na ordem do arquivo)
+        :return: (tamanho, corpo: bytes ou iterável de partes, True se veio do cache
+            ou de outra requisição em andamento)
+        """
+        data = self.get(key)
+        if data is not None:
+            return len(data), data, True
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = Future()
+                self._inflight[key] = flight
+        if not leader:
+            data = flight.result()
+            return len(data), data, True
+
+        try:
+            tamanho, parts = render()
+            data = b"".join(parts)
+            self.put(key, data)
+            flight.set_result(data)
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return tamanho, iter(parts), False
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_rta_cache(config):
+    """Retorna o cache configurado (RTA_CACHE_MAX_MB > 0) ou None se desligado"""
+    global _cache
+    max_mb = config.get('RTA_CACHE_MAX_MB') or 0
+    if max_mb <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RTACache(
+                    max_mb * 1024 * 1024,
+                    directory=config.get('RTA_CACHE_DIR') or None,
+                    disk_max_bytes=(config.get('RTA_CACHE_DISK_MAX_MB') or 0) * 1024 * 1024,
+                )
+    return _cache
@@ -0,0 +1,283 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+"""
+
+# Tentativas antes de desistir de um job cujo processo morreu no meio
+_MAX_ATTEMPTS = 3
+# Intervalo da limpeza por TTL e da recuperação de jobs abandonados
+_MAINTENANCE_INTERVAL = 30
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+
+class RTAJobQueue:
+    """
+    Fila assíncrona de RTAs com jobs e resultados persistidos em disco.
+
+    Os jobs ficam numa tabela SQLite e os PDFs em arquivos no mesmo diretório,
+    então sobrevivem a reinícios dos workers. Cada processo tem um despachante
+    que reserva jobs da fila (com prazo de lease) e os executa num pool de
+    threads; qualquer worker do gunicorn pode concluir um job criado por outro.
+    Jobs cujo lease expira (processo morreu) voltam para a fila.
+    """
+
+    def __init__(self, directory, gerar, workers=2, ttl=3600, max_queued=1000, lease=300):
+        self.directory = directory
+        self.gerar = gerar
+        self.workers = workers
+        self.ttl = ttl
+        self.max_queued = max_queued
+        self.lease = lease
+        self._db_path = os.path.join(directory, 'jobs.sqlite3')
+        self._results = os.path.join(directory, 'results')
+        os.makedirs(self._results, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._wake = threading.Event()
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self._db_path, timeout=30, isolation_level=None))
+
+    def _ensure_started(self):
+        # Threads não sobrevivem ao fork (preload do gunicorn): um despachante por processo
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='rta-job')
+                    self._slots = threading.BoundedSemaphore(self.workers)
+                    self._wake = threading.Event()
+                    threading.Thread(target=self._dispatch, name='rta-job-dispatch', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def result_path(self, job_id):
+        return os.path.join(self._results, f'{job_id}.pdf')
+
+    def submit(self, params, filename):
+        """
+        Enfileira um job
+        :param params: dict serializável em JSON repassado para gerar(params)
+        :param filename: nome do arquivo para o download
+        :return: dict do job, ou None se a fila estiver cheia
+        """
+        self._ensure_started()
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            queued = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                db.execute('ROLLBACK')
+                return None
+            db.execute(
+                "INSERT INTO jobs (id, status, params, filename, created) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(params, default=str), filename, time.time())
+            )
+            db.execute('COMMIT')
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Estado do job (dict) ou None se não existir ou já tiver expirado"""
+        self._ensure_started()
+        with self._connect() as db:
+            row = db.execute(
+                'SELECT id, status, filename, created, started, finished, attempts, size, error FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(('id', 'status', 'filename', 'created', 'started', 'finished', 'attempts', 'size', 'error'), row))
+        if job['finished'] and job['finished'] < time.time() - self.ttl:
+            return None
+        return job
+
+    def stats(self):
+        """Profundidade da fila e latências (espera e execução) dos jobs recentes"""
+        self._ensure_started()
+        agora = time.time()
+        with self._connect() as db:
+            contagem = dict(db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            mais_antigo = db.execute("SELECT MIN(created) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            recentes = db.execute(
+                "SELECT created, started, finished FROM jobs WHERE status IN ('done', 'error') "
+                "AND started IS NOT NULL ORDER BY finished DESC LIMIT 500"
+            ).fetchall()
+
+        def resumo(valores):
+            return {
+                'count': len(valores),
+                'p50_ms': _percentil(valores, 50),
+                'p95_ms': _percentil(valores, 95),
+                'max_ms': max(valores) if valores else None,
+            }
+
+        espera = [round((started - created) * 1000, 1) for created, started, _ in recentes]
+        execucao = [round((finished - started) * 1000, 1) for _, started, finished in recentes]
+        return {
+            'queue': {
+                'queued': contagem.get('queued', 0),
+                'running': contagem.get('running', 0),
+                'done': contagem.get('done', 0),
+                'error': contagem.get('error', 0),
+                'oldest_queued_age_s': round(agora - mais_antigo, 1) if mais_antigo else None,
+                'max_queued': self.max_queued,
+                'workers_per_process': self.workers,
+            },
+            'latency': {
+                'wait': resumo(espera),
+                'run': resumo(execucao),
+            },
+        }
+
+    def _dispatch(self):
+        ultima_manutencao = 0
+        while True:
+            if time.time() - ultima_manutencao > _MAINTENANCE_INTERVAL:
+                try:
+                    self._maintenance()
+                except sqlite3.Error:
+                    logger.exception('Erro na manutenção da fila de RTAs')
+                ultima_manutencao = time.time()
+
+            self._slots.acquire()
+            try:
+                job = self._claim()
+            except sqlite3.Error:
+                logger.exception('Erro ao reservar job de RTA')
+                job = None
+            if job is None:
+                self._slots.release()
+                # Acordado na hora por submit() deste processo; jobs de outros
+                # processos são vistos na próxima consulta
+                self._wake.wait(timeout=1.0)
+                self._wake.clear()
+                continue
+            self._executor.submit(self._run, *job)
+
+    def _claim(self):
+        agora = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute(
+                "SELECT id, params FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', started = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (agora, agora + self.lease, row[0])
+            )
+            db.execute('COMMIT')
+        return row[0], json.loads(row[1])
+
+    def _run(self, job_id, params):
+        try:
+            try:
+                pdf_bytes = self.gerar(params)
+                path = self.result_path(job_id)
+                fd, tmp = tempfile.mkstemp(dir=self._results, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(pdf_bytes)
+                os.replace(tmp, path)
+                status, size, error = 'done', len(pdf_bytes), None
+            except Exception as e:
+                logger.exception('Erro ao gerar RTA do job', extra={'job_id': job_id})
+                status, size, error = 'error', None, f'Erro interno: {str(e)}'
+            with self._connect() as db:
+                db.execute(
+                    'UPDATE jobs SET status = ?, finished = ?, size = ?, error = ?, lease_until = NULL WHERE id = ?',
+                    (status, time.time(), size, error, job_id)
+                )
+        finally:
+            self._slots.release()
+
+    def _maintenance(self):
+        """Devolve à fila jobs com lease vencido e remove os expirados pelo TTL"""
+        agora = time.time()
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ? AND attempts < ?",
+                (agora, _MAX_ATTEMPTS)
+            )
+            db.execute(
+                "UPDATE jobs SET status = 'error', finished = ?, error = 'Job interrompido repetidamente', "
+                "lease_until = NULL WHERE status = 'running' AND lease_until < ?",
+                (agora, agora)
+            )
+            expirados = [row[0] for row in db.execute(
+                "SELECT id FROM jobs WHERE status != 'running' AND COALESCE(finished, created) < ?",
+                (agora - self.ttl,)
+            ).fetchall()]
+            db.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in expirados])
+        for job_id in expirados:
+            try:
+                os.unlink(self.result_path(job_id))
+            except OSError:
+                pass
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_rta_jobs(config, gerar):
+    """
+    Retorna a fila de jobs do processo (criada no primeiro uso)
+    :param gerar: função params -> bytes do PDF executada pelos workers da fila
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = RTAJobQueue(
+                    config.get('RTA_JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'auto-rta-jobs'),
+                    gerar,
+                    workers=config.get('RTA_JOBS_WORKERS') or 2,
+                    ttl=config.get('RTA_JOBS_TTL_SECONDS') or 3600,
+                    max_queued=config.get('RTA_JOBS_MAX_QUEUED') or 1000,
+                )
+    return _queue
+
+
+def iniciar_rta_jobs():
+    """
+    Inicia o despachante da fila neste processo, se ela já existe (create_app),
+    para retomar jobs enfileirados antes de um reinício sem esperar uma requisição
+    """
+    if _queue is not None:
+        _queue._ensure_started()
@@ -0,0 +1,89 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
+import os
+import threading
+
+# RTAService do processo filho (criado pelo initializer do pool)
+_service = None
+
+
+def _init_worker():
+    """Cada processo do pool carrega seus próprios templates uma única vez"""
+    global _service
+    from app.services.rta_service import RTAService
+    _service = RTAService()
+    _service.warm_up()
+
+
+def _preencher(data, incremental, appearance):
+    return _service.preencher_rta(data, incremental=incremental, appearance=appearance).getvalue()
+
+
+class RTAPool:
+    """
+    Pool persistente de processos para o preenchimento de RTAs.
+
+    O preenchimento é CPU-bound em Python puro (pypdf), então threads de um
+    mesmo worker do gunicorn disputam o GIL; o pool distribui os jobs entre
+    processos que mantêm os templates pré-carregados e devolvem os bytes do PDF.
+    """
+
+    def __init__(self, workers, max_tasks_per_child=None):
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Após um fork (gunicorn) o executor herdado não é utilizável
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        max_tasks_per_child=self.max_tasks_per_child,
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, data, incremental=False, appearance='viewer'):
+        """Envia um preenchimento ao pool; o Future resolve para os bytes do PDF"""
+        try:
+            return self._get_executor().submit(_preencher, data, incremental, appearance)
+        except BrokenProcessPool:
+            # Um processo filho morreu: recria o pool e tenta de novo
+            with self._lock:
+                self._executor = None
+            return self._get_executor().submit(_preencher, data, incremental, appearance)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_rta_pool(config):
+    """
+    Retorna o pool configurado (RTA_POOL_WORKERS > 0) ou None para preencher
+    na própria thread da requisição
+    """
+    global _pool
+    workers = config.get('RTA_POOL_WORKERS') or 0
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RTAPool(workers, config.get('RTA_POOL_MAX_TASKS_PER_CHILD'))
+                atexit.register(_pool.shutdown, False)
+    return _pool
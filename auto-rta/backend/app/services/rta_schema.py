@@ -0,0 +1,235 @@
+import calendar
+import hashlib
+import json
+import re
+
+INSURANCE_COMPANIES = ['allstate', 'progressive', 'geico', 'liberty']
+
+# Cores com checkbox no formulário RTA ('Other' deixa todas desmarcadas)
+COLORS = [
+    'Black', 'White', 'Brown', 'Blue', 'Yellow', 'Gray',
+    'Purple', 'Green', 'Orange', 'Red', 'Silver', 'Gold', 'Other'
+]
+
+YEAR_MIN = 1900
+YEAR_MAX = 2030
+
+# Campos obrigatórios apenas quando o veículo está quitado
+_PAID_OFF = ('vehicle_financing_status', 'paid_off')
+
+# Esquema declarativo do payload do RTA. Cada entrada:
+#   name, type (string|date|number|select|vin|year), label
+#   placeholder / options (exibidos pelo /api/rta/fields)
+#   required: True, False ou (campo, valor) para obrigatoriedade condicional
+#   message: erro para valor fora de options
+RTA_SCHEMA = [
+    {'name': 'insurance_company', 'type': 'select', 'label': 'Seguradora',
+     'options': INSURANCE_COMPANIES, 'required': True,
+     'message': 'Seguradora deve ser "allstate", "progressive", "geico" ou "liberty"'},
+
+    {'name': 'owner_name', 'type': 'string', 'label': 'Nome do Proprietário',
+     'placeholder': 'Sobrenome, Nome, Nome do Meio', 'required': True},
+    {'name': 'owner_dob', 'type': 'date', 'label': 'Data de Nascimento',
+     'placeholder': 'YYYY-MM-DD', 'required': True},
+    {'name': 'owner_license', 'type': 'string', 'label': 'CNH/Driver License',
+     'placeholder': 'Número da carteira de motorista', 'required': True},
+    {'name': 'owner_street', 'type': 'string', 'label': 'Rua do Proprietário',
+     'placeholder': 'Rua e número', 'required': True},
+    {'name': 'owner_city', 'type': 'string', 'label': 'Cidade do Proprietário',
+     'placeholder': 'Ex: East Falmouth', 'required': True},
+    {'name': 'owner_state', 'type': 'string', 'label': 'Estado do Proprietário',
+     'placeholder': 'Ex: MA, CA, FL', 'required': True},
+    {'name': 'owner_zipcode', 'type': 'string', 'label': 'CEP do Proprietário',
+     'placeholder': 'Ex: 02536', 'required': True},
+    {'name': 'owner_license_issued_state', 'type': 'string', 'label': 'Estado Emissor da CNH',
+     'placeholder': 'Ex: MA, CA, FL', 'required': True},
+
+    {'name': 'vin', 'type': 'vin', 'label': 'VIN',
+     'placeholder': '17 caracteres', 'required': True},
+    {'name': 'body_style', 'type': 'string', 'label': 'Tipo de Carroceria',
+     'placeholder': 'Ex: Sedan, SUV, Hatchback', 'required': True},
+    {'name': 'color', 'type': 'select', 'label': 'Cor', 'options': COLORS, 'required': True,
+     'message': f'Cor inválida. Cores válidas: {", ".join(COLORS)}'},
+    {'name': 'year', 'type': 'year', 'label': 'Ano', 'placeholder': '2024', 'required': True},
+    {'name': 'make', 'type': 'string', 'label': 'Marca',
+     'placeholder': 'Ex: Toyota, Honda, Ford', 'required': True},
+    {'name': 'model', 'type': 'string', 'label': 'Modelo',
+     'placeholder': 'Ex: Corolla, Civic, Focus', 'required': True},
+    {'name': 'cylinders', 'type': 'number', 'label': 'Cilindros',
+     'placeholder': 'Número de cilindros do motor', 'required': True},
+    {'name': 'passengers', 'type': 'number', 'label': 'Passageiros',
+     'placeholder': 'Número de passageiros', 'required': True},
+    {'name': 'doors', 'type': 'number', 'label': 'Portas',
+     'placeholder': 'Número de portas', 'required': True},
+    {'name': 'odometer', 'type': 'number', 'label': 'Quilometragem',
+     'placeholder': 'Milhas no odômetro', 'required': True},
+
+    {'name': 'seller_name', 'type': 'string', 'label': 'Nome do Vendedor',
+     'placeholder': 'Nome completo do vendedor', 'required': True},
+    {'name': 'seller_street', 'type': 'string', 'label': 'Rua do Vendedor',
+     'placeholder': 'Rua e número', 'required': True},
+    {'name': 'seller_city', 'type': 'string', 'label': 'Cidade do Vendedor',
+     'placeholder': 'Ex: Boston', 'required': True},
+    {'name': 'seller_state', 'type': 'string', 'label': 'Estado do Vendedor',
+     'placeholder': 'Ex: MA, CA, FL', 'required': True},
+    {'name': 'seller_zipcode', 'type': 'string', 'label': 'CEP do Vendedor',
+     'placeholder': 'Ex: 02110', 'required': True},
+    {'name': 'gross_sale_price', 'type': 'number', 'label': 'Preço de Venda',
+     'placeholder': 'Ex: 25000', 'required': True},
+    {'name': 'purchase_date', 'type': 'date', 'label': 'Data de Compra',
+     'placeholder': 'YYYY-MM-DD', 'required': True},
+    {'name': 'insurance_effective_date', 'type': 'date', 'label': 'Data Início do Seguro',
+     'placeholder': 'YYYY-MM-DD', 'required': True},
+    {'name': 'insurance_policy_change_date', 'type': 'date', 'label': 'Data Alteração da Apólice',
+     'placeholder': 'YYYY-MM-DD', 'required': True},
+
+    {'name': 'vehicle_financing_status', 'type': 'select', 'label': 'Status do Financiamento',
+     'options': ['financed', 'paid_off'], 'required': True,
+     'message': 'Status do financiamento deve ser "financed" ou "paid_off"'},
+    {'name': 'previous_title_number', 'type': 'string', 'label': 'Número do Título Anterior',
+     'placeholder': 'Número do título anterior', 'required': _PAID_OFF},
+    {'name': 'previous_title_state', 'type': 'string', 'label': 'Estado do Título Anterior',
+     'placeholder': 'Estado emissor do título anterior', 'required': _PAID_OFF},
+    {'name': 'previous_title_country', 'type': 'string', 'label': 'País do Título Anterior',
+     'placeholder': 'País emissor do título anterior', 'required': _PAID_OFF},
+]
+
+# Mesma tolerância do strptime('%Y-%m-%d'): mês e dia com um ou dois dígitos
+_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+_INT_RE = re.compile(r'\s*[+-]?\d+\s*')
+# VIN: 17 caracteres alfanuméricos, sem I, O e Q
+_VIN_RE = re.compile(r'[A-HJ-NPR-Z0-9]{17}')
+
+# Dígito verificador do VIN (posição 9, padrão norte-americano)
+_VIN_VALUES = dict(zip('ABCDEFGHJKLMNPRSTUVWXYZ', (1, 2, 3, 4, 5, 6, 7, 8, 1, 2, 3, 4, 5, 7, 9, 2, 3, 4, 5, 6, 7, 8, 9)))
+_VIN_VALUES.update({str(d): d for d in range(10)})
+_VIN_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def _vazio(value):
+    return value is None or value == ''
+
+
+def _data_valida(value):
+    if not isinstance(value, str):
+        return False
+    m = _DATE_RE.fullmatch(value)
+    if not m:
+        return False
+    ano, mes, dia = (int(g) for g in m.groups())
+    return ano >= 1 and 1 <= mes <= 12 and 1 <= dia <= calendar.monthrange(ano, mes)[1]
+
+
+def _inteiro(value):
+    """Inteiro como o int() aceitaria (número ou texto numérico), ou None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and _INT_RE.fullmatch(value):
+        return int(value)
+    return None
+
+
+def _vin_digito_ok(vin):
+    total = sum(_VIN_VALUES[c] * w for c, w in zip(vin, _VIN_WEIGHTS)) % 11
+    return vin[8] == ('X' if total == 10 else str(total))
+
+
+def _regra(campo):
+    """Descrição textual das regras do campo (chave 'validation' do /fields)"""
+    regras = []
+    if campo['required'] is True:
+        regras.append('required')
+    elif campo['required']:
+        regras.append('required_if:{},{}'.format(*campo['required']))
+    if campo['type'] == 'vin':
+        regras.append('length:17')
+    elif campo['type'] == 'year':
+        regras += [f'min:{YEAR_MIN}', f'max:{YEAR_MAX}']
+    elif campo['type'] == 'date':
+        regras.append('date:YYYY-MM-DD')
+    elif campo['type'] == 'select':
+        regras.append('in:' + ','.join(campo['options']))
+    return '|'.join(regras)
+
+
+class RTAValidator:
+    """
+    Validador compilado a partir do RTA_SCHEMA: listas de obrigatórios e
+    checagens por tipo montadas uma única vez, reutilizadas a cada requisição
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._required = tuple(c['name'] for c in schema if c['required'] is True)
+        self._conditional = tuple((c['name'],) + tuple(c['required']) for c in schema
+                                  if c['required'] and c['required'] is not True)
+        self._options = tuple((c['name'], frozenset(c['options']), c['message'])
+                              for c in schema if c['type'] == 'select')
+        self._dates = tuple(c['name'] for c in schema if c['type'] == 'date')
+        self._years = tuple(c['name'] for c in schema if c['type'] == 'year')
+        self._vins = tuple(c['name'] for c in schema if c['type'] == 'vin')
+
+        fields = {'required': [], 'optional': []}
+        for campo in schema:
+            item = {k: campo[k] for k in ('name', 'type', 'label', 'placeholder', 'options') if k in campo}
+            item['validation'] = _regra(campo)
+            fields['required' if campo['required'] is True else 'optional'].append(item)
+        self.fields_json = json.dumps(fields, ensure_ascii=False, indent=2).encode('utf-8') + b'\n'
+        self.fields_etag = hashlib.sha256(self.fields_json).hexdigest()[:32]
+
+    def missing(self, data):
+        """Campos obrigatórios (inclusive os condicionais) ausentes ou vazios, na ordem do esquema"""
+        faltando = [f for f in self._required if _vazio(data.get(f))]
+        for field, depende, valor in self._conditional:
+            if data.get(depende) == valor and _vazio(data.get(field)):
+                faltando.append(field)
+        return faltando
+
+    def validate(self, data):
+        """
+        Validação completa do payload
+        :return: (erros, avisos) como listas de mensagens
+        """
+        errors = [f'Campo obrigatório: {field}' for field in self.missing(data)]
+        warnings = []
+
+        for field in self._vins:
+            value = data.get(field)
+            if _vazio(value):
+                continue
+            vin = str(value).upper()
+            if len(vin) != 17:
+                errors.append('VIN deve ter exatamente 17 caracteres')
+            elif not _VIN_RE.fullmatch(vin):
+                errors.append('VIN contém caracteres inválidos (I, O e Q não são permitidos)')
+            elif not _vin_digito_ok(vin):
+                # Veículos fora da América do Norte não seguem o dígito verificador
+                warnings.append('Dígito verificador do VIN não confere')
+
+        for field in self._years:
+            value = data.get(field)
+            if _vazio(value):
+                continue
+            year = _inteiro(value)
+            if year is None:
+                errors.append('Ano deve ser um número válido')
+            elif year < YEAR_MIN or year > YEAR_MAX:
+                errors.append(f'Ano deve estar entre {YEAR_MIN} e {YEAR_MAX}')
+
+        for field in self._dates:
+            value = data.get(field)
+            if not _vazio(value) and not _data_valida(value):
+                errors.append(f'Data inválida para {field}. Use formato YYYY-MM-DD')
+
+        for field, opcoes, mensagem in self._options:
+            value = data.get(field)
+            # Listas e objetos não são hasheáveis: valor fora das opções, não erro 500
+            if not _vazio(value) and (not isinstance(value, str) or value not in opcoes):
+                errors.append(mensagem)
+
+        return errors, warnings
+
+
+rta_validator = RTAValidator(RTA_SCHEMA)
@@ -1,9 +1,14 @@
 from datetime import datetime
-from pypdf import PdfReader, PdfWriter
 from pypdf.generic import NameObject, NumberObject, TextStringObject
+from app.services.rta_template import RTATemplateCache
+from app.util.metricas import medir
+import hashlib
 import io
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 class RTAService:
     def __init__(self):
         # Obter caminho absoluto para os templates
@@ -16,14 +21,44 @@ class RTAService:
             'geico': os.path.join(assets_dir, 'rta_template_geico.pdf'),
             'liberty': os.path.join(assets_dir, 'rta_template_liberty.pdf')
         }
+        # Templates são lidos uma vez por processo e reutilizados entre requisições
+        self._template_cache = RTATemplateCache()
+        self._checksums = {}
         
     def get_template_path(self, insurance_company):
         """Retorna o caminho do template baseado na seguradora"""
         template_path = self.templates.get(insurance_company, self.templates['allstate'])
-        print(f"DEBUG: Tentando acessar template: {template_path}")
-        print(f"DEBUG: Arquivo existe: {os.path.exists(template_path)}")
+        logger.debug('Template selecionado', extra={'insurance_company': insurance_company, 'template': template_path})
         return template_path
 
+    def get_template(self, insurance_company):
+        """Retorna o template pré-processado (carregado na primeira chamada)"""
+        return self._template_cache.get(self.get_template_path(insurance_company))
+
+    def template_checksum(self, insurance_company):
+        """SHA-256 do arquivo do template (sem precisar carregá-lo com o pypdf)"""
+        path = self.get_template_path(insurance_company)
+        checksum = self._checksums.get(path)
+        if checksum is None:
+            with open(path, 'rb') as f:
+                checksum = hashlib.sha256(f.read()).hexdigest()
+            self._checksums[path] = checksum
+        return checksum
+
+    def field_report(self, insurance_company):
+        """Relatório de cobertura entre os campos do template e os campos preenchidos"""
+        return self.get_template(insurance_company).field_report(self._montar_campos({}))
+
+    def warm_up(self, flatten=False):
+        """
+        Carrega todos os templates antecipadamente (chamado na criação do app;
+        com o preload do gunicorn isso acontece no master, antes do fork)
+        :param flatten: também monta as estruturas do modo de aparência 'flatten'
+        """
+        for path in self.templates.values():
+            template = self._template_cache.get(path)
+            if flatten:
+                template.flatten_plan()
 
     def _format_date(self, date_value):
         """Formata data para MM/DD/YYYY ou retorna string vazia se inválida"""
@@ -51,39 +86,61 @@ class RTAService:
         """Marca a cor correta no PDF"""
         return NameObject("/On") if selected_color == target_color else NameObject("/Off")
 
-    def preencher_rta(self, data):
+    def preencher_rta(self, data, incremental=False, appearance='viewer'):
         """
         Preenche o RTA com base nos dados fornecidos
         :param data: Dicionário com os dados do formulário
+        :param incremental: se True, gera o PDF como atualização incremental do template
+        :param appearance: 'viewer', 'server' ou 'flatten' (ver RTADocument.render)
         :return: BytesIO object com o PDF preenchido
         """
+        pdf_io = io.BytesIO()
+        documento = self.preparar_rta(data)
+        with medir('serialize'):
+            documento.write(pdf_io, incremental=incremental, appearance=appearance)
+        pdf_io.seek(0)
+        return pdf_io
+
+    def preparar_rta(self, data):
+        """
+        Preenche os campos do RTA sem serializar o PDF
+        :param data: Dicionário com os dados do formulário
+        :return: RTADocument (use render() para obter as partes do arquivo)
+        """
         # Determinar qual template usar
         insurance_company = data.get('insurance_company', 'allstate')
-        template_path = self.get_template_path(insurance_company)
-        
-        reader = PdfReader(template_path)
-        writer = PdfWriter()
-        writer.append(reader)
+        with medir('parse'):
+            template = self.get_template(insurance_company)
 
-        # Debug: verificar se a data de nascimento está sendo processada
-        owner_dob_value = data.get('owner_dob', '')
-        print(f"DEBUG RTA Service - owner_dob: {owner_dob_value} (tipo: {type(owner_dob_value)})")
-        formatted_dob = self._format_date(owner_dob_value)
-        print(f"DEBUG RTA Service - Data formatada: '{formatted_dob}'")
-        
-        # Debug: verificar campos extras do veículo
-        print(f"DEBUG - Campos extras recebidos:")
-        print(f"  Year: {data.get('year', 'N/A')}")
-        print(f"  Make: {data.get('make', 'N/A')}")
-        print(f"  Model: {data.get('model', 'N/A')}")
-        print(f"  Cylinders: {data.get('cylinders', 'N/A')}")
-        print(f"  Passengers: {data.get('passengers', 'N/A')}")
-        print(f"  Doors: {data.get('doors', 'N/A')}")
-        print(f"  Odometer: {data.get('odometer', 'N/A')}")
-        print(f"  Previous Title Number: {data.get('previous_title_number', 'N/A')}")
-        print(f"  Previous Title State: {data.get('previous_title_state', 'N/A')}")
-        print(f"  Previous Title Country: {data.get('previous_title_country', 'N/A')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Só monta o dict com o DEBUG ligado; PII é mascarada pelo formatter
+            logger.debug('Preenchendo RTA', extra={'rta': {
+                key: data.get(key) for key in (
+                    'insurance_company', 'owner_dob', 'vin', 'year', 'make', 'model', 'cylinders',
+                    'passengers', 'doors', 'odometer', 'previous_title_number', 'previous_title_state',
+                    'previous_title_country', 'owner_street', 'owner_city', 'owner_state', 'owner_zipcode',
+                    'seller_street', 'seller_city', 'seller_state', 'seller_zipcode',
+                )
+            }})
+
+        with medir('fill'):
+            documento = template.clone()
+            campos = self._montar_campos(data)
+
+            # Preenche apenas as anotações indexadas dos campos conhecidos
+            for field_name, value in campos.items():
+                for campo in template.fields.get(field_name, ()):
+                    valores = {NameObject("/Ff"): NumberObject(0)}
+                    if campo.field_type == "/Btn":
+                        valores.update({NameObject("/V"): value, NameObject("/AS"): value})
+                    elif campo.field_type == "/Tx":
+                        valores.update({NameObject("/V"): TextStringObject(str(value))})
+                    documento.update_field(campo, valores)
+
+        return documento
 
+    def _montar_campos(self, data):
+        """Monta o dicionário nome do campo no PDF -> valor a partir dos dados do formulário"""
         # Endereço do vendedor - usando campos separados
         seller_rua = str(data.get('seller_street', ''))
         seller_cidade = str(data.get('seller_city', ''))
@@ -96,10 +153,6 @@ class RTAService:
         endereco_estado = str(data.get('owner_state', ''))
         endereco_cep = str(data.get('owner_zipcode', ''))
         
-        print(f"DEBUG - Endereços separados:")
-        print(f"  Seller: {seller_rua}, {seller_cidade}, {seller_estado}, {seller_cep}")
-        print(f"  Owner: {endereco_rua}, {endereco_cidade}, {endereco_estado}, {endereco_cep}")
-
         # Campos do PDF
         campos = {
             # Seller Info
@@ -117,7 +170,7 @@ class RTAService:
             "(K3) Effective Date of Insurance": self._format_date(data.get('insurance_effective_date', '')),
             # Owner 1 Information
             "(D2) (First Owner's) Name (Last, First, Middle)": str(data.get('owner_name', '')),
-            "(D3) (Owner 1) Date of Birth (MM [Month]/DD [Day]/YYYY[Year])": formatted_dob,
+            "(D3) (Owner 1) Date of Birth (MM [Month]/DD [Day]/YYYY[Year])": self._format_date(data.get('owner_dob', '')),
             "(D4) (Owner 1) License Number/ ID (Identification) Number / SSN (Social Security Number)": str(data.get('owner_license', '')),
             "(D5) (Owner 1) Residential Address": endereco_rua,
             "(D5) (Owner 1) City": endereco_cidade,
@@ -160,24 +213,4 @@ class RTAService:
             "(B4) Silver": self._color_checkbox(data.get('color', ''), "Silver"),
             "(B4) Gold": self._color_checkbox(data.get('color', ''), "Gold"),
         }
-
-        # Preenche os campos do PDF
-        for page in writer.pages:
-            if "/Annots" in page:
-                for annot in page["/Annots"]:
-                    obj = annot.get_object()
-                    field_name = obj.get("/T")
-                    if field_name and field_name in campos:
-                        value = campos[field_name]
-                        obj.update({NameObject("/Ff"): NumberObject(0)})
-                        field_type = obj.get("/FT")
-                        if field_type == "/Btn":
-                            obj.update({NameObject("/V"): value, NameObject("/AS"): value})
-                        elif field_type == "/Tx":
-                            obj.update({NameObject("/V"): TextStringObject(str(value))})
-        writer.set_need_appearances_writer(True)
-
-        pdf_io = io.BytesIO()
-        writer.write(pdf_io)
-        pdf_io.seek(0)
-        return pdf_io
+        return campos
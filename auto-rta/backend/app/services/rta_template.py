@@ -0,0 +1,657 @@
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject, BooleanObject, ByteStringObject, DecodedStreamObject, DictionaryObject, IndirectObject,
+    NameObject, NumberObject
+)
+from app.services.rta_appearance import (
+    APPEARANCE_MODES, FontMetrics, appearance_stream, parse_da, placement_matrix, text_appearance
+)
+from collections import namedtuple
+import hashlib
+import io
+import mmap
+import re
+import threading
+
+
+# Campo do formulário: número do objeto da anotação no protótipo, tipo
+# (/Tx, /Btn, /Ch) e referência da mesma anotação no arquivo original
+RTAField = namedtuple('RTAField', ['idnum', 'field_type', 'source_ref'])
+
+# Anotação widget a ser desenhada no conteúdo da página ao achatar o
+# formulário: /Rect e aparência normal, um stream (idnum, matriz) ou um
+# dict estado -> (idnum, matriz) para checkboxes
+_FlatWidget = namedtuple('_FlatWidget', ['idnum', 'rect', 'stream', 'states', 'state'])
+_FlatPage = namedtuple('_FlatPage', ['idnum', 'page', 'resources', 'xobjects', 'contents', 'widgets'])
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+
+
+def _serialize(obj):
+    buf = io.BytesIO()
+    obj.write_to_stream(buf)
+    return buf.getvalue()
+
+
+def _indirect_object(idnum, generation, data):
+    return b"".join((f"{idnum} {generation} obj\n".encode(), data, b"\nendobj\n"))
+
+
+def _collect_refs(obj, refs):
+    """Acumula os números de objeto referenciados (recursivo, sem resolver)"""
+    if isinstance(obj, IndirectObject):
+        refs.add(obj.idnum)
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            _collect_refs(value, refs)
+    elif isinstance(obj, list):
+        for value in obj:
+            _collect_refs(value, refs)
+    return refs
+
+
+def _content_stream(data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def _subsections(entries):
+    """Agrupa entradas (idnum, geração, offset) ordenadas em números consecutivos"""
+    grupo = []
+    for entry in entries:
+        if grupo and entry[0] != grupo[-1][0] + 1:
+            yield grupo
+            grupo = []
+        grupo.append(entry)
+    if grupo:
+        yield grupo
+
+
+class RTATemplate:
+    """
+    Template RTA pré-processado, carregado uma única vez por processo.
+
+    O protótipo (PdfWriter já com as páginas anexadas e NeedAppearances
+    ligado) é tratado como somente leitura depois de construído: cada objeto
+    é serializado uma vez e cada requisição recebe um clone (RTADocument) que
+    guarda apenas as anotações que alterou. Assim vários threads podem
+    preencher o mesmo template ao mesmo tempo sem locks.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Arquivo mapeado em memória (somente leitura): as páginas ficam no
+        # page cache do sistema e são compartilhadas entre todos os processos
+        with open(path, 'rb') as f:
+            self.source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.checksum = hashlib.sha256(self.source).hexdigest()
+
+        reader = PdfReader(self.source)
+        # Primeira metade do /ID é fixa por template; a segunda é derivada do
+        # conteúdo preenchido, então o mesmo preenchimento gera os mesmos bytes
+        if "/ID" in reader.trailer:
+            self._id_first = reader.trailer["/ID"][0]
+        else:
+            self._id_first = ByteStringObject(hashlib.md5(self.source).digest())
+        writer = PdfWriter()
+        writer.append(reader)
+        writer.set_need_appearances_writer(True)
+        # write() normaliza as referências indiretas do writer (sweep);
+        # depois disso o protótipo não é mais modificado
+        writer.write(io.BytesIO())
+        self._writer = writer
+        self._lock = threading.Lock()
+        self._flatten = None
+
+        # Índice nome do campo (/T) -> anotações, para o preenchimento não
+        # precisar percorrer todas as /Annots das páginas
+        source_refs = {}
+        for page in reader.pages:
+            if "/Annots" in page:
+                for annot in page.raw_get("/Annots").get_object():
+                    field_name = annot.get_object().get("/T")
+                    if field_name:
+                        source_refs.setdefault(str(field_name), []).append(annot)
+
+        self.fields = {}
+        for annot in self.annotations():
+            obj = self.get_object(annot)
+            field_name = obj.get("/T")
+            if field_name:
+                campos = self.fields.setdefault(str(field_name), [])
+                source_ref = source_refs[str(field_name)][len(campos)]
+                campos.append(RTAField(annot.idnum, obj.get("/FT"), source_ref))
+
+        self._prepare_appearances(reader)
+        self._prepare_full(writer)
+        self._prepare_incremental(reader)
+
+    def _prepare_appearances(self, reader):
+        """
+        Métricas das fontes usadas pelos campos de texto (uma vez por template)
+        e o /AcroForm sem NeedAppearances para o modo de aparências no servidor
+        """
+        writer = self._writer
+        acroform_ref = writer._root_object.raw_get("/AcroForm")
+        acroform = acroform_ref.get_object()
+        self._default_da = acroform.get("/DA")
+
+        fontes = acroform.get("/DR", DictionaryObject()).get_object().get("/Font", DictionaryObject()).get_object()
+        source_acroform = reader.trailer["/Root"]["/AcroForm"]
+        source_fontes = source_acroform.get("/DR", DictionaryObject()).get_object()
+        source_fontes = source_fontes.get("/Font", DictionaryObject()).get_object()
+        self.fonts = {}
+        for campos in self.fields.values():
+            for campo in campos:
+                if campo.field_type != "/Tx":
+                    continue
+                font_name, _, _ = parse_da(self.get_object(campo.idnum).get("/DA") or self._default_da)
+                if font_name and font_name not in self.fonts and font_name in fontes:
+                    self.fonts[font_name] = FontMetrics(
+                        fontes[font_name].get_object(), fontes.raw_get(font_name), source_fontes.raw_get(font_name)
+                    )
+
+        acroform = DictionaryObject(acroform)
+        acroform[NameObject("/NeedAppearances")] = BooleanObject(False)
+        if isinstance(acroform_ref, IndirectObject):
+            self._server_overrides = {acroform_ref.idnum: _indirect_object(acroform_ref.idnum, 0, _serialize(acroform))}
+        else:
+            root = DictionaryObject(writer._root_object)
+            root[NameObject("/AcroForm")] = acroform
+            self._server_overrides = {writer._root.idnum: _indirect_object(writer._root.idnum, 0, _serialize(root))}
+
+    def _prepare_full(self, writer):
+        """
+        Serializa o protótipo em segmentos: blocos de bytes prontos com os
+        objetos que nunca mudam e, entre eles, um segmento por objeto que pode
+        ser substituído (anotações de campo e o /AcroForm). Cada segmento é
+        (idnum substituível ou None, bytes, [(idnum, deslocamento no bloco)]).
+        """
+        field_idnums = {campo.idnum for campos in self.fields.values() for campo in campos}
+        field_idnums.update(self._server_overrides)
+        self.header = writer.pdf_header + b"\n%\xE2\xE3\xCF\xD3\n"
+        self.size = len(writer._objects) + 1
+        self._segments = []
+
+        bloco, posicoes, tamanho = [], [], 0
+        for i, obj in enumerate(writer._objects):
+            if obj is None:
+                continue
+            idnum = i + 1
+            data = _indirect_object(idnum, 0, _serialize(obj))
+            if idnum in field_idnums:
+                if bloco:
+                    self._segments.append((None, b"".join(bloco), posicoes))
+                    bloco, posicoes, tamanho = [], [], 0
+                self._segments.append((idnum, data, [(idnum, 0)]))
+            else:
+                bloco.append(data)
+                posicoes.append((idnum, tamanho))
+                tamanho += len(data)
+        if bloco:
+            self._segments.append((None, b"".join(bloco), posicoes))
+
+        self.trailer = DictionaryObject()
+        self.trailer.update({
+            NameObject("/Size"): NumberObject(self.size),
+            NameObject("/Root"): writer._root,
+            NameObject("/Info"): writer._info,
+        })
+
+    def _prepare_incremental(self, reader):
+        """
+        Prepara o necessário para o modo de atualização incremental: as
+        anotações originais, o /AcroForm com NeedAppearances e o trailer
+        """
+        match = _STARTXREF_RE.search(self.source[-1024:])
+        if not match:
+            raise ValueError(f"startxref não encontrado em {self.path}")
+        self._source_startxref = int(match.group(1))
+        # Templates otimizados (tools/optimize_template.py) usam xref stream;
+        # a atualização deve seguir o mesmo formato da última seção
+        start = self._source_startxref
+        self._source_xref_stream = self.source[start:start + 4] != b"xref"
+        self._source_tail = b"" if self.source[-1:] == b"\n" else b"\n"
+
+        self._source_objects = {}
+        for campos in self.fields.values():
+            for campo in campos:
+                self._source_objects[campo.source_ref.idnum] = campo.source_ref.get_object()
+
+        # O /AcroForm alterado (NeedAppearances) é igual para todo documento
+        root = reader.trailer["/Root"]
+        acroform_ref = root.raw_get("/AcroForm")
+        acroform = DictionaryObject(acroform_ref.get_object())
+        acroform[NameObject("/NeedAppearances")] = BooleanObject(True)
+        if hasattr(acroform_ref, "idnum"):
+            self._source_fixed = [(acroform_ref.idnum, acroform_ref.generation, acroform)]
+        else:
+            root = DictionaryObject(root)
+            root[NameObject("/AcroForm")] = acroform
+            root_ref = reader.trailer.raw_get("/Root")
+            self._source_fixed = [(root_ref.idnum, root_ref.generation, root)]
+        # Com aparências geradas no servidor o visualizador não deve redesenhar
+        idnum, generation, obj = self._source_fixed[0]
+        obj = DictionaryObject(obj)
+        if "/NeedAppearances" in obj:
+            obj[NameObject("/NeedAppearances")] = BooleanObject(False)
+        else:
+            acroform = DictionaryObject(obj["/AcroForm"])
+            acroform[NameObject("/NeedAppearances")] = BooleanObject(False)
+            obj[NameObject("/AcroForm")] = acroform
+        self._source_fixed_server = [(idnum, generation, obj)]
+
+        self._source_trailer = DictionaryObject()
+        for key in ("/Size", "/Root", "/Info"):
+            if key in reader.trailer:
+                self._source_trailer[NameObject(key)] = reader.trailer.raw_get(key)
+        self._source_trailer[NameObject("/Prev")] = NumberObject(self._source_startxref)
+
+    def flatten_plan(self):
+        """Estruturas para achatar o formulário, montadas no primeiro uso"""
+        if self._flatten is None:
+            with self._lock:
+                if self._flatten is None:
+                    self._flatten = self._prepare_flatten()
+        return self._flatten
+
+    def _prepare_flatten(self):
+        """
+        Separa os bytes de cada objeto, o grafo de referências e, por página,
+        as anotações widget que serão desenhadas no conteúdo. Os objetos
+        alcançáveis sem o formulário formam a base do PDF achatado; anotações,
+        /AcroForm e fontes do /DR que só o formulário usa ficam de fora.
+        """
+        writer = self._writer
+        objects = {}
+        for _, data, posicoes in self._segments:
+            for k, (idnum, pos) in enumerate(posicoes):
+                fim = posicoes[k + 1][1] if k + 1 < len(posicoes) else len(data)
+                objects[idnum] = data[pos:fim]
+        graph = {
+            i + 1: _collect_refs(obj, set())
+            for i, obj in enumerate(writer._objects) if obj is not None
+        }
+
+        root = DictionaryObject(writer._root_object)
+        del root["/AcroForm"]
+        overrides = {writer._root.idnum: _collect_refs(root, set())}
+
+        pages = []
+        for page in writer.pages:
+            base = DictionaryObject(page)
+            keep, widgets = ArrayObject(), []
+            for annot_ref in page.get("/Annots", ArrayObject()):
+                annot = annot_ref.get_object()
+                if annot.get("/Subtype") != "/Widget":
+                    keep.append(annot_ref)
+                elif not int(annot.get("/F", 0)) & 0x22 and "/AP" in annot:
+                    widgets.append(self._flat_widget(annot_ref.idnum, annot))
+            if keep:
+                base[NameObject("/Annots")] = keep
+            else:
+                base.pop("/Annots", None)
+
+            resources = DictionaryObject(page.get("/Resources", DictionaryObject()).get_object())
+            xobjects = DictionaryObject(resources.get("/XObject", DictionaryObject()).get_object())
+            contents = page.raw_get("/Contents") if "/Contents" in page else ArrayObject()
+            contents = contents.get_object() if isinstance(contents.get_object(), list) else [contents]
+            idnum = page.indirect_reference.idnum
+            pages.append(_FlatPage(idnum, base, resources, xobjects, list(contents), widgets))
+            overrides[idnum] = _collect_refs(base, set())
+
+        base = set()
+        pendentes = [writer._root.idnum, writer._info.idnum]
+        while pendentes:
+            idnum = pendentes.pop()
+            if idnum not in base and idnum in objects:
+                base.add(idnum)
+                pendentes.extend(overrides.get(idnum, graph[idnum]))
+
+        return {
+            "objects": objects,
+            "graph": graph,
+            "base": base,
+            "pages": pages,
+            "root": (writer._root.idnum, _indirect_object(writer._root.idnum, 0, _serialize(root))),
+        }
+
+    def _flat_widget(self, idnum, annot):
+        rect = [float(v) for v in annot["/Rect"]]
+
+        def entry(ref):
+            stream = ref.get_object()
+            return ref.idnum, placement_matrix(rect, stream["/BBox"], stream.get("/Matrix"))
+
+        normal = annot["/AP"].get("/N")
+        if normal is None:
+            return _FlatWidget(idnum, rect, None, {}, None)
+        normal_ref = annot["/AP"].raw_get("/N")
+        if hasattr(normal.get_object(), "get_data"):
+            return _FlatWidget(idnum, rect, entry(normal_ref), None, None)
+        states = {str(state): entry(normal.raw_get(state)) for state in normal}
+        return _FlatWidget(idnum, rect, None, states, str(annot.get("/AS", "/Off")))
+
+    def trailer_bytes(self, trailer, changed):
+        """Serializa um trailer com /ID determinístico para os objetos alterados"""
+        trailer = DictionaryObject(trailer)
+        digest = hashlib.md5(b"".join(changed)).digest()
+        trailer[NameObject("/ID")] = ArrayObject([self._id_first, ByteStringObject(digest)])
+        return _serialize(trailer)
+
+    def get_object(self, ref):
+        """Resolve um objeto do protótipo (somente leitura)"""
+        idnum = ref if isinstance(ref, int) else ref.idnum
+        return self._writer._objects[idnum - 1]
+
+    def annotations(self):
+        """Itera sobre as referências das anotações de todas as páginas"""
+        for page in self._writer.pages:
+            if "/Annots" in page:
+                for annot in page["/Annots"]:
+                    yield annot
+
+    def field_report(self, field_names):
+        """
+        Compara os nomes de campos usados pelo serviço com os do template
+        :param field_names: nomes de campos que o serviço preenche
+        :return: dict com campos do template nunca preenchidos ('unfilled')
+                 e nomes que não existem no template ('unknown')
+        """
+        field_names = set(field_names)
+        return {
+            'unfilled': sorted(set(self.fields) - field_names),
+            'unknown': sorted(field_names - set(self.fields)),
+        }
+
+    def clone(self):
+        """Retorna um clone barato para ser preenchido por uma requisição"""
+        return RTADocument(self)
+
+
+class RTADocument:
+    """
+    Clone copy-on-write de um RTATemplate.
+
+    Guarda apenas os valores alterados de cada campo. Na escrita completa os
+    objetos não modificados saem dos bytes já serializados do protótipo; na
+    escrita incremental o arquivo original é copiado como está e só as
+    anotações alteradas são anexadas numa nova seção xref.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self._changes = {}
+
+    def update_field(self, campo, values):
+        """Registra novos valores para a anotação de um campo (RTAField)"""
+        _, current = self._changes.setdefault(campo.idnum, (campo, {}))
+        current.update(values)
+
+    def render(self, incremental=False, appearance="viewer"):
+        """
+        Monta o PDF sem copiá-lo para um buffer
+        :param incremental: se True, anexa uma atualização incremental ao
+                            template original em vez de reescrever o documento
+        :param appearance: "viewer" (NeedAppearances), "server" (aparências
+                           geradas aqui) ou "flatten" (campos desenhados na
+                           página, sem formulário; só na escrita completa)
+        :return: (tamanho total em bytes, lista de partes bytes na ordem do arquivo)
+        """
+        if appearance not in APPEARANCE_MODES:
+            raise ValueError(f"modo de aparência inválido: {appearance}")
+        if appearance == "flatten":
+            if incremental:
+                raise ValueError("flatten não pode ser gerado como atualização incremental")
+            parts = self._render_flatten()
+        elif incremental:
+            parts = self._render_incremental(appearance == "server")
+        else:
+            parts = self._render_full(appearance == "server")
+        return sum(len(part) for part in parts), parts
+
+    def write(self, stream, incremental=False, appearance="viewer"):
+        """Escreve o PDF no stream"""
+        for part in self.render(incremental, appearance)[1]:
+            stream.write(part)
+
+    def _changed(self):
+        return sorted(self._changes.values(), key=lambda item: item[0].idnum)
+
+    def _text_appearances(self, source=False):
+        """Gera os appearance streams dos campos de texto alterados: {idnum: stream}"""
+        template = self.template
+        streams = {}
+        for campo, values in self._changed():
+            if campo.field_type != "/Tx" or "/V" not in values:
+                continue
+            annot = template.get_object(campo.idnum)
+            font_name, _, _ = parse_da(annot.get("/DA") or template._default_da)
+            metrics = template.fonts.get(font_name)
+            if metrics is None:
+                continue
+            content, width, height = text_appearance(annot, values["/V"], metrics, template._default_da)
+            font_ref = metrics.source_ref if source else metrics.ref
+            streams[campo.idnum] = appearance_stream(content, width, height, font_name, font_ref)
+        return streams
+
+    def _render_full(self, server=False):
+        """Reescreve o documento inteiro (mesmo layout do PdfWriter.write)"""
+        template = self.template
+        overrides = dict(template._server_overrides) if server else {}
+        appearances = self._text_appearances() if server else {}
+        extra = []
+        size = template.size
+        for campo, values in self._changed():
+            obj = DictionaryObject(template.get_object(campo.idnum))
+            obj.update(values)
+            if campo.idnum in appearances:
+                obj[NameObject("/AP")] = DictionaryObject({NameObject("/N"): IndirectObject(size, 0, template._writer)})
+                extra.append(_indirect_object(size, 0, _serialize(appearances[campo.idnum])))
+                size += 1
+            overrides[campo.idnum] = _indirect_object(campo.idnum, 0, _serialize(obj))
+
+        parts = [template.header]
+        offset = len(template.header)
+        xref = [b"xref\n", f"0 {size}\n".encode(), f"{0:0>10} {65535:0>5} f \n".encode()]
+        for field_idnum, data, posicoes in template._segments:
+            if field_idnum is not None:
+                data = overrides.get(field_idnum, data)
+            for _, pos in posicoes:
+                xref.append(f"{offset + pos:0>10} {0:0>5} n \n".encode())
+            parts.append(data)
+            offset += len(data)
+        for data in extra:
+            xref.append(f"{offset:0>10} {0:0>5} n \n".encode())
+            parts.append(data)
+            offset += len(data)
+
+        trailer = template.trailer
+        if size != template.size:
+            trailer = DictionaryObject(trailer)
+            trailer[NameObject("/Size")] = NumberObject(size)
+        xref.append(b"trailer\n")
+        xref.append(template.trailer_bytes(trailer, list(overrides.values()) + extra))
+        xref.append(f"\nstartxref\n{offset}\n%%EOF\n".encode())
+        parts.append(b"".join(xref))
+        return parts
+
+    def _render_flatten(self):
+        """
+        Reescreve o documento com as aparências dos campos desenhadas no
+        conteúdo das páginas e sem o formulário; objetos que só o formulário
+        usava não são escritos
+        """
+        template = self.template
+        plan = template.flatten_plan()
+        writer = template._writer
+        appearances = self._text_appearances()
+        novos = []
+        size = template.size
+
+        def adicionar(obj):
+            nonlocal size
+            novos.append((size, _indirect_object(size, 0, _serialize(obj))))
+            size += 1
+            return IndirectObject(size - 1, 0, writer)
+
+        root_idnum, root_data = plan["root"]
+        overrides = {root_idnum: root_data}
+        usados = set()
+        salvar = adicionar(_content_stream(b"q\n"))
+        for page in plan["pages"]:
+            xobjects = DictionaryObject(page.xobjects)
+            desenho = [b"Q"]
+            for widget in page.widgets:
+                change = self._changes.get(widget.idnum)
+                if widget.idnum in appearances:
+                    ref = adicionar(appearances[widget.idnum])
+                    matriz = (1, 1, min(widget.rect[0], widget.rect[2]), min(widget.rect[1], widget.rect[3]))
+                else:
+                    entry = widget.stream
+                    if widget.states is not None:
+                        state = widget.state
+                        if change is not None and "/AS" in change[1]:
+                            state = str(change[1]["/AS"])
+                        entry = widget.states.get(state)
+                    if entry is None:
+                        continue
+                    ref = IndirectObject(entry[0], 0, writer)
+                    usados.add(entry[0])
+                    matriz = entry[1]
+                nome = f"/RTAFlat{widget.idnum}"
+                xobjects[NameObject(nome)] = ref
+                sx, sy, tx, ty = matriz
+                desenho.append(f"q {sx:.6g} 0 0 {sy:.6g} {tx:.6g} {ty:.6g} cm {nome} Do Q".encode())
+            conteudo = adicionar(_content_stream(b"\n".join(desenho) + b"\n"))
+
+            resources = DictionaryObject(page.resources)
+            resources[NameObject("/XObject")] = xobjects
+            obj = DictionaryObject(page.page)
+            obj[NameObject("/Resources")] = resources
+            obj[NameObject("/Contents")] = ArrayObject([salvar] + page.contents + [conteudo])
+            overrides[page.idnum] = _indirect_object(page.idnum, 0, _serialize(obj))
+
+        # Aparências existentes usadas (checkboxes, campos não alterados) e o
+        # que elas referenciam, além da base sem formulário
+        incluidos = set(plan["base"])
+        pendentes = list(usados)
+        while pendentes:
+            idnum = pendentes.pop()
+            if idnum not in incluidos and idnum in plan["objects"]:
+                incluidos.add(idnum)
+                pendentes.extend(plan["graph"][idnum])
+
+        parts = [template.header]
+        offset = len(template.header)
+        offsets = {}
+        for idnum in sorted(incluidos):
+            data = overrides.get(idnum) or plan["objects"][idnum]
+            offsets[idnum] = offset
+            parts.append(data)
+            offset += len(data)
+        for idnum, data in novos:
+            offsets[idnum] = offset
+            parts.append(data)
+            offset += len(data)
+
+        xref = [b"xref\n", f"0 {size}\n".encode(), f"{0:0>10} {65535:0>5} f \n".encode()]
+        for idnum in range(1, size):
+            if idnum in offsets:
+                xref.append(f"{offsets[idnum]:0>10} {0:0>5} n \n".encode())
+            else:
+                xref.append(f"{0:0>10} {1:0>5} f \n".encode())
+        trailer = DictionaryObject(template.trailer)
+        trailer[NameObject("/Size")] = NumberObject(size)
+        xref.append(b"trailer\n")
+        xref.append(template.trailer_bytes(trailer, list(overrides.values()) + [data for _, data in novos]))
+        xref.append(f"\nstartxref\n{offset}\n%%EOF\n".encode())
+        parts.append(b"".join(xref))
+        return parts
+
+    def _render_incremental(self, server=False):
+        """Anexa ao template original só os objetos alterados (PDF 7.5.6)"""
+        template = self.template
+        objects = list(template._source_fixed_server if server else template._source_fixed)
+        appearances = self._text_appearances(source=True) if server else {}
+        size = int(template._source_trailer["/Size"])
+        for campo, values in self._changed():
+            obj = DictionaryObject(template._source_objects[campo.source_ref.idnum])
+            obj.update(values)
+            if campo.idnum in appearances:
+                obj[NameObject("/AP")] = DictionaryObject({NameObject("/N"): IndirectObject(size, 0, None)})
+                objects.append((size, 0, appearances[campo.idnum]))
+                size += 1
+            objects.append((campo.source_ref.idnum, campo.source_ref.generation, obj))
+        objects.sort(key=lambda item: item[0])
+
+        offset = len(template.source) + len(template._source_tail)
+        section = [template._source_tail]
+        entries = []
+        for idnum, generation, obj in objects:
+            data = _indirect_object(idnum, generation, _serialize(obj))
+            entries.append((idnum, generation, offset))
+            section.append(data)
+            offset += len(data)
+
+        trailer = template._source_trailer
+        if size != int(trailer["/Size"]):
+            trailer = DictionaryObject(trailer)
+            trailer[NameObject("/Size")] = NumberObject(size)
+        if template._source_xref_stream:
+            section.append(self._xref_stream(entries, offset, section[1:], trailer))
+        else:
+            # Subseções da xref agrupando números de objeto consecutivos
+            section.append(b"xref\n")
+            for subsection in _subsections(entries):
+                section.append(f"{subsection[0][0]} {len(subsection)}\n".encode())
+                for _, generation, pos in subsection:
+                    section.append(f"{pos:0>10} {generation:0>5} n \n".encode())
+            section.append(b"trailer\n")
+            section.append(template.trailer_bytes(trailer, section[1:len(entries) + 1]))
+        section.append(f"\nstartxref\n{offset}\n%%EOF\n".encode())
+        # Cópia do mapeamento: servidores WSGI exigem partes do tipo bytes
+        return [template.source[:], b"".join(section)]
+
+    def _xref_stream(self, entries, offset, changed, trailer):
+        """Seção xref como stream (PDF 7.5.8), ocupando o próximo número de objeto"""
+        template = self.template
+        idnum = int(trailer["/Size"])
+        entries = entries + [(idnum, 0, offset)]
+        stream = DecodedStreamObject()
+        stream.update(DictionaryObject(trailer))
+        stream.update({
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/Size"): NumberObject(idnum + 1),
+            NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(4), NumberObject(2)]),
+            NameObject("/Index"): ArrayObject([
+                NumberObject(n) for subsection in _subsections(entries)
+                for n in (subsection[0][0], len(subsection))
+            ]),
+        })
+        stream.set_data(b"".join(
+            b"\x01" + pos.to_bytes(4, "big") + generation.to_bytes(2, "big")
+            for _, generation, pos in entries
+        ))
+        digest = hashlib.md5(b"".join(changed)).digest()
+        stream[NameObject("/ID")] = ArrayObject([template._id_first, ByteStringObject(digest)])
+        return _indirect_object(idnum, 0, _serialize(stream))
+
+
+class RTATemplateCache:
+    """Cache thread-safe de RTATemplate por caminho de arquivo"""
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        template = self._templates.get(path)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(path)
+                if template is None:
+                    template = RTATemplate(path)
+                    self._templates[path] = template
+        return template
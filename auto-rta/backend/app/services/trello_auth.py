@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VerificacaoTrello:
+    """
+    Cache com TTL do resultado do auth-check do Trello (membro e lista).
+
+    Até `ttl` segundos o resultado é servido do cache; entre `ttl` e
+    `max_stale` o valor antigo é servido e uma thread o atualiza em segundo
+    plano; depois disso (ou com refresh) a verificação é feita na hora. Falhas
+    ficam em cache por no máximo `ttl_erro`. Uma única verificação por vez:
+    requisições simultâneas num cache vazio esperam o mesmo resultado.
+
+    O último resultado também é gravado em `path`, então o /api/health de
+    qualquer worker do gunicorn lê a prontidão sem chamar o Trello.
+    """
+
+    def __init__(self, path, verificar, ttl=60, max_stale=600, ttl_erro=10):
+        self.path = path
+        self.verificar = verificar
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self.ttl_erro = min(ttl_erro, ttl)
+        self._entrada = None
+        self._atualizando = False
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def chave(base, key, token, list_id):
+        """Identifica a configuração verificada sem guardar as credenciais"""
+        return hashlib.sha256('\0'.join([base, key or '', token or '', list_id or '']).encode()).hexdigest()[:16]
+
+    def _ler_arquivo(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _gravar(self, entrada):
+        self._entrada = entrada
+        tmp = f'{self.path}.{os.getpid()}.{threading.get_ident()}'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(entrada, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            logger.warning('Não foi possível gravar o cache do auth-check do Trello', extra={'path': self.path})
+
+    def ultimo(self, chave=None):
+        """Último resultado (memória ou arquivo, o mais recente) sem chamar o Trello"""
+        entradas = [e for e in (self._entrada, self._ler_arquivo()) if e and (chave is None or e['key'] == chave)]
+        return max(entradas, key=lambda e: e['checked_at'], default=None)
+
+    def _validade(self, entrada):
+        return self.ttl if entrada['http_code'] == 200 else self.ttl_erro
+
+    def _executar(self, chave):
+        status, http_code = self.verificar()
+        entrada = {'key': chave, 'status': status, 'http_code': http_code, 'checked_at': time.time()}
+        self._gravar(entrada)
+        return entrada
+
+    def _em_segundo_plano(self, chave):
+        try:
+            self._executar(chave)
+        except Exception:
+            logger.exception('Erro ao atualizar o auth-check do Trello em segundo plano')
+        finally:
+            self._atualizando = False
+
+    def obter(self, chave, refresh=False):
+        """
+        Resultado da verificação para a configuração `chave`
+        :return: (entrada, cached) com entrada = {'status', 'http_code', 'checked_at', ...}
+        """
+        if self._pid != os.getpid():
+            # Após um fork (gunicorn) a thread de atualização herdada não existe
+            self._lock = threading.Lock()
+            self._atualizando = False
+            self._pid = os.getpid()
+
+        entrada = None if refresh else self.ultimo(chave)
+        idade = time.time() - entrada['checked_at'] if entrada else None
+        if entrada and idade < self._validade(entrada):
+            return entrada, True
+        if entrada and entrada['http_code'] == 200 and idade < self.max_stale:
+            with self._lock:
+                if not self._atualizando:
+                    self._atualizando = True
+                    threading.Thread(target=self._em_segundo_plano, args=(chave,),
+                                     name='trello-auth-check', daemon=True).start()
+            return entrada, True
+
+        inicio = time.time()
+        with self._lock:
+            # Quem esperou o lock aproveita a verificação de quem chegou antes
+            entrada = self.ultimo(chave)
+            if entrada and entrada['checked_at'] >= inicio:
+                return entrada, True
+            return self._executar(chave), False
+
+
+_verificacao = None
+_verificacao_lock = threading.Lock()
+
+
+def get_trello_auth_cache(config, verificar):
+    """
+    Retorna o cache do auth-check do processo (criado no primeiro uso)
+    :param verificar: função () -> (status, http_code) que consulta o Trello
+    """
+    global _verificacao
+    if _verificacao is None:
+        with _verificacao_lock:
+            if _verificacao is None:
+                _verificacao = VerificacaoTrello(
+                    config.get('TRELLO_AUTH_CHECK_FILE') or os.path.join(tempfile.gettempdir(),
+                                                                         'auto-rta-trello-auth.json'),
+                    verificar,
+                    ttl=config.get('TRELLO_AUTH_CHECK_TTL') or 60,
+                    max_stale=config.get('TRELLO_AUTH_CHECK_MAX_STALE') or 600,
+                )
+    return _verificacao
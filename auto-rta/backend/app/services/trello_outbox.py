@@ -0,0 +1,401 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    card TEXT NOT NULL,
+    attachments TEXT NOT NULL,
+    created REAL NOT NULL,
+    next_attempt REAL NOT NULL,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    card_id TEXT,
+    delivered REAL,
+    error TEXT,
+    card_uncertain INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_status_next ON outbox (status, next_attempt);
+"""
+
+# Intervalo da limpeza por TTL e da recuperação de entregas abandonadas
+_MAINTENANCE_INTERVAL = 30
+# Teto do backoff entre tentativas (segundos)
+_MAX_BACKOFF = 600
+
+
+class EntregaAdiada(Exception):
+    """Falha temporária (rede, 429, 5xx): a entrega volta para a fila com backoff"""
+
+    def __init__(self, mensagem, retry_after=None):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+class EntregaRecusada(Exception):
+    """Falha definitiva (4xx ao criar o card): a entrega não é repetida"""
+
+
+class EntregaIncerta(EntregaAdiada):
+    """
+    O POST do card foi enviado mas o resultado é desconhecido (timeout de
+    leitura, conexão caída, 5xx): o card pode existir. A próxima tentativa
+    procura o card pelo marcador antes de criar outro.
+    """
+
+
+class TrelloOutbox:
+    """
+    Caixa de saída persistente para cards do Trello.
+
+    O card (nome e descrição) fica numa tabela SQLite e os anexos em arquivos
+    no mesmo diretório, então uma submissão sobrevive a reinícios e a quedas
+    do Trello. Cada processo tem um entregador que reserva entradas vencidas
+    (com prazo de lease) e as envia num pool de threads, repetindo com backoff
+    exponencial. O card_id é gravado assim que o card é criado: uma nova
+    tentativa só reenvia os anexos que faltam, sem duplicar o card. Se o
+    resultado do POST do card for desconhecido (EntregaIncerta), a próxima
+    tentativa procura o card pelo marcador da entrada antes de criá-lo. O
+    lease das entregas em andamento é renovado enquanto elas rodam.
+
+    :param criar_card: função (card, marcador, procurar) -> card_id; o marcador
+        (único por entrada) vai na descrição do card e, com procurar, um card
+        já existente com ele é reaproveitado. Levanta EntregaAdiada,
+        EntregaIncerta ou EntregaRecusada
+    :param enviar_anexos: função (card_id, anexos) -> [(estado, resultado)] na mesma
+        ordem, estado 'done', 'error' (definitivo) ou 'retry'
+    """
+
+    def __init__(self, directory, criar_card, enviar_anexos, workers=2, ttl=7 * 86400,
+                 max_pending=1000, max_attempts=8, backoff=5.0, lease=300):
+        self.directory = directory
+        self.criar_card = criar_card
+        self.enviar_anexos = enviar_anexos
+        self.workers = workers
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self._db_path = os.path.join(directory, 'outbox.sqlite3')
+        self._files = os.path.join(directory, 'files')
+        os.makedirs(self._files, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._wake = threading.Event()
+        self._em_entrega = set()
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(_SCHEMA)
+            colunas = {row[1] for row in db.execute('PRAGMA table_info(outbox)')}
+            if 'card_uncertain' not in colunas:
+                # Caixa de saída criada por uma versão anterior
+                db.execute('ALTER TABLE outbox ADD COLUMN card_uncertain INTEGER NOT NULL DEFAULT 0')
+
+    def _connect(self):
+        return closing(sqlite3.connect(self._db_path, timeout=30, isolation_level=None))
+
+    def _ensure_started(self):
+        # Threads não sobrevivem ao fork (preload do gunicorn): um entregador por processo
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='trello-outbox')
+                    self._slots = threading.BoundedSemaphore(self.workers)
+                    self._wake = threading.Event()
+                    self._em_entrega = set()
+                    threading.Thread(target=self._dispatch, name='trello-outbox-dispatch', daemon=True).start()
+                    threading.Thread(target=self._renovar_leases, name='trello-outbox-lease', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def submit(self, card, arquivos):
+        """
+        Grava um card e seus anexos na caixa de saída
+        :param card: dict serializável em JSON repassado para criar_card(card)
+        :param arquivos: FileStorage (ou objetos com filename, mimetype e save(path))
+        :return: dict da entrada, ou None se a caixa de saída estiver cheia
+        """
+        self._ensure_started()
+        item_id = uuid.uuid4().hex
+        pasta = os.path.join(self._files, item_id)
+        anexos = []
+        if arquivos:
+            os.makedirs(pasta)
+        try:
+            for n, f in enumerate(arquivos):
+                path = os.path.join(pasta, str(n))
+                f.save(path)
+                anexos.append({
+                    'filename': f.filename,
+                    'mimetype': f.mimetype,
+                    'path': path,
+                    'status': 'pending',
+                    'result': None,
+                })
+            with self._connect() as db:
+                db.execute('BEGIN IMMEDIATE')
+                pendentes = db.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+                if pendentes >= self.max_pending:
+                    db.execute('ROLLBACK')
+                    shutil.rmtree(pasta, ignore_errors=True)
+                    return None
+                agora = time.time()
+                db.execute(
+                    "INSERT INTO outbox (id, status, card, attachments, created, next_attempt) "
+                    "VALUES (?, 'pending', ?, ?, ?, ?)",
+                    (item_id, json.dumps(card), json.dumps(anexos), agora, agora)
+                )
+                db.execute('COMMIT')
+        except BaseException:
+            shutil.rmtree(pasta, ignore_errors=True)
+            raise
+        self._wake.set()
+        return self.get(item_id)
+
+    def get(self, item_id):
+        """Estado da entrada (dict) ou None se não existir ou já tiver expirado"""
+        self._ensure_started()
+        with self._connect() as db:
+            row = db.execute(
+                'SELECT id, status, attachments, created, next_attempt, attempts, card_id, delivered, error '
+                'FROM outbox WHERE id = ?',
+                (item_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        item = dict(zip(('id', 'status', 'attachments', 'created', 'next_attempt', 'attempts', 'card_id',
+                         'delivered', 'error'), row))
+        item['attachments'] = json.loads(item['attachments'])
+        if item['delivered'] and item['delivered'] < time.time() - self.ttl:
+            return None
+        return item
+
+    def stats(self):
+        """Quantidade de entradas por estado e idade da mais antiga ainda não entregue"""
+        self._ensure_started()
+        agora = time.time()
+        with self._connect() as db:
+            contagem = dict(db.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall())
+            mais_antiga = db.execute(
+                "SELECT MIN(created) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+        return {
+            'pending': contagem.get('pending', 0),
+            'sending': contagem.get('sending', 0),
+            'delivered': contagem.get('delivered', 0),
+            'failed': contagem.get('failed', 0),
+            'oldest_pending_age_s': round(agora - mais_antiga, 1) if mais_antiga else None,
+            'max_pending': self.max_pending,
+            'workers_per_process': self.workers,
+        }
+
+    def _dispatch(self):
+        ultima_manutencao = 0
+        while True:
+            if time.time() - ultima_manutencao > _MAINTENANCE_INTERVAL:
+                try:
+                    self._maintenance()
+                except sqlite3.Error:
+                    logger.exception('Erro na manutenção da caixa de saída do Trello')
+                ultima_manutencao = time.time()
+
+            self._slots.acquire()
+            try:
+                item = self._claim()
+            except sqlite3.Error:
+                logger.exception('Erro ao reservar entrega do Trello')
+                item = None
+            if item is None:
+                self._slots.release()
+                self._wake.wait(timeout=1.0)
+                self._wake.clear()
+                continue
+            self._executor.submit(self._run, *item)
+
+    def _renovar_leases(self):
+        """Estende o lease das entregas deste processo enquanto rodam (limitador e anexos podem demorar)"""
+        while True:
+            time.sleep(max(1.0, self.lease / 3))
+            with self._lock:
+                ids = list(self._em_entrega)
+            if not ids:
+                continue
+            try:
+                with self._connect() as db:
+                    db.execute(
+                        f"UPDATE outbox SET lease_until = ? WHERE status = 'sending' "
+                        f"AND id IN ({','.join('?' * len(ids))})",
+                        (time.time() + self.lease, *ids)
+                    )
+            except sqlite3.Error:
+                logger.exception('Erro ao renovar o lease das entregas do Trello')
+
+    def _claim(self):
+        agora = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute(
+                "SELECT id, card, attachments, attempts, card_id, card_uncertain FROM outbox "
+                "WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT 1",
+                (agora,)
+            ).fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            db.execute(
+                "UPDATE outbox SET status = 'sending', lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (agora + self.lease, row[0])
+            )
+            db.execute('COMMIT')
+        return row[0], json.loads(row[1]), json.loads(row[2]), row[3] + 1, row[4], bool(row[5])
+
+    def _atualizar(self, item_id, **campos):
+        colunas = ', '.join(f'{nome} = ?' for nome in campos)
+        with self._connect() as db:
+            db.execute(f'UPDATE outbox SET {colunas} WHERE id = ?', (*campos.values(), item_id))
+
+    def _run(self, item_id, card, anexos, tentativa, card_id, incerto):
+        with self._lock:
+            self._em_entrega.add(item_id)
+        try:
+            try:
+                self._entregar(item_id, card, anexos, tentativa, card_id, incerto)
+            except Exception as e:
+                logger.exception('Erro ao entregar card do Trello', extra={'outbox_id': item_id})
+                self._adiar(item_id, anexos, tentativa, f'Erro interno: {str(e)}')
+        finally:
+            with self._lock:
+                self._em_entrega.discard(item_id)
+            self._slots.release()
+
+    def _entregar(self, item_id, card, anexos, tentativa, card_id, incerto):
+        if card_id is None:
+            try:
+                card_id = self.criar_card(card, f'outbox:{item_id}', incerto)
+            except EntregaRecusada as e:
+                self._finalizar(item_id, 'failed', anexos, error=str(e))
+                return
+            except EntregaIncerta as e:
+                # O card pode ter sido criado: a próxima tentativa procura antes de criar
+                self._atualizar(item_id, card_uncertain=1)
+                self._adiar(item_id, anexos, tentativa, str(e), e.retry_after)
+                return
+            except EntregaAdiada as e:
+                self._adiar(item_id, anexos, tentativa, str(e), e.retry_after)
+                return
+            # Gravado antes dos anexos: uma nova tentativa não cria outro card
+            self._atualizar(item_id, card_id=card_id, card_uncertain=0)
+
+        pendentes = [a for a in anexos if a['status'] == 'pending']
+        if pendentes:
+            for anexo, (estado, resultado) in zip(pendentes, self.enviar_anexos(card_id, pendentes)):
+                anexo['result'] = resultado
+                if estado != 'retry':
+                    anexo['status'] = estado
+        if any(a['status'] == 'pending' for a in anexos):
+            self._adiar(item_id, anexos, tentativa, 'Anexos pendentes')
+        else:
+            self._finalizar(item_id, 'delivered', anexos, card_id=card_id)
+
+    def _adiar(self, item_id, anexos, tentativa, erro, retry_after=None):
+        if tentativa >= self.max_attempts:
+            with self._connect() as db:
+                card_id, incerto = db.execute('SELECT card_id, card_uncertain FROM outbox WHERE id = ?',
+                                              (item_id,)).fetchone()
+            if card_id is None:
+                if incerto:
+                    erro += ' (o card pode ter sido criado: confira a lista do Trello)'
+                self._finalizar(item_id, 'failed', anexos, error=f'Tentativas esgotadas: {erro}')
+                return
+            # O card existe: entregue com os anexos restantes marcados como erro
+            for anexo in anexos:
+                if anexo['status'] == 'pending':
+                    anexo['status'] = 'error'
+                    anexo['result'] = anexo['result'] or {'error': 'Tentativas esgotadas'}
+            self._finalizar(item_id, 'delivered', anexos, card_id=card_id)
+            return
+        espera = min(_MAX_BACKOFF, self.backoff * 2 ** (tentativa - 1)) * random.uniform(0.8, 1.2)
+        if retry_after:
+            espera = max(espera, retry_after)
+        self._atualizar(item_id, status='pending', lease_until=None, next_attempt=time.time() + espera,
+                        attachments=json.dumps(anexos), error=erro)
+
+    def _finalizar(self, item_id, status, anexos, card_id=None, error=None):
+        campos = {'status': status, 'lease_until': None, 'delivered': time.time(),
+                  'attachments': json.dumps(anexos), 'error': error}
+        if card_id is not None:
+            campos['card_id'] = card_id
+        self._atualizar(item_id, **campos)
+        if status == 'delivered':
+            # Entregue: os anexos já estão no Trello. Falhas mantêm os arquivos até o TTL
+            shutil.rmtree(os.path.join(self._files, item_id), ignore_errors=True)
+
+    def _maintenance(self):
+        """Devolve à fila entregas com lease vencido e remove as expiradas pelo TTL"""
+        agora = time.time()
+        with self._connect() as db:
+            # O processo pode ter morrido durante o POST do card: sem card_id, a próxima
+            # tentativa procura o marcador antes de criar outro
+            db.execute(
+                "UPDATE outbox SET status = 'pending', lease_until = NULL, "
+                "card_uncertain = CASE WHEN card_id IS NULL THEN 1 ELSE card_uncertain END "
+                "WHERE status = 'sending' AND lease_until < ?",
+                (agora,)
+            )
+            expiradas = [row[0] for row in db.execute(
+                "SELECT id FROM outbox WHERE status IN ('delivered', 'failed') AND delivered < ?",
+                (agora - self.ttl,)
+            ).fetchall()]
+            db.executemany('DELETE FROM outbox WHERE id = ?', [(item_id,) for item_id in expiradas])
+        for item_id in expiradas:
+            shutil.rmtree(os.path.join(self._files, item_id), ignore_errors=True)
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_trello_outbox(config, criar_card, enviar_anexos):
+    """
+    Retorna a caixa de saída do processo (criada no primeiro uso)
+    :param criar_card: função card -> card_id executada pelo entregador
+    :param enviar_anexos: função (card_id, anexos) -> [(estado, resultado)]
+    """
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = TrelloOutbox(
+                    config.get('TRELLO_OUTBOX_DIR') or os.path.join(tempfile.gettempdir(), 'auto-rta-trello-outbox'),
+                    criar_card,
+                    enviar_anexos,
+                    workers=config.get('TRELLO_OUTBOX_WORKERS') or 2,
+                    ttl=config.get('TRELLO_OUTBOX_TTL_SECONDS') or 7 * 86400,
+                    max_pending=config.get('TRELLO_OUTBOX_MAX_PENDING') or 1000,
+                    max_attempts=config.get('TRELLO_OUTBOX_MAX_ATTEMPTS') or 8,
+                    backoff=config.get('TRELLO_OUTBOX_BACKOFF_SECONDS') or 5.0,
+                )
+    return _outbox
+
+
+def iniciar_trello_outbox():
+    """
+    Inicia o entregador da caixa de saída neste processo, se ela já existe
+    (create_app), para entregar o que ficou pendente num reinício sem esperar
+    uma requisição
+    """
+    if _outbox is not None:
+        _outbox._ensure_started()
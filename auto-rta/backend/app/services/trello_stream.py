@@ -0,0 +1,93 @@
+import queue
+import uuid
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+# Tamanho dos blocos lidos da requisição e repassados ao upload
+TAMANHO_BLOCO = 64 * 1024
+
+_FIM = object()
+
+
+class CanalAnexo:
+    """
+    Buffer limitado entre o parser da requisição e o upload de um anexo.
+
+    Com a fila cheia o parser espera (e, com ele, a leitura do cliente): a
+    memória por anexo fica em `blocos` x TAMANHO_BLOCO, qualquer que seja o
+    tamanho da imagem. Se o upload desistir (erro do Trello), o restante da
+    parte é descartado em vez de travar o parser.
+    """
+
+    def __init__(self, blocos=4):
+        self._fila = queue.Queue(maxsize=max(1, blocos))
+        self.abandonado = False
+
+    def escrever(self, dados):
+        while not self.abandonado:
+            try:
+                self._fila.put(dados, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def fechar(self, erro=None):
+        """Fim da parte; com erro, o upload é interrompido com essa exceção"""
+        self.escrever(_FIM if erro is None else erro)
+
+    def abandonar(self):
+        self.abandonado = True
+
+    def __iter__(self):
+        while True:
+            item = self._fila.get()
+            if item is _FIM:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def corpo_multipart(canal, filename, mimetype, campo='file'):
+    """
+    Corpo multipart/form-data de um único arquivo gerado à medida que o canal
+    recebe dados (enviado pelo requests com Transfer-Encoding: chunked)
+    :return: (content_type, gerador de bytes)
+    """
+    boundary = uuid.uuid4().hex
+    inicio = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{campo}"; filename="{filename}"\r\n'
+        f'Content-Type: {mimetype}\r\n\r\n'
+    ).encode()
+    fim = f'\r\n--{boundary}--\r\n'.encode()
+
+    def gerar():
+        yield inicio
+        for bloco in canal:
+            yield bloco
+        yield fim
+
+    return f'multipart/form-data; boundary={boundary}', gerar()
+
+
+def eventos_multipart(stream, boundary, max_form_memory_size=None):
+    """
+    Eventos (Field, File, Data) de um corpo multipart lido em blocos, sem
+    montar request.form/request.files: nada além do bloco atual fica em memória
+    """
+    decoder = MultipartDecoder(boundary, max_form_memory_size)
+    terminou = False
+    while not terminou:
+        bloco = stream.read(TAMANHO_BLOCO)
+        decoder.receive_data(bloco or None)
+        terminou = not bloco
+        while True:
+            evento = decoder.next_event()
+            if isinstance(evento, NeedData):
+                break
+            if isinstance(evento, Epilogue):
+                return
+            if isinstance(evento, (Field, File, Data)):
+                yield evento
+    raise ValueError('Corpo multipart incompleto')
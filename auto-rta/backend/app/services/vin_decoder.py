@@ -0,0 +1,300 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app.util.metricas import medir, registro
+from app.util.sessao_http import criar_sessao
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vin_cache (
+    vin TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+"""
+
+# VIN completo (17) ou parcial (a partir de 11, com * nas posições desconhecidas); sem I, O e Q
+_VIN_RE = re.compile(r'[A-HJ-NPR-Z0-9*]{11,17}')
+
+# BodyClass do NHTSA -> opções de carroceria do formulário do RTA (a primeira que casar)
+_CARROCERIAS = (
+    ('sport utility', 'SUV'),
+    ('crossover', 'SUV'),
+    ('pickup', 'Truck'),
+    ('truck', 'Truck'),
+    ('van', 'Van'),
+    ('convertible', 'Convertible'),
+    ('roadster', 'Convertible'),
+    ('hatchback', 'Hatchback'),
+    ('wagon', 'Wagon'),
+    ('coupe', 'Coupe'),
+    ('sedan', 'Sedan'),
+)
+
+
+def normalizar_vin(vin):
+    """VIN em maiúsculas e sem espaços, ou None se não for um VIN válido"""
+    vin = re.sub(r'\s+', '', str(vin or '')).upper()
+    return vin if _VIN_RE.fullmatch(vin) else None
+
+
+def _inteiro(valor):
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return None
+
+
+def _carroceria(body_class):
+    texto = (body_class or '').lower()
+    for trecho, estilo in _CARROCERIAS:
+        if trecho in texto:
+            return estilo
+    return None
+
+
+def resumo_vin(vin, row):
+    """Campos usados pelos formulários a partir de uma linha do DecodeVINValues(Batch)"""
+    make = (row.get('Make') or '').strip()
+    model = (row.get('Model') or '').strip()
+    year = (row.get('ModelYear') or row.get('Model_Year') or '').strip()
+    return {
+        'vin': vin,
+        'decoded': bool(make and model and year),
+        'make': make,
+        'model': model,
+        'year': year,
+        'body_class': (row.get('BodyClass') or '').strip(),
+        'body_style': _carroceria(row.get('BodyClass')),
+        'cylinders': _inteiro(row.get('EngineCylinders')),
+        'doors': _inteiro(row.get('Doors')),
+        'error_code': (row.get('ErrorCode') or '').strip(),
+        'error_text': (row.get('ErrorText') or '').strip(),
+    }
+
+
+class DecodificadorVin:
+    """
+    Decodificação de VINs pelo vPIC do NHTSA com cache em dois níveis: LRU em
+    memória e SQLite em disco (compartilhado entre os workers, sobrevive a
+    reinícios). Os dados de um VIN não mudam, então o TTL é longo. VINs não
+    decodificados (ausentes de uma resposta parcial, recém-registrados) não vão
+    para o disco e ficam na memória só por `ttl_negativo` segundos.
+
+    As faltas não viram uma chamada por VIN: entram numa fila e um despachante
+    por processo as envia em lotes de até `lote` VINs ao DecodeVINValuesBatch,
+    juntando por `janela` segundos as consultas simultâneas. Um VIN já em
+    consulta não é pedido de novo (single-flight).
+    """
+
+    def __init__(self, directory, base_url, lru_size=2048, ttl=30 * 86400, ttl_negativo=3600, lote=50,
+                 janela=0.02, workers=2, timeout=15):
+        self.directory = directory
+        self.base_url = base_url.rstrip('/')
+        self.lru_size = lru_size
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.lote = max(1, min(lote, 50))
+        self.janela = janela
+        self.workers = workers
+        self.timeout = timeout
+        self._memoria = OrderedDict()
+        # VIN não decodificado -> instante em que sai da memória
+        self._expira = {}
+        self._pendentes = {}
+        self._fila = []
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pid = None
+        os.makedirs(directory, exist_ok=True)
+        self._db_path = os.path.join(directory, 'vin_cache.sqlite3')
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self._db_path, timeout=30, isolation_level=None))
+
+    def _ensure_started(self):
+        # Threads e conexões não sobrevivem ao fork (preload do gunicorn): um despachante por processo
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pendentes = {}
+                    self._fila = []
+                    self._sessao = criar_sessao(pool_maxsize=self.workers, retries=2)
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='vin-decode')
+                    self._slots = threading.BoundedSemaphore(self.workers)
+                    threading.Thread(target=self._dispatch, name='vin-decode-dispatch', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _da_memoria(self, vin):
+        with self._lock:
+            if self._expira.get(vin, float('inf')) < time.monotonic():
+                self._memoria.pop(vin, None)
+                self._expira.pop(vin, None)
+            info = self._memoria.get(vin)
+            if info is not None:
+                self._memoria.move_to_end(vin)
+            return info
+
+    def _na_memoria(self, infos):
+        expira = time.monotonic() + self.ttl_negativo
+        with self._lock:
+            for info in infos:
+                self._memoria[info['vin']] = info
+                self._memoria.move_to_end(info['vin'])
+                if info['decoded']:
+                    self._expira.pop(info['vin'], None)
+                else:
+                    self._expira[info['vin']] = expira
+            while len(self._memoria) > self.lru_size:
+                vin, _ = self._memoria.popitem(last=False)
+                self._expira.pop(vin, None)
+
+    def _do_disco(self, vins):
+        if not vins:
+            return {}
+        with self._connect() as db:
+            rows = db.execute(
+                f'SELECT data FROM vin_cache WHERE vin IN ({",".join("?" * len(vins))}) AND fetched >= ?',
+                [*vins, time.time() - self.ttl],
+            ).fetchall()
+        # Linhas não decodificadas gravadas por versões anteriores são consultadas de novo
+        infos = [info for info in (json.loads(data) for data, in rows) if info['decoded']]
+        self._na_memoria(infos)
+        return {info['vin']: info for info in infos}
+
+    def _no_disco(self, infos):
+        if not infos:
+            return
+        agora = time.time()
+        try:
+            with self._connect() as db:
+                db.executemany('INSERT OR REPLACE INTO vin_cache (vin, data, fetched) VALUES (?, ?, ?)',
+                               [(i['vin'], json.dumps(i, ensure_ascii=False), agora) for i in infos])
+        except sqlite3.Error:
+            logger.warning('Não foi possível gravar o cache de VIN', extra={'path': self._db_path})
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._fila:
+                    self._cond.wait()
+                # Junta as consultas que chegam juntas num único lote
+                limite = time.monotonic() + self.janela
+                while len(self._fila) < self.lote:
+                    resto = limite - time.monotonic()
+                    if resto <= 0:
+                        break
+                    self._cond.wait(resto)
+                lote, self._fila = self._fila[:self.lote], self._fila[self.lote:]
+            self._slots.acquire()
+            self._executor.submit(self._consultar, lote)
+
+    def _consultar(self, lote):
+        """Consulta um lote no NHTSA e resolve os futures de cada VIN"""
+        try:
+            with medir('vin_decode', externo=('nhtsa', 'decode_batch')) as m:
+                resp = self._sessao.post(f'{self.base_url}/DecodeVINValuesBatch/',
+                                         data={'format': 'json', 'data': ';'.join(lote)}, timeout=self.timeout)
+                m.status = resp.status_code
+            resp.raise_for_status()
+            linhas = {(r.get('VIN') or '').upper(): r for r in resp.json().get('Results') or []}
+            infos = [resumo_vin(vin, linhas.get(vin, {})) for vin in lote]
+            self._no_disco([info for info in infos if info['decoded']])
+            self._na_memoria(infos)
+            resultado = {info['vin']: info for info in infos}
+            erro = None
+        except Exception as e:
+            logger.warning('Erro ao decodificar VINs no NHTSA', extra={'vins': len(lote), 'error': str(e)})
+            resultado, erro = {}, e
+        finally:
+            self._slots.release()
+        with self._lock:
+            futuros = [(vin, self._pendentes.pop(vin, None)) for vin in lote]
+        for vin, futuro in futuros:
+            if futuro is None:
+                continue
+            if erro is None:
+                futuro.set_result(resultado[vin])
+            else:
+                futuro.set_exception(erro)
+
+    def decodificar(self, vins, espera=None):
+        """
+        Decodifica os VINs (já normalizados); faltas vão ao NHTSA em lotes
+        :return: dict vin -> info (resumo_vin + 'source': memory/disk/nhtsa) ou,
+            se a consulta falhou, {'vin', 'error'}
+        """
+        resultado = {}
+        faltas = []
+        for vin in dict.fromkeys(vins):
+            info = self._da_memoria(vin)
+            if info is not None:
+                resultado[vin] = dict(info, source='memory')
+            else:
+                faltas.append(vin)
+        for vin, info in self._do_disco(faltas).items():
+            resultado[vin] = dict(info, source='disk')
+        faltas = [vin for vin in faltas if vin not in resultado]
+        for origem in ('memory', 'disk'):
+            acertos = sum(1 for info in resultado.values() if info['source'] == origem)
+            if acertos:
+                registro.inc('auto_rta_vin_lookups_total', {'source': origem}, acertos)
+        if not faltas:
+            return resultado
+
+        self._ensure_started()
+        futuros = {}
+        with self._cond:
+            for vin in faltas:
+                futuro = self._pendentes.get(vin)
+                if futuro is None:
+                    futuro = self._pendentes[vin] = Future()
+                    self._fila.append(vin)
+                futuros[vin] = futuro
+            self._cond.notify()
+
+        limite = time.monotonic() + (espera or self.timeout * 4)
+        for vin, futuro in futuros.items():
+            try:
+                resultado[vin] = dict(futuro.result(timeout=max(0.0, limite - time.monotonic())), source='nhtsa')
+                registro.inc('auto_rta_vin_lookups_total', {'source': 'nhtsa'})
+            except Exception as e:
+                registro.inc('auto_rta_vin_lookups_total', {'source': 'error'})
+                resultado[vin] = {'vin': vin, 'error': f'Erro ao consultar o NHTSA: {str(e) or type(e).__name__}'}
+        return resultado
+
+
+_decodificador = None
+_decodificador_lock = threading.Lock()
+
+
+def get_vin_decoder(config):
+    """Retorna o decodificador de VIN do processo (criado no primeiro uso)"""
+    global _decodificador
+    if _decodificador is None:
+        with _decodificador_lock:
+            if _decodificador is None:
+                _decodificador = DecodificadorVin(
+                    config.get('VIN_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'auto-rta-vin'),
+                    config.get('NHTSA_API_BASE') or 'https://vpic.nhtsa.dot.gov/api/vehicles',
+                    lru_size=config.get('VIN_CACHE_SIZE') or 2048,
+                    ttl=config.get('VIN_CACHE_TTL_SECONDS') or 30 * 86400,
+                    ttl_negativo=config.get('VIN_CACHE_NEGATIVE_TTL_SECONDS', 3600),
+                    lote=config.get('VIN_BATCH_SIZE') or 50,
+                    janela=(config.get('VIN_BATCH_WINDOW_MS') or 20) / 1000,
+                    workers=config.get('VIN_DECODE_WORKERS') or 2,
+                )
+    return _decodificador
@@ -12,24 +12,25 @@ def parse_float_val(val):
         return float(val)
     except Exception:
         return 0.0
-import requests
 from datetime import datetime
+from flask import current_app, has_app_context
+from app.config import Config
+from app.services.vin_decoder import get_vin_decoder, normalizar_vin
 
 def veiculo_vin(vin):
-    """Pega o(s) VINs e retorna marca, modelo e ano do veículo."""
-    veiculos = ""
-    lista_vin = vin.split(" / ")
+    """Pega o(s) VINs e retorna marca, modelo e ano do veículo (todos num único lote, com cache)."""
+    lista_vin = [normalizar_vin(veiculo) for veiculo in vin.split(" / ")]
+    if None in lista_vin:
+        raise ValueError("Não foi possível decodificar o VIN.")
+    config = current_app.config if has_app_context() else vars(Config)
+    infos = get_vin_decoder(config).decodificar(lista_vin)
+    veiculos = []
     for veiculo in lista_vin:
-        get_info = requests.get(f'https://vpic.nhtsa.dot.gov/api/vehicles/decodevin/{veiculo}?format=json').json()['Results']
-        marca = get_info[7]["Value"]
-        modelo = get_info[9]["Value"]
-        ano = get_info[10]["Value"]
-        if not marca or not modelo or not ano:
+        info = infos[veiculo]
+        if not info.get('decoded'):
             raise ValueError("Não foi possível decodificar o VIN.")
-        else:
-            carro = f"{marca}, {modelo}, {ano} / "
-            veiculos = veiculos + carro
-    return veiculos.rstrip(" / ")
+        veiculos.append(f"{info['make']}, {info['model']}, {info['year']}")
+    return " / ".join(veiculos)
 
 def formatar_data(data):
     nascimento = datetime.strptime(data, "%m/%d/%Y").strftime("%m/%d/%Y")
@@ -0,0 +1,159 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# Campos com dados pessoais: nunca vão para o log em claro
+PII_FIELDS = frozenset({
+    'owner_name', 'owner_dob', 'owner_license', 'owner_street', 'owner_zipcode',
+    'owner_residential_address', 'seller_name', 'seller_street', 'seller_zipcode',
+    'seller_address', 'previous_title_number', 'email', 'phone', 'telefone',
+})
+# Campos parcialmente mascarados (mantém o final para correlação)
+_PARTIAL_FIELDS = {'vin': 6}
+
+# Atributos padrão do LogRecord (o resto veio de extra=)
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def redact(fields):
+    """Cópia do dict com os campos de PII mascarados"""
+    saida = {}
+    for key, value in fields.items():
+        if key in PII_FIELDS and value not in (None, ''):
+            saida[key] = '[redacted]'
+        elif key in _PARTIAL_FIELDS and value not in (None, ''):
+            texto = str(value)
+            visivel = _PARTIAL_FIELDS[key]
+            saida[key] = '*' * max(len(texto) - visivel, 0) + texto[-visivel:]
+        elif isinstance(value, dict):
+            saida[key] = redact(value)
+        else:
+            saida[key] = value
+    return saida
+
+
+def _extras(record):
+    return redact({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith('_')})
+
+
+class JSONFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, level, logger, msg e os campos de extra= (com PII mascarada)"""
+
+    def format(self, record):
+        entrada = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        entrada.update(_extras(record))
+        if record.exc_info:
+            entrada['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entrada['exc'] = record.exc_text
+        return json.dumps(entrada, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legível para desenvolvimento: campos de extra= como chave=valor"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(name)s] %(message)s')
+
+    def format(self, record):
+        linha = super().format(record)
+        extras = _extras(record)
+        if extras:
+            primeira, _, resto = linha.partition('\n')
+            campos = ' '.join(f'{k}={v!r}' for k, v in extras.items())
+            linha = f'{primeira} {campos}' + (f'\n{resto}' if resto else '')
+        return linha
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém só uma fração dos registros abaixo de INFO (rate entre 0 e 1)"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.INFO or random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que entrega o registro à thread do listener sem formatá-lo:
+    o request só paga o put() na fila; mensagem, JSON e traceback são montados
+    pelo listener
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            # O traceback não pode atravessar a fila; formatado aqui uma vez
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Sink lento: descarta em vez de bloquear a requisição
+            pass
+
+
+def _iniciar_listener(handler, destino, tamanho):
+    global _listener
+    handler.queue = queue.Queue(maxsize=tamanho)
+    _listener = logging.handlers.QueueListener(handler.queue, destino, respect_handler_level=True)
+    _listener.start()
+
+
+def _parar_listener():
+    # Drena a fila antes de o processo sair
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def configurar_logging(config):
+    """
+    Configura o logger 'app' (e filhos, via logging.getLogger(__name__)):
+    nível LOG_LEVEL, formato LOG_FORMAT (json|text), amostragem LOG_DEBUG_SAMPLE_RATE
+    dos registros DEBUG, e escrita em stderr numa thread separada (QueueHandler)
+    """
+    with _listener_lock:
+        logger = logging.getLogger('app')
+        logger.setLevel(str(config.get('LOG_LEVEL') or 'INFO').upper())
+        logger.propagate = False
+        if _listener is not None:
+            return logger
+
+        destino = logging.StreamHandler(sys.stderr)
+        destino.setFormatter(TextFormatter() if config.get('LOG_FORMAT') == 'text' else JSONFormatter())
+
+        tamanho = config.get('LOG_QUEUE_SIZE') or 10000
+        handler = _QueueHandler(queue.Queue(maxsize=tamanho))
+        rate = config.get('LOG_DEBUG_SAMPLE_RATE')
+        if rate is not None and rate < 1:
+            handler.addFilter(SamplingFilter(rate))
+        logger.handlers[:] = [handler]
+
+        _iniciar_listener(handler, destino, tamanho)
+        atexit.register(_parar_listener)
+        # Com preload do gunicorn a thread do listener fica no master: cada worker
+        # inicia a sua (com fila nova) após o fork
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=lambda: _iniciar_listener(handler, destino, tamanho))
+    return logger
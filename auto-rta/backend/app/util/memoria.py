@@ -0,0 +1,80 @@
+import os
+
+# Campos de /proc/<pid>/smaps_rollup (em kB)
+_CAMPOS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap')
+
+
+def memoria_processo(pid):
+    """
+    Memória de um processo (Linux): única (privada), compartilhada, RSS e PSS em MB
+    :return: dict ou None se /proc não estiver disponível para o pid
+    """
+    valores = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for linha in f:
+                partes = linha.split()
+                if partes and partes[0].rstrip(':') in _CAMPOS:
+                    valores[partes[0].rstrip(':')] = int(partes[1])
+    except OSError:
+        return None
+
+    def mb(kb):
+        return round(kb / 1024, 1)
+
+    return {
+        'pid': pid,
+        'rss_mb': mb(valores.get('Rss', 0)),
+        'pss_mb': mb(valores.get('Pss', 0)),
+        'unique_mb': mb(valores.get('Private_Clean', 0) + valores.get('Private_Dirty', 0)),
+        'shared_mb': mb(valores.get('Shared_Clean', 0) + valores.get('Shared_Dirty', 0)),
+        'swap_mb': mb(valores.get('Swap', 0)),
+    }
+
+
+def _filhos(pid):
+    """PIDs dos processos filhos (workers do gunicorn quando pid é o master)"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    filhos = []
+    for nome in os.listdir('/proc'):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f'/proc/{nome}/stat') as f:
+                # O nome do executável pode ter espaços: o ppid vem após o último ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            filhos.append(int(nome))
+    return filhos
+
+
+def relatorio_memoria(master_pid=None):
+    """
+    Relatório de memória do master do gunicorn (master_pid) e de cada worker.
+    Sem master_pid (flask run, start.py) o pai não é um master: só o
+    processo atual entra no relatório, sem a chave 'master'.
+    """
+    atual = os.getpid()
+    master = memoria_processo(master_pid) if master_pid else None
+    pids = sorted(_filhos(master_pid)) if master else [atual]
+    workers = [m for m in (memoria_processo(pid) for pid in pids) if m]
+    if not workers:
+        return {'available': False, 'error': 'smaps_rollup indisponível (requer Linux)'}
+
+    for worker in workers:
+        worker['current'] = worker['pid'] == atual
+    processos = workers + ([master] if master else [])
+    relatorio = {'available': True}
+    if master:
+        relatorio['master'] = master
+    relatorio['workers'] = workers
+    relatorio['totals'] = {
+        campo: round(sum(p[campo] for p in processos), 1) for campo in ('unique_mb', 'pss_mb', 'rss_mb')
+    }
+    return relatorio
@@ -0,0 +1,314 @@
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Limites (segundos) dos histogramas de latência
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Métricas exportadas: nome -> (tipo, descrição)
+METRICAS = {
+    'auto_rta_http_requests_total': ('counter', 'Requisições HTTP atendidas'),
+    'auto_rta_http_request_duration_seconds': ('histogram', 'Latência das requisições HTTP'),
+    'auto_rta_http_requests_in_flight': ('gauge', 'Requisições HTTP em andamento'),
+    'auto_rta_stage_duration_seconds': ('histogram', 'Duração das etapas internas (parse, fill, serialize, trello_*, image_recompress, vin_decode)'),
+    'auto_rta_outbound_requests_total': ('counter', 'Chamadas a serviços externos'),
+    'auto_rta_outbound_request_duration_seconds': ('histogram', 'Latência das chamadas a serviços externos'),
+    'auto_rta_trello_rate_budget': ('gauge', 'Requisições disponíveis no token bucket do Trello (negativo = reservas na fila)'),
+    'auto_rta_trello_rate_queue': ('gauge', 'Chamadas ao Trello aguardando o token bucket'),
+    'auto_rta_trello_rate_wait_seconds': ('histogram', 'Espera pelo token bucket antes de cada chamada ao Trello'),
+    'auto_rta_trello_rate_limited_total': ('counter', 'Respostas 429 recebidas do Trello'),
+    'auto_rta_vin_lookups_total': ('counter', 'VINs decodificados por origem (memory, disk, nhtsa, error)'),
+    'auto_rta_image_bytes_total': ('counter', 'Bytes das imagens anexadas antes (original) e depois (output) da recompressão'),
+}
+
+
+def _chave(nome, labels):
+    return nome, tuple(sorted(labels.items()))
+
+
+class Registro:
+    """
+    Métricas de um processo. Cada worker grava periodicamente um snapshot em
+    <directory>/<pid>.json; render() soma os snapshots de todos os workers do
+    mesmo master do gunicorn (contadores e histogramas de workers que já
+    morreram continuam somando; gauges só dos vivos).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_interval = 1.0
+        self._ultimo_flush = 0.0
+        self._flusher_pid = None
+        self._coletores = {}
+        self.reset()
+
+    def _apos_fork(self):
+        # O lock pode ter sido copiado travado por outra thread do processo pai
+        self._lock = threading.Lock()
+        self._ultimo_flush = 0.0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._sujo = False
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    def configurar(self, directory, flush_interval=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+
+    def coletor(self, nome, funcao):
+        """
+        Registra uma função chamada no render() que devolve [(métrica, labels, valor)]
+        de gauges com estado já compartilhado entre os processos (não são somados)
+        """
+        self._coletores[nome] = funcao
+
+    def inc(self, nome, labels, valor=1):
+        chave = _chave(nome, labels)
+        with self._lock:
+            self._counters[chave] = self._counters.get(chave, 0) + valor
+            self._sujo = True
+
+    def gauge_add(self, nome, labels, delta):
+        chave = _chave(nome, labels)
+        with self._lock:
+            self._gauges[chave] = self._gauges.get(chave, 0) + delta
+            self._sujo = True
+
+    def observe(self, nome, labels, segundos):
+        chave = _chave(nome, labels)
+        with self._lock:
+            h = self._histograms.get(chave)
+            if h is None:
+                h = self._histograms[chave] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, limite in enumerate(BUCKETS):
+                if segundos <= limite:
+                    h[0][i] += 1
+                    break
+            h[1] += segundos
+            h[2] += 1
+            self._sujo = True
+
+    def _snapshot(self):
+        with self._lock:
+            self._sujo = False
+            return {
+                'pid': os.getpid(),
+                'ppid': os.getppid(),
+                'counters': [[n, list(l), v] for (n, l), v in self._counters.items()],
+                'gauges': [[n, list(l), v] for (n, l), v in self._gauges.items()],
+                'histograms': [[n, list(l), list(h[0]), h[1], h[2]] for (n, l), h in self._histograms.items()],
+            }
+
+    def _flusher(self):
+        # Grava as últimas requisições de um worker que ficou ocioso
+        while True:
+            time.sleep(self.flush_interval)
+            if self._sujo:
+                self.flush(force=True)
+
+    def flush(self, force=False):
+        """Grava o snapshot do processo (no máximo a cada flush_interval segundos)"""
+        agora = time.monotonic()
+        if self.directory is None or (not force and agora - self._ultimo_flush < self.flush_interval):
+            return
+        if self._flusher_pid != os.getpid():
+            # Threads não sobrevivem ao fork: uma por processo, iniciada no primeiro flush
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flusher, name='metrics-flush', daemon=True).start()
+        self._ultimo_flush = agora
+        snapshot = self._snapshot()
+        destino = os.path.join(self.directory, f"{snapshot['pid']}.json")
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, destino)
+        except OSError:
+            pass
+
+    def _snapshots(self):
+        """Snapshots dos workers irmãos (mesmo master); descarta os de masters encerrados"""
+        atual = self._snapshot()
+        if self.directory is None:
+            return [atual]
+        self.flush(force=True)
+        snapshots = []
+        for nome in os.listdir(self.directory):
+            if not nome.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, nome)
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot['pid'] == atual['pid']:
+                snapshots.append(atual)
+            elif snapshot['ppid'] == atual['ppid']:
+                if not _vivo(snapshot['pid']):
+                    snapshot['gauges'] = []
+                snapshots.append(snapshot)
+            elif not _vivo(snapshot['ppid']):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        return snapshots
+
+    def render(self):
+        """Métricas agregadas no formato texto do Prometheus"""
+        counters, gauges, histograms = {}, {}, {}
+        for snapshot in self._snapshots():
+            for n, l, v in snapshot['counters']:
+                chave = (n, tuple(map(tuple, l)))
+                counters[chave] = counters.get(chave, 0) + v
+            for n, l, v in snapshot['gauges']:
+                chave = (n, tuple(map(tuple, l)))
+                gauges[chave] = gauges.get(chave, 0) + v
+            for n, l, buckets, soma, count in snapshot['histograms']:
+                chave = (n, tuple(map(tuple, l)))
+                h = histograms.setdefault(chave, [[0] * len(BUCKETS), 0.0, 0])
+                h[0] = [a + b for a, b in zip(h[0], buckets)]
+                h[1] += soma
+                h[2] += count
+        for funcao in list(self._coletores.values()):
+            for n, labels, valor in funcao():
+                gauges[(n, tuple(sorted(labels.items())))] = valor
+
+        linhas = []
+        for nome, (tipo, descricao) in METRICAS.items():
+            linhas.append(f'# HELP {nome} {descricao}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+            if tipo == 'histogram':
+                for (n, labels), (buckets, soma, count) in sorted(histograms.items()):
+                    if n != nome:
+                        continue
+                    acumulado = 0
+                    for limite, c in zip(BUCKETS, buckets):
+                        acumulado += c
+                        linhas.append(f'{nome}_bucket{_labels(labels, le=_num(limite))} {acumulado}')
+                    linhas.append(f'{nome}_bucket{_labels(labels, le="+Inf")} {count}')
+                    linhas.append(f'{nome}_sum{_labels(labels)} {_num(soma)}')
+                    linhas.append(f'{nome}_count{_labels(labels)} {count}')
+            else:
+                valores = counters if tipo == 'counter' else gauges
+                for (n, labels), valor in sorted(valores.items()):
+                    if n == nome:
+                        linhas.append(f'{nome}{_labels(labels)} {_num(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _num(valor):
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def _labels(labels, **extra):
+    pares = list(labels) + list(extra.items())
+    if not pares:
+        return ''
+    texto = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for k, v in pares)
+    return '{' + texto + '}'
+
+
+registro = Registro()
+# Com preload do gunicorn o master já registrou o warm-up: cada worker começa zerado
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registro._apos_fork)
+
+
+class _Medicao:
+    status = None
+
+
+def server_timing(etapa, segundos):
+    """Acumula a etapa no Server-Timing da requisição atual (se houver uma)"""
+    if has_request_context():
+        etapas = g.setdefault('server_timing', {})
+        total, vezes = etapas.get(etapa, (0.0, 0))
+        etapas[etapa] = (total + segundos, vezes + 1)
+
+
+@contextmanager
+def medir(etapa, externo=None):
+    """
+    Mede uma etapa: histograma auto_rta_stage_duration_seconds e Server-Timing.
+    Com externo=(serviço, operação) também conta a chamada externa; atribua
+    .status ao objeto retornado (código HTTP) para rotulá-la.
+    """
+    medicao = _Medicao()
+    t0 = time.perf_counter()
+    try:
+        yield medicao
+    except BaseException:
+        medicao.status = medicao.status or 'error'
+        raise
+    finally:
+        segundos = time.perf_counter() - t0
+        registro.observe('auto_rta_stage_duration_seconds', {'stage': etapa}, segundos)
+        if externo is not None:
+            servico, operacao = externo
+            registro.inc('auto_rta_outbound_requests_total',
+                         {'service': servico, 'operation': operacao, 'status': str(medicao.status)})
+            registro.observe('auto_rta_outbound_request_duration_seconds',
+                             {'service': servico, 'operation': operacao}, segundos)
+        server_timing(etapa, segundos)
+
+
+def instrumentar(app):
+    """Contadores, latência e requisições em andamento por rota, e o header Server-Timing"""
+
+    @app.before_request
+    def _inicio():
+        g.metricas_inicio = time.perf_counter()
+        # Rótulo pela regra da rota (/api/rta/jobs/<job_id>), não pela URL
+        g.metricas_rota = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        registro.gauge_add('auto_rta_http_requests_in_flight', {'route': g.metricas_rota}, 1)
+
+    @app.after_request
+    def _fim(response):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is None:
+            return response
+        segundos = time.perf_counter() - inicio
+        labels = {'route': g.metricas_rota, 'method': request.method}
+        registro.inc('auto_rta_http_requests_total', dict(labels, status=str(response.status_code)))
+        registro.observe('auto_rta_http_request_duration_seconds', labels, segundos)
+
+        etapas = g.get('server_timing', {})
+        partes = []
+        for etapa, (total, vezes) in etapas.items():
+            desc = f';desc="{vezes}x"' if vezes > 1 else ''
+            partes.append(f'{etapa};dur={total * 1000:.1f}{desc}')
+        partes.append(f'total;dur={segundos * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(partes)
+        response.headers['Timing-Allow-Origin'] = '*'
+        return response
+
+    @app.teardown_request
+    def _teardown(exc):
+        rota_atual = g.pop('metricas_rota', None)
+        if rota_atual is not None:
+            registro.gauge_add('auto_rta_http_requests_in_flight', {'route': rota_atual}, -1)
+        registro.flush()
+
@@ -0,0 +1,143 @@
+from http.cookiejar import DefaultCookiePolicy
+import os
+import socket
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.util.limite_trello import LimitadorTrello
+
+# Métodos repetidos também em erro de leitura/5xx; POST (criar card, anexo) só
+# é repetido quando a conexão nem chegou a ser aberta, para não duplicar cards
+_METODOS_IDEMPOTENTES = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+_STATUS_REPETIR = (502, 503, 504)
+
+
+def _opcoes_keepalive(idle):
+    """SO_KEEPALIVE + tempos do TCP keep-alive (quando a plataforma expõe as opções)"""
+    opcoes = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if idle:
+        for nome, valor in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', max(1, idle // 4)), ('TCP_KEEPCNT', 4)):
+            if hasattr(socket, nome):
+                opcoes.append((socket.IPPROTO_TCP, getattr(socket, nome), valor))
+    return opcoes
+
+
+class SessaoTrello(requests.Session):
+    """
+    Session que passa cada chamada pelo limitador de requisições do Trello.
+    Um 429 pausa o limitador pelo Retry-After; chamadas idempotentes são
+    repetidas (até limitador.retries vezes), as demais devolvem o 429.
+    """
+
+    limitador = None
+
+    def send(self, request, **kwargs):
+        if self.limitador is None:
+            return super().send(request, **kwargs)
+        tentativa = 0
+        while True:
+            self.limitador.aguardar(request.url)
+            resposta = super().send(request, **kwargs)
+            if resposta.status_code != 429:
+                return resposta
+            pausa = self.limitador.limitado(request.url, resposta, tentativa)
+            if (request.method not in _METODOS_IDEMPOTENTES or tentativa >= self.limitador.retries
+                    or pausa > self.limitador.max_espera):
+                return resposta
+            resposta.close()
+            tentativa += 1
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    def __init__(self, socket_options, **kwargs):
+        self._socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self._socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def criar_sessao(pool_maxsize=10, retries=3, backoff=0.3, keepalive_idle=60, limitador=None):
+    """
+    Session com pool de conexões keep-alive, retries com backoff exponencial
+    (com jitter) e, opcionalmente, o limitador de requisições do Trello.
+
+    O pool do urllib3 é thread-safe; cookies ficam desligados para que a
+    Session não tenha outro estado mutável compartilhado entre as threads.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        backoff_jitter=backoff,
+        status_forcelist=_STATUS_REPETIR,
+        allowed_methods=_METODOS_IDEMPOTENTES,
+        raise_on_status=False,
+    )
+    adapter = _KeepAliveAdapter(
+        _opcoes_keepalive(keepalive_idle),
+        pool_connections=4,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    sessao = SessaoTrello()
+    sessao.limitador = limitador
+    sessao.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    sessao.mount('https://', adapter)
+    sessao.mount('http://', adapter)
+    return sessao
+
+
+_sessao = None
+_sessao_pid = None
+_sessao_lock = threading.Lock()
+
+
+def _apos_fork():
+    # Conexões herdadas do master seriam o mesmo socket (e a mesma sessão TLS)
+    # em vários processos: o filho abandona a Session sem fechá-la
+    global _sessao, _sessao_pid, _sessao_lock
+    _sessao = None
+    _sessao_pid = None
+    _sessao_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_apos_fork)
+
+
+def get_trello_session(config):
+    """Retorna a Session do processo para a API do Trello (criada no primeiro uso)"""
+    global _sessao, _sessao_pid
+    pid = os.getpid()
+    if _sessao is None or _sessao_pid != pid:
+        with _sessao_lock:
+            if _sessao is None or _sessao_pid != pid:
+                limitador = None
+                if config.get('TRELLO_RATE_LIMIT'):
+                    limitador = LimitadorTrello(
+                        config.get('TRELLO_RATE_DIR') or os.path.join(tempfile.gettempdir(), 'auto-rta-trello-rate'),
+                        limite_key=config.get('TRELLO_RATE_LIMIT_KEY') or 300,
+                        limite_token=config.get('TRELLO_RATE_LIMIT_TOKEN') or 100,
+                        janela=config.get('TRELLO_RATE_WINDOW') or 10.0,
+                        burst=config.get('TRELLO_RATE_BURST') or 10,
+                        max_espera=config.get('TRELLO_RATE_MAX_WAIT', 30.0),
+                        retries=config.get('TRELLO_RETRIES', 3),
+                        backoff=config.get('TRELLO_RETRY_BACKOFF') or 0.3,
+                    )
+                _sessao = criar_sessao(
+                    pool_maxsize=config.get('TRELLO_POOL_MAXSIZE') or 10,
+                    retries=config.get('TRELLO_RETRIES', 3),
+                    backoff=config.get('TRELLO_RETRY_BACKOFF', 0.3),
+                    keepalive_idle=config.get('TRELLO_KEEPALIVE_IDLE', 60),
+                    limitador=limitador,
+                )
+                _sessao_pid = pid
+    return _sessao
@@ -0,0 +1,321 @@
+"""
+Benchmark do caminho de geração de RTAs
+
+Cenários (filtráveis com -k, padrão glob):
+  fill/<seguradora>/warm     preencher_rta com o template já carregado
+  fill/<seguradora>/cold     RTAService novo a cada iteração (parse do template incluso)
+  batch/service/<n>          n preenchimentos seguidos (seguradoras alternadas)
+  batch/http/<n>             POST /api/rta/batch com n registros (ZIP completo)
+  threads/<k>                k threads preenchendo em paralelo no mesmo RTAService
+  processes/<k>              RTAPool com k processos
+  http/rta                   POST /api/rta pelo test client do Flask (cache miss)
+  http/rta/hit               POST /api/rta repetido (cache hit)
+
+Para cada cenário: throughput, latência (p50/p95/p99/max), pico de memória
+(tracemalloc, numa passada separada) e tamanho do PDF gerado. O resultado
+sai em JSON (--json) e pode ser comparado com uma baseline gravada antes:
+
+Uso (a partir de auto-rta/backend):
+    python tools/benchmark_rta.py --json /tmp/antes.json
+    python tools/benchmark_rta.py --baseline /tmp/antes.json --max-regression 10
+    python tools/benchmark_rta.py -k 'fill/*' --threshold p95_ms=5 --threshold throughput=15
+
+A saída é 1 quando algum cenário piora além do limite (útil em CI).
+"""
+
+import argparse
+import fnmatch
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Adicionar o diretório backend (e tools, para a AMOSTRA) ao path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.rta_pool import RTAPool
+from app.services.rta_schema import INSURANCE_COMPANIES
+from app.services.rta_service import RTAService
+from optimize_template import AMOSTRA
+
+# Métricas comparadas com a baseline: nome -> True se maior é melhor
+METRICAS = {
+    'throughput': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'peak_mem_kb': False,
+    'output_bytes': False,
+}
+
+
+def _amostra(i, insurance_company=None):
+    """Payload distinto por iteração (evita cache de conteúdo no caminho HTTP)"""
+    return dict(AMOSTRA, insurance_company=insurance_company or INSURANCE_COMPANIES[i % len(INSURANCE_COMPANIES)],
+                owner_name=f'Alves, Caio {i}')
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+
+class Cenario:
+    """
+    Um cenário do benchmark
+    :param executar: função (i) -> bytes gerados; uma chamada é uma "operação"
+    :param registros: RTAs gerados por operação (throughput em RTAs/s)
+    :param preparar: chamada uma vez antes das medições (warm-up)
+    :param threads: executa as operações em paralelo nesse número de threads
+    """
+
+    def __init__(self, nome, executar, registros=1, preparar=None, threads=1, encerrar=None):
+        self.nome = nome
+        self.executar = executar
+        self.registros = registros
+        self.preparar = preparar
+        self.threads = threads
+        self.encerrar = encerrar
+
+
+def medir(cenario, iteracoes, memoria=True):
+    if cenario.preparar:
+        cenario.preparar()
+
+    latencias = []
+    tamanho = 0
+    lock = threading.Lock()
+
+    def operacao(i):
+        nonlocal tamanho
+        t0 = time.perf_counter()
+        saida = cenario.executar(i)
+        dt = time.perf_counter() - t0
+        with lock:
+            latencias.append(dt)
+            # Maior saída (independe da ordem em que as threads terminam)
+            tamanho = max(tamanho, len(saida))
+
+    inicio = time.perf_counter()
+    if cenario.threads > 1:
+        with ThreadPoolExecutor(max_workers=cenario.threads) as executor:
+            list(executor.map(operacao, range(iteracoes)))
+    else:
+        for i in range(iteracoes):
+            operacao(i)
+    total = time.perf_counter() - inicio
+
+    # Pico de memória numa passada curta separada: tracemalloc deixa tudo mais lento
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            for i in range(min(3, iteracoes)):
+                cenario.executar(iteracoes + i)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    if cenario.encerrar:
+        cenario.encerrar()
+
+    ms = [v * 1000 for v in latencias]
+    return {
+        'iterations': iteracoes,
+        'records_per_op': cenario.registros,
+        'threads': cenario.threads,
+        'throughput': round(iteracoes * cenario.registros / total, 2),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p50_ms': round(_percentil(ms, 50), 3),
+        'p95_ms': round(_percentil(ms, 95), 3),
+        'p99_ms': round(_percentil(ms, 99), 3),
+        'max_ms': round(max(ms), 3),
+        'peak_mem_kb': round(pico / 1024, 1) if pico is not None else None,
+        'output_bytes': tamanho,
+    }
+
+
+def cenarios(args):
+    servico = RTAService()
+    lista = []
+
+    for seguradora in INSURANCE_COMPANIES:
+        lista.append(Cenario(
+            f'fill/{seguradora}/warm',
+            lambda i, s=seguradora: servico.preencher_rta(_amostra(i, s)).getvalue(),
+            preparar=lambda s=seguradora: servico.get_template(s),
+        ))
+        lista.append(Cenario(
+            f'fill/{seguradora}/cold',
+            lambda i, s=seguradora: RTAService().preencher_rta(_amostra(i, s)).getvalue(),
+        ))
+
+    for n in args.batch_sizes:
+        def lote_servico(i, n=n):
+            saida = b''
+            for j in range(n):
+                saida = servico.preencher_rta(_amostra(i * n + j)).getvalue()
+            return saida
+        lista.append(Cenario(f'batch/service/{n}', lote_servico, registros=n, preparar=servico.warm_up))
+
+    for k in args.threads:
+        lista.append(Cenario(
+            f'threads/{k}',
+            lambda i: servico.preencher_rta(_amostra(i)).getvalue(),
+            preparar=servico.warm_up,
+            threads=k,
+        ))
+
+    for k in args.processes:
+        pool = RTAPool(k)
+
+        def aquecer(pool=pool, k=k):
+            # Sobe os processos (e carrega os templates) antes de medir
+            for futuro in [pool.submit(_amostra(i)) for i in range(k * 2)]:
+                futuro.result()
+
+        lista.append(Cenario(
+            f'processes/{k}',
+            lambda i, pool=pool: pool.submit(_amostra(i)).result(),
+            preparar=aquecer,
+            threads=k,
+            encerrar=pool.shutdown,
+        ))
+
+    cliente = {}
+
+    def app_cliente():
+        if 'c' not in cliente:
+            from app import create_app
+            cliente['c'] = create_app().test_client()
+        return cliente['c']
+
+    def http_rta(i):
+        resposta = app_cliente().post('/api/rta', json=_amostra(i))
+        assert resposta.status_code == 200, resposta.status_code
+        return resposta.data
+
+    lista.append(Cenario('http/rta', http_rta, preparar=app_cliente))
+    lista.append(Cenario('http/rta/hit', lambda i: http_rta(0), preparar=lambda: http_rta(0)))
+
+    for n in args.batch_sizes:
+        def http_lote(i, n=n):
+            resposta = app_cliente().post('/api/rta/batch', json=[_amostra(i * n + j) for j in range(n)])
+            assert resposta.status_code == 200, resposta.status_code
+            with zipfile.ZipFile(io.BytesIO(resposta.data)) as zf:
+                manifest = json.loads(zf.read('manifest.json'))
+            assert not manifest['errors'], manifest
+            return resposta.data
+        lista.append(Cenario(f'batch/http/{n}', http_lote, registros=n, preparar=app_cliente))
+
+    return lista
+
+
+def comparar(resultados, baseline, limites):
+    """
+    Compara cada métrica com a baseline
+    :param limites: métrica -> piora máxima tolerada em %
+    :return: lista de regressões (cenário, métrica, baseline, atual, variação %)
+    """
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = baseline.get(nome)
+        if not anterior:
+            continue
+        for metrica, maior_melhor in METRICAS.items():
+            a, b = anterior.get(metrica), atual.get(metrica)
+            if not a or b is None or metrica not in limites:
+                continue
+            variacao = (b - a) / a * 100
+            piora = -variacao if maior_melhor else variacao
+            if piora > limites[metrica]:
+                regressoes.append((nome, metrica, a, b, variacao))
+    return regressoes
+
+
+def _limites(args):
+    limites = {metrica: args.max_regression for metrica in METRICAS}
+    # Tamanho do PDF é determinístico: qualquer aumento é relevante
+    limites['output_bytes'] = 0.0
+    for item in args.threshold:
+        metrica, _, valor = item.partition('=')
+        if metrica not in METRICAS or not valor:
+            raise SystemExit(f'--threshold inválido: {item} (métricas: {", ".join(METRICAS)})')
+        limites[metrica] = float(valor)
+    return limites
+
+
+def _lista_int(texto):
+    return [int(v) for v in texto.split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark da geração de RTAs')
+    parser.add_argument('-k', '--scenarios', action='append', default=[],
+                        help='padrão glob dos cenários (pode repetir; padrão: todos)')
+    parser.add_argument('-n', '--iterations', type=int, default=30, help='operações por cenário (padrão 30)')
+    parser.add_argument('--cold-iterations', type=int, default=5, help='operações dos cenários cold (padrão 5)')
+    parser.add_argument('--batch-sizes', type=_lista_int, default=[10], help='tamanhos de lote, ex.: 10,50')
+    parser.add_argument('--threads', type=_lista_int, default=[2, 4], help='níveis de concorrência com threads')
+    parser.add_argument('--processes', type=_lista_int, default=[2], help='níveis de concorrência com processos')
+    parser.add_argument('--no-memory', action='store_true', help='não medir pico de memória')
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--max-regression', type=float, default=10.0,
+                        help='piora máxima tolerada em %% para todas as métricas (padrão 10)')
+    parser.add_argument('--threshold', action='append', default=[],
+                        help='limite por métrica, ex.: p95_ms=5 (pode repetir)')
+    parser.add_argument('--list', action='store_true', help='lista os cenários e sai')
+    args = parser.parse_args(argv)
+    limites = _limites(args)
+
+    selecionados = [c for c in cenarios(args)
+                    if not args.scenarios or any(fnmatch.fnmatch(c.nome, p) for p in args.scenarios)]
+    if args.list:
+        print('\n'.join(c.nome for c in selecionados))
+        return 0
+
+    resultados = {}
+    print(f'{"cenário":<26}{"RTAs/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"pico KB":>11}{"PDF KB":>10}')
+    for cenario in selecionados:
+        iteracoes = args.cold_iterations if cenario.nome.endswith('/cold') else args.iterations
+        r = resultados[cenario.nome] = medir(cenario, iteracoes, memoria=not args.no_memory)
+        pico = f'{r["peak_mem_kb"]:,.0f}' if r['peak_mem_kb'] is not None else '-'
+        print(f'{cenario.nome:<26}{r["throughput"]:>10.1f}{r["p50_ms"]:>10.2f}{r["p95_ms"]:>10.2f}'
+              f'{r["p99_ms"]:>10.2f}{pico:>11}{r["output_bytes"] / 1024:>10.1f}')
+
+    saida = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': resultados,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(saida, f, indent=2)
+        print(f'\nResultados gravados em {args.json}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressoes = comparar(resultados, baseline, limites)
+        if regressoes:
+            print(f'\n❌ {len(regressoes)} regressão(ões) em relação a {args.baseline}:')
+            for nome, metrica, a, b, variacao in regressoes:
+                print(f'   {nome:<26}{metrica:<14}{a:>12}{b:>12}{variacao:>+9.1f}%')
+            return 1
+        print(f'\n✅ Sem regressões em relação a {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Driver de carga do fluxo de intake (POST /api/trello multipart com imagens)
+
+Reproduz envios realistas do formulário: payload JSON com titular, cônjuge,
+veículos e drivers, mais 0..N imagens de tamanhos variados. Para cada nível
+de concorrência mede throughput, latência (p50/p95/p99/max), status das
+respostas e a saturação dos workers (requisições em andamento em
+/api/metrics, amostradas durante a carga).
+
+Contra um servidor já rodando (ex.: gunicorn apontando para o stand-in):
+    python tools/trello_standin.py --port 8790 &
+    TRELLO_API_BASE=http://127.0.0.1:8790/1 TRELLO_KEY=k TRELLO_TOKEN=t TRELLO_ID_LIST=l \\
+        gunicorn -c gunicorn.conf.py -w 2 --threads 4 -b 127.0.0.1:5000 start:app
+    python tools/load_intake.py --url http://127.0.0.1:5000 --capacity 8 -c 1,4,8,16 --duration 30
+
+Tudo no mesmo processo (stand-in + app Flask em threads):
+    python tools/load_intake.py --local -c 1,4,8 --requests 100 --latency-ms 100
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Adicionar o diretório backend (e tools, para o stand-in) ao path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from trello_standin import QuietRequestHandler, StandinServer, add_arguments, config_from_args
+
+_NOMES = ['Caio Alves', 'Maria Souza', 'John Smith', 'Ana Pereira', 'Lucas Oliveira', 'Julia Santos']
+_CIDADES = [('Boston', 'MA', '02110'), ('East Falmouth', 'MA', '02536'), ('Framingham', 'MA', '01701'),
+            ('Orlando', 'FL', '32801'), ('Newark', 'NJ', '07102')]
+_VEICULOS = [('2021', 'Honda', 'Civic'), ('2018', 'Toyota', 'Corolla'), ('2015', 'Ford', 'F-150'),
+             ('2023', 'Tesla', 'Model 3'), ('2012', 'Nissan', 'Altima')]
+_IN_FLIGHT = re.compile(r'^auto_rta_http_requests_in_flight\{route="([^"]*)"\} (\S+)$', re.M)
+
+
+def _vin(rng):
+    return ''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ0123456789') for _ in range(17))
+
+
+def payload(rng):
+    """Payload do formulário de intake (mesmos campos que o frontend envia)"""
+    nome = rng.choice(_NOMES)
+    cidade, estado, zipcode = rng.choice(_CIDADES)
+    dados = {
+        'nome': nome,
+        'documento': f'S{rng.randrange(10 ** 7, 10 ** 8)}',
+        'documento_estado': estado,
+        'endereco_rua': f'{rng.randrange(1, 999)} Main St',
+        'endereco_cidade': cidade,
+        'endereco_estado': estado,
+        'endereco_zipcode': zipcode,
+        'data_nascimento': f'{rng.randrange(1950, 2004)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}',
+        'genero': rng.choice(['Masculino', 'Feminino']),
+        'estado_civil': rng.choice(['Solteiro', 'Casado']),
+        'tempo_de_seguro': rng.choice(['Nunca teve', '1 ano', '3 anos']),
+        'tempo_no_endereco': rng.choice(['6 meses', '2 anos']),
+        'email': nome.lower().replace(' ', '') + '@outlook.com',
+        'veiculos': [
+            {'vin': _vin(rng), 'placa': f'{rng.randrange(100, 999)}XY{rng.randrange(1, 9)}',
+             'financiado': rng.choice(['Financiado', 'Quitado']), 'tempo_com_veiculo': '1 ano',
+             'ano': ano, 'marca': marca, 'modelo': modelo}
+            for ano, marca, modelo in rng.sample(_VEICULOS, rng.randint(1, 3))
+        ],
+        'pessoas': [
+            {'nome': rng.choice(_NOMES), 'documento': f'S{rng.randrange(10 ** 7, 10 ** 8)}',
+             'data_nascimento': '1990-05-17', 'parentesco': 'Filho(a)', 'genero': 'Feminino'}
+            for _ in range(rng.randint(0, 2))
+        ],
+        'observacoes': 'Cliente prefere contato por WhatsApp.',
+    }
+    if dados['estado_civil'] == 'Casado':
+        dados.update({'nome_conjuge': rng.choice(_NOMES), 'data_nascimento_conjuge': '1988-03-02',
+                      'documento_conjuge': f'S{rng.randrange(10 ** 7, 10 ** 8)}'})
+    return dados
+
+
+class Imagens:
+    """Imagens sintéticas (cabeçalho JPEG + bytes aleatórios), geradas uma vez e reutilizadas"""
+
+    def __init__(self, tamanhos_kb, seed):
+        rng = random.Random(seed)
+        self.arquivos = [
+            b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + rng.randbytes(kb * 1024 - 13) + b'\xff\xd9'
+            for kb in tamanhos_kb
+        ]
+
+    def sortear(self, rng, maximo):
+        return [rng.choice(self.arquivos) for _ in range(rng.randint(0, maximo))]
+
+
+class Amostrador(threading.Thread):
+    """Lê /api/metrics periodicamente e registra as requisições em andamento no intake"""
+
+    def __init__(self, base_url, rota, intervalo):
+        super().__init__(name='saturation-sampler', daemon=True)
+        self.url = f'{base_url}/api/metrics'
+        self.rota = rota
+        self.intervalo = intervalo
+        self.amostras = []
+        self.erro = None
+        self._parar = threading.Event()
+
+    def run(self):
+        sessao = requests.Session()
+        while not self._parar.wait(self.intervalo):
+            try:
+                texto = sessao.get(self.url, timeout=5).text
+            except requests.RequestException as e:
+                self.erro = str(e)
+                continue
+            self.amostras.append(sum(float(v) for rota, v in _IN_FLIGHT.findall(texto) if rota == self.rota))
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+
+def rodar(base_url, concorrencia, args, imagens):
+    local = threading.local()
+    latencias, status = [], Counter()
+    lock = threading.Lock()
+    fim = time.monotonic() + args.duration if args.duration else None
+    total = None if args.duration else args.requests
+    contador = iter(range(10 ** 9))
+
+    def envio(rng):
+        arquivos = [('images', (f'foto_{i}.jpg', dados, 'image/jpeg'))
+                    for i, dados in enumerate(imagens.sortear(rng, args.max_images))]
+        form = {'payload': json.dumps(payload(rng))}
+        t0 = time.perf_counter()
+        try:
+            resposta = local.sessao.post(f'{base_url}/api/trello', data=form, files=arquivos or None,
+                                         timeout=args.timeout)
+            codigo = str(resposta.status_code)
+        except requests.RequestException as e:
+            codigo = type(e).__name__
+        dt = time.perf_counter() - t0
+        with lock:
+            latencias.append(dt)
+            status[codigo] += 1
+
+    def cliente(indice):
+        local.sessao = requests.Session()
+        rng = random.Random(args.seed * 1000 + indice)
+        while True:
+            if fim is not None and time.monotonic() >= fim:
+                return
+            n = next(contador)
+            if total is not None and n >= total:
+                return
+            envio(rng)
+
+    amostrador = Amostrador(base_url, '/api/trello', args.sample_interval)
+    amostrador.start()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(cliente, range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    amostrador.parar()
+
+    ms = [v * 1000 for v in latencias]
+    ok = sum(v for k, v in status.items() if k.startswith('2'))
+    amostras = amostrador.amostras
+    resultado = {
+        'concurrency': concorrencia,
+        'requests': len(latencias),
+        'ok': ok,
+        'status': dict(status),
+        'duration_s': round(duracao, 2),
+        'throughput': round(len(latencias) / duracao, 2) if duracao else 0,
+        'ok_throughput': round(ok / duracao, 2) if duracao else 0,
+        'p50_ms': round(_percentil(ms, 50), 1) if ms else None,
+        'p95_ms': round(_percentil(ms, 95), 1) if ms else None,
+        'p99_ms': round(_percentil(ms, 99), 1) if ms else None,
+        'max_ms': round(max(ms), 1) if ms else None,
+        'in_flight_mean': round(statistics.fmean(amostras), 2) if amostras else None,
+        'in_flight_max': max(amostras) if amostras else None,
+    }
+    if args.capacity and amostras:
+        resultado['saturation_mean'] = round(resultado['in_flight_mean'] / args.capacity, 3)
+        resultado['saturation_max'] = round(resultado['in_flight_max'] / args.capacity, 3)
+    if amostrador.erro and not amostras:
+        resultado['sampler_error'] = amostrador.erro
+    return resultado
+
+
+def _servidor_local(args):
+    """Stand-in + app Flask em threads, com o app apontando para o stand-in"""
+    from werkzeug.serving import make_server
+
+    standin = StandinServer(config_from_args(args)).start()
+    os.environ.update({
+        'TRELLO_API_BASE': standin.url,
+        'TRELLO_KEY': 'standin-key',
+        'TRELLO_TOKEN': 'standin-token',
+        'TRELLO_ID_LIST': 'standin-list',
+        'RTA_WARMUP': 'false',
+    })
+    os.environ.pop('TRELLO_URL', None)
+    from app import create_app
+    servidor = make_server('127.0.0.1', 0, create_app(), threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=servidor.serve_forever, name='flask-app', daemon=True).start()
+    return f'http://127.0.0.1:{servidor.server_port}', standin
+
+
+def _lista_int(texto):
+    return [int(v) for v in texto.split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Carga no intake /api/trello com imagens')
+    alvo = parser.add_mutually_exclusive_group(required=True)
+    alvo.add_argument('--url', help='URL base do backend, ex.: http://127.0.0.1:5000')
+    alvo.add_argument('--local', action='store_true', help='sobe stand-in e app no próprio processo')
+    parser.add_argument('-c', '--concurrency', type=_lista_int, default=[1, 4, 8],
+                        help='níveis de concorrência, ex.: 1,4,16 (padrão 1,4,8)')
+    parser.add_argument('--requests', type=int, default=50, help='envios por nível (padrão 50)')
+    parser.add_argument('--duration', type=float, help='segundos por nível (substitui --requests)')
+    parser.add_argument('--max-images', type=int, default=4, help='imagens por envio: 0..N (padrão 4)')
+    parser.add_argument('--image-kb', type=_lista_int, default=[150, 600, 1500],
+                        help='tamanhos das imagens sintéticas em KB (padrão 150,600,1500)')
+    parser.add_argument('--capacity', type=int,
+                        help='requisições simultâneas suportadas (workers x threads) para a saturação')
+    parser.add_argument('--sample-interval', type=float, default=0.25, help='intervalo de leitura do /api/metrics')
+    parser.add_argument('--timeout', type=float, default=120.0, help='timeout de cada envio em segundos')
+    parser.add_argument('--standin-url', help='URL do stand-in (.../1) para incluir as estatísticas dele')
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.seed is None:
+        args.seed = 1
+
+    standin = None
+    if args.local:
+        base_url, standin = _servidor_local(args)
+        args.standin_url = standin.url
+    else:
+        base_url = args.url.rstrip('/')
+    imagens = Imagens(args.image_kb, args.seed)
+
+    resultados = []
+    print(f'{"conc.":>6}{"envios":>8}{"ok":>6}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+          f'{"max ms":>10}{"em andamento":>15}  status')
+    for concorrencia in args.concurrency:
+        r = rodar(base_url, concorrencia, args, imagens)
+        resultados.append(r)
+        em_andamento = '-' if r['in_flight_mean'] is None else f'{r["in_flight_mean"]:.1f}/{r["in_flight_max"]:.0f}'
+        if 'saturation_mean' in r:
+            em_andamento += f' ({r["saturation_mean"]:.0%})'
+        print(f'{concorrencia:>6}{r["requests"]:>8}{r["ok"]:>6}{r["throughput"]:>9.1f}{r["p50_ms"] or 0:>10.1f}'
+              f'{r["p95_ms"] or 0:>10.1f}{r["p99_ms"] or 0:>10.1f}{r["max_ms"] or 0:>10.1f}{em_andamento:>15}'
+              f'  {json.dumps(r["status"], sort_keys=True)}')
+
+    saida = {'target': base_url, 'results': resultados}
+    if args.standin_url:
+        try:
+            saida['standin'] = requests.get(args.standin_url.rstrip('/').rsplit('/1', 1)[0] + '/_stats',
+                                            timeout=5).json()
+            print(f'\nStand-in: {json.dumps(saida["standin"], sort_keys=True)}')
+        except (requests.RequestException, ValueError) as e:
+            print(f'\n⚠️  Não foi possível ler as estatísticas do stand-in: {e}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(saida, f, indent=2)
+        print(f'Resultados gravados em {args.json}')
+    if standin is not None:
+        standin.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Otimizador offline dos templates RTA (app/assets/rta_template_*.pdf)
+
+Reescreve um template num PDF equivalente e menor:
+  - remove objetos não referenciados (revisões antigas, órfãos)
+  - recomprime streams Flate/sem filtro com zlib nível 9
+  - deduplica streams e fontes idênticas
+  - gera object streams e xref comprimida (requer pikepdf, opcional)
+
+Todos os campos usados pelo RTAService são verificados no arquivo gerado e
+um relatório de tamanho, tempo de carga e tempo de preenchimento é impresso.
+
+Uso (a partir de auto-rta/backend):
+    python tools/optimize_template.py app/assets/rta_template_geico.pdf -o /tmp/geico.pdf
+    python tools/optimize_template.py app/assets/*.pdf --in-place
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import sys
+import time
+import zlib
+
+# Adicionar o diretório backend ao path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, EncodedStreamObject, IndirectObject, NameObject, StreamObject
+)
+
+from app.services.rta_service import RTAService
+from app.services.rta_template import RTATemplate
+
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
+# Payload usado para medir o preenchimento e conferir os campos do template
+AMOSTRA = {
+    'insurance_company': 'allstate', 'owner_name': 'Alves, Caio', 'owner_dob': '2000-10-20',
+    'owner_license': 'S12345678', 'owner_street': '656 Waquoit Hwy', 'owner_city': 'East Falmouth',
+    'owner_state': 'MA', 'owner_zipcode': '02536', 'owner_license_issued_state': 'MA',
+    'vin': '1HGBH41JXMN109186', 'body_style': 'Sedan', 'color': 'Blue', 'year': 2021,
+    'make': 'Honda', 'model': 'Civic', 'cylinders': 4, 'passengers': 5, 'doors': 4, 'odometer': 12000,
+    'seller_name': 'John Doe', 'seller_street': '1 Main St', 'seller_city': 'Boston',
+    'seller_state': 'MA', 'seller_zipcode': '02110', 'gross_sale_price': '25000',
+    'purchase_date': '2024-01-02', 'insurance_effective_date': '2024-01-03',
+    'insurance_policy_change_date': '2024-01-03', 'vehicle_financing_status': 'paid_off',
+    'previous_title_number': 'T123', 'previous_title_state': 'NH', 'previous_title_country': 'USA',
+}
+
+# Dicionários que podem ser deduplicados com segurança além dos streams
+_DEDUP_TYPES = ('/Font', '/FontDescriptor', '/Encoding', '/ExtGState')
+
+
+def _serialize(obj):
+    buf = io.BytesIO()
+    obj.write_to_stream(buf)
+    return buf.getvalue()
+
+
+def recompress_streams(writer):
+    """Recomprime streams sem filtro ou só com /FlateDecode; retorna bytes economizados"""
+    economia = 0
+    for i, obj in enumerate(writer._objects):
+        if not isinstance(obj, StreamObject) or obj.get('/Type') in ('/Metadata', '/XRef', '/ObjStm'):
+            continue
+        filtro = obj.get('/Filter')
+        if filtro not in (None, '/FlateDecode'):
+            continue
+        try:
+            data = obj.get_data()
+        except Exception:
+            continue
+        novo = zlib.compress(data, 9)
+        if len(novo) >= len(obj._data):
+            continue
+        stream = EncodedStreamObject()
+        stream.update({k: v for k, v in obj.items() if k not in ('/Filter', '/DecodeParms', '/Length')})
+        stream[NameObject('/Filter')] = NameObject('/FlateDecode')
+        stream._data = novo
+        stream.indirect_reference = obj.indirect_reference
+        writer._objects[i] = stream
+        economia += len(obj._data) - len(novo)
+    return economia
+
+
+def _remap(obj, mapa):
+    """Troca referências indiretas duplicadas pela canônica (recursivo)"""
+    if isinstance(obj, DictionaryObject):
+        for key, value in list(obj.items()):
+            if isinstance(value, IndirectObject) and value.idnum in mapa:
+                obj[key] = IndirectObject(mapa[value.idnum], 0, value.pdf)
+            else:
+                _remap(value, mapa)
+    elif isinstance(obj, ArrayObject):
+        for idx, value in enumerate(obj):
+            if isinstance(value, IndirectObject) and value.idnum in mapa:
+                obj[idx] = IndirectObject(mapa[value.idnum], 0, value.pdf)
+            else:
+                _remap(value, mapa)
+
+
+def dedupe_objects(writer):
+    """
+    Deduplica streams e fontes com serialização idêntica. Repete até estabilizar,
+    pois remapear filhos pode tornar pais idênticos. Retorna objetos removidos.
+    """
+    removidos = set()
+    while True:
+        vistos, mapa = {}, {}
+        for i, obj in enumerate(writer._objects):
+            if i + 1 in removidos or not isinstance(obj, DictionaryObject):
+                continue
+            if not isinstance(obj, StreamObject) and obj.get('/Type') not in _DEDUP_TYPES:
+                continue
+            if obj.get('/Type') in ('/Page', '/Annot', '/Metadata'):
+                continue
+            digest = hashlib.sha256(_serialize(obj)).digest()
+            if digest in vistos:
+                mapa[i + 1] = vistos[digest]
+            else:
+                vistos[digest] = i + 1
+        if not mapa:
+            return len(removidos)
+        removidos.update(mapa)
+        for obj in writer._objects:
+            if obj is not None:
+                _remap(obj, mapa)
+
+
+def optimize(data, object_streams=True):
+    """Retorna os bytes do template otimizado e um dict com o que foi feito"""
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(data)))
+    info = {
+        'recompressed_bytes': recompress_streams(writer),
+        'deduplicated_objects': dedupe_objects(writer),
+    }
+
+    # Reclonar descarta os objetos que ficaram órfãos na deduplicação
+    buf = io.BytesIO()
+    writer.write(buf)
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(buf.getvalue())))
+    buf = io.BytesIO()
+    writer.write(buf)
+    out = buf.getvalue()
+
+    info['object_streams'] = False
+    if object_streams and pikepdf is not None:
+        with pikepdf.open(io.BytesIO(out)) as pdf:
+            buf = io.BytesIO()
+            pdf.save(
+                buf,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                compress_streams=True,
+                recompress_flate=True,
+                deterministic_id=True,
+            )
+            out = buf.getvalue()
+        info['object_streams'] = True
+    return out, info
+
+
+def measure(path, runs):
+    """Tamanho do arquivo, tempo de carga do RTATemplate e tempo médio de preenchimento"""
+    t0 = time.perf_counter()
+    template = RTATemplate(path)
+    load = time.perf_counter() - t0
+
+    servico = RTAService()
+    servico.templates['__medicao__'] = path
+    amostra = dict(AMOSTRA, insurance_company='__medicao__')
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        servico.get_template('__medicao__')
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            saida = servico.preencher_rta(dict(amostra)).getvalue()
+        fill = (time.perf_counter() - t0) / runs
+    return {
+        'size': os.path.getsize(path),
+        'load_ms': load * 1000,
+        'fill_ms': fill * 1000,
+        'output_size': len(saida),
+        'fields': {nome: [c.field_type for c in campos] for nome, campos in template.fields.items()},
+        'filled': saida,
+    }
+
+
+def verify(antes, depois):
+    """Confere que o template otimizado preserva todos os campos e valores preenchidos"""
+    erros = []
+    if antes['fields'] != depois['fields']:
+        faltando = sorted(set(antes['fields']) - set(depois['fields']))
+        erros.append(f'campos diferentes (faltando: {faltando})')
+    usados = RTAService()._montar_campos({})
+    desconhecidos = sorted(set(usados) - set(depois['fields']))
+    if desconhecidos:
+        erros.append(f'campos do RTAService ausentes: {desconhecidos}')
+    valores_antes = {k: v.get('/V') for k, v in PdfReader(io.BytesIO(antes['filled'])).get_fields().items()}
+    valores_depois = {k: v.get('/V') for k, v in PdfReader(io.BytesIO(depois['filled'])).get_fields().items()}
+    if valores_antes != valores_depois:
+        erros.append('valores preenchidos diferentes')
+    return erros
+
+
+def _kb(n):
+    return f'{n / 1024:,.1f} KB'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Otimiza templates PDF do RTA')
+    parser.add_argument('templates', nargs='+', help='PDFs de entrada')
+    parser.add_argument('-o', '--output', help='arquivo de saída (apenas com um template)')
+    parser.add_argument('--in-place', action='store_true', help='substitui o template original')
+    parser.add_argument('--runs', type=int, default=20, help='preenchimentos para medir o tempo (padrão 20)')
+    parser.add_argument('--no-object-streams', action='store_true', help='não gerar object streams/xref comprimida')
+    args = parser.parse_args(argv)
+
+    if args.output and len(args.templates) > 1:
+        parser.error('--output só pode ser usado com um template')
+    if args.output and args.in_place:
+        parser.error('use --output ou --in-place, não ambos')
+    if not args.no_object_streams and pikepdf is None:
+        print('⚠️  pikepdf não instalado: object streams/xref comprimida desativados')
+
+    falhou = False
+    for path in args.templates:
+        with open(path, 'rb') as f:
+            original = f.read()
+        dados, info = optimize(original, object_streams=not args.no_object_streams)
+
+        if args.in_place:
+            destino = path
+        elif args.output:
+            destino = args.output
+        else:
+            destino = os.path.splitext(path)[0] + '.optimized.pdf'
+        tmp = destino + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(dados)
+
+        antes = measure(path, args.runs)
+        depois = measure(tmp, args.runs)
+        erros = verify(antes, depois)
+
+        print(f'\n📄 {path} -> {destino}')
+        print(f'   {"":<22}{"antes":>14}{"depois":>14}')
+        print(f'   {"tamanho":<22}{_kb(antes["size"]):>14}{_kb(depois["size"]):>14}')
+        print(f'   {"carga do template":<22}{antes["load_ms"]:>11.1f} ms{depois["load_ms"]:>11.1f} ms')
+        print(f'   {"preenchimento":<22}{antes["fill_ms"]:>11.2f} ms{depois["fill_ms"]:>11.2f} ms')
+        print(f'   {"PDF gerado":<22}{_kb(antes["output_size"]):>14}{_kb(depois["output_size"]):>14}')
+        print(f'   recomprimido: {_kb(info["recompressed_bytes"])}, '
+              f'objetos deduplicados: {info["deduplicated_objects"]}, '
+              f'object streams: {"sim" if info["object_streams"] else "não"}')
+
+        if erros:
+            falhou = True
+            os.unlink(tmp)
+            print(f'   ❌ verificação falhou, nada foi gravado: {"; ".join(erros)}')
+        else:
+            os.replace(tmp, destino)
+            print(f'   ✅ {len(depois["fields"])} campos preservados')
+    return 1 if falhou else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
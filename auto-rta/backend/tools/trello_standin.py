@@ -0,0 +1,237 @@
+"""
+Stand-in local da API do Trello para testes de carga
+
+Implementa os endpoints usados pelo backend (/api/trello) e pelo TrelloClient:
+  POST /1/cards                       cria card (idList, name, desc)
+  GET  /1/cards/<id>                  busca card
+  PUT  /1/cards/<id>                  atualiza descrição
+  POST /1/cards/<id>/attachments      anexo multipart (campo 'file')
+  GET  /1/members/me                  usuário do token
+  GET  /1/lists/<id>                  lista
+  GET  /1/lists/<id>/cards            cards da lista
+  GET  /_stats                        contadores de requisições, erros e 429
+
+Latência, taxa de erros e limite de requisições são configuráveis. O limite
+imita o do Trello (janela deslizante por token) e responde 429 com Retry-After.
+
+Uso (a partir de auto-rta/backend):
+    python tools/trello_standin.py --port 8790 --latency-ms 120 --jitter-ms 40 \\
+        --error-rate 0.01 --rate-limit 100 --rate-window 10
+    TRELLO_API_BASE=http://127.0.0.1:8790/1 TRELLO_KEY=k TRELLO_TOKEN=t TRELLO_ID_LIST=l python ../start.py
+"""
+
+import argparse
+import collections
+import itertools
+import random
+import sys
+import threading
+import time
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class StandinConfig:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, attachment_ms_per_mb=0.0, error_rate=0.0,
+                 rate_limit=0, rate_window=10.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.attachment_ms_per_mb = attachment_ms_per_mb
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.random = random.Random(seed)
+
+
+def create_standin(config):
+    """App Flask que responde como a API do Trello (cards em memória)"""
+    app = Flask('trello_standin')
+    lock = threading.Lock()
+    ids = itertools.count(1)
+    cards = {}
+    janelas = collections.defaultdict(collections.deque)
+    stats = collections.Counter()
+
+    def _id():
+        return f'{next(ids):024x}'
+
+    @app.before_request
+    def _simular():
+        if request.path == '/_stats':
+            return None
+        agora = time.monotonic()
+        with lock:
+            stats['requests'] += 1
+            if not request.args.get('key') or not request.args.get('token'):
+                stats['401'] += 1
+                return 'invalid key', 401
+            if config.rate_limit:
+                janela = janelas[request.args['token']]
+                while janela and janela[0] <= agora - config.rate_window:
+                    janela.popleft()
+                if len(janela) >= config.rate_limit:
+                    stats['429'] += 1
+                    espera = max(1, int(janela[0] + config.rate_window - agora + 0.999))
+                    resposta = jsonify({'error': 'API_TOKEN_LIMIT_EXCEEDED',
+                                        'message': 'Rate limit exceeded'})
+                    resposta.status_code = 429
+                    resposta.headers['Retry-After'] = str(espera)
+                    return resposta
+                janela.append(agora)
+            atraso = max(0.0, config.random.gauss(config.latency_ms, config.jitter_ms) if config.jitter_ms
+                         else config.latency_ms)
+            falhar = config.error_rate and config.random.random() < config.error_rate
+
+        if request.path.endswith('/attachments') and config.attachment_ms_per_mb:
+            atraso += (request.content_length or 0) / (1024 * 1024) * config.attachment_ms_per_mb
+        if atraso:
+            time.sleep(atraso / 1000)
+        if falhar:
+            with lock:
+                stats['5xx'] += 1
+            return jsonify({'error': 'Internal Server Error'}), 503
+        return None
+
+    @app.after_request
+    def _contar(response):
+        if request.path != '/_stats' and response.status_code < 400:
+            with lock:
+                stats['ok'] += 1
+        return response
+
+    @app.route('/1/cards', methods=['POST'])
+    def criar_card():
+        if not request.args.get('idList'):
+            return 'invalid value for idList', 400
+        card = {
+            'id': _id(),
+            'name': request.args.get('name', ''),
+            'desc': request.args.get('desc', ''),
+            'idList': request.args['idList'],
+            'attachments': [],
+        }
+        with lock:
+            cards[card['id']] = card
+            stats['cards'] += 1
+        return jsonify({k: v for k, v in card.items() if k != 'attachments'})
+
+    @app.route('/1/cards/<card_id>', methods=['GET', 'PUT'])
+    def card(card_id):
+        with lock:
+            card = cards.get(card_id)
+            if card is None:
+                return 'The requested resource was not found.', 404
+            if request.method == 'PUT' and 'desc' in request.args:
+                card['desc'] = request.args['desc']
+        return jsonify({k: v for k, v in card.items() if k != 'attachments'})
+
+    @app.route('/1/cards/<card_id>/attachments', methods=['POST'])
+    def anexar(card_id):
+        arquivo = request.files.get('file')
+        if arquivo is None:
+            return 'file is required', 400
+        tamanho = len(arquivo.read())
+        anexo = {
+            'id': _id(),
+            'name': request.args.get('name') or arquivo.filename,
+            'bytes': tamanho,
+            'mimeType': arquivo.mimetype,
+        }
+        with lock:
+            card = cards.get(card_id)
+            if card is None:
+                return 'The requested resource was not found.', 404
+            card['attachments'].append(anexo)
+            stats['attachments'] += 1
+            stats['attachment_bytes'] += tamanho
+        return jsonify(anexo)
+
+    @app.route('/1/members/me')
+    def membro():
+        return jsonify({'id': '0' * 24, 'username': 'standin', 'fullName': 'Trello Stand-in'})
+
+    @app.route('/1/lists/<list_id>/cards')
+    def cards_da_lista(list_id):
+        with lock:
+            return jsonify([{'id': c['id'], 'name': c['name'], 'desc': c['desc']}
+                            for c in cards.values() if c['idList'] == list_id])
+
+    @app.route('/1/lists/<list_id>')
+    def lista(list_id):
+        return jsonify({'id': list_id, 'name': 'Stand-in', 'closed': False})
+
+    @app.route('/_stats')
+    def estatisticas():
+        with lock:
+            return jsonify(dict(stats))
+
+    return app
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Sem uma linha de log por requisição (o log custaria mais que a própria resposta sob carga)"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class StandinServer:
+    """Servidor do stand-in numa thread (usado pelo load_intake.py com --local)"""
+
+    def __init__(self, config, host='127.0.0.1', port=0):
+        self.server = make_server(host, port, create_standin(config), threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.url = f'http://{host}:{self.server.server_port}/1'
+        self._thread = threading.Thread(target=self.server.serve_forever, name='trello-standin', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=80.0, help='latência média por chamada (padrão 80)')
+    parser.add_argument('--jitter-ms', type=float, default=20.0, help='desvio padrão da latência (padrão 20)')
+    parser.add_argument('--attachment-ms-per-mb', type=float, default=50.0,
+                        help='latência extra dos anexos por MB enviado (padrão 50)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas 503 (0 a 1)')
+    parser.add_argument('--rate-limit', type=int, default=100,
+                        help='requisições por token na janela; 0 desliga (padrão 100, como o Trello)')
+    parser.add_argument('--rate-window', type=float, default=10.0, help='janela do limite em segundos (padrão 10)')
+    parser.add_argument('--seed', type=int, help='semente para latência/erros reproduzíveis')
+
+
+def config_from_args(args):
+    return StandinConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        attachment_ms_per_mb=args.attachment_ms_per_mb,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        seed=args.seed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stand-in local da API do Trello')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8790)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    servidor = StandinServer(config_from_args(args), args.host, args.port)
+    print(f'Stand-in do Trello em {servidor.url} (TRELLO_API_BASE={servidor.url})')
+    try:
+        servidor.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Stand-in local da API vPIC do NHTSA (decodificação de VIN) para testes
+
+Implementa os endpoints usados pelo /api/vin e pelo frontend antigo:
+  POST /api/vehicles/DecodeVINValuesBatch/     form: format=json, data=VIN1;VIN2;...
+  GET  /api/vehicles/DecodeVinValues/<vin>     um VIN (?format=json)
+  GET  /_stats                                 chamadas, VINs consultados e lotes
+
+Marca, modelo, ano, carroceria, cilindros e portas são derivados do VIN (o
+mesmo VIN sempre dá o mesmo veículo); VINs que começam com 000 não são
+reconhecidos, como um VIN inexistente no vPIC.
+
+Uso (a partir de auto-rta/backend):
+    python tools/vpic_standin.py --port 8791 --latency-ms 300
+    NHTSA_API_BASE=http://127.0.0.1:8791/api/vehicles python ../start.py
+"""
+
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+import zlib
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from trello_standin import QuietRequestHandler
+
+_VEICULOS = [
+    ('HONDA', 'Civic', 'Sedan/Saloon', '4', '4'),
+    ('TOYOTA', 'RAV4', 'Sport Utility Vehicle (SUV)/Multi-Purpose Vehicle (MPV)', '4', '5'),
+    ('FORD', 'F-150', 'Pickup', '6', '4'),
+    ('TESLA', 'Model 3', 'Sedan/Saloon', '', '4'),
+    ('VOLKSWAGEN', 'Golf', 'Hatchback/Liftback/Notchback', '4', '5'),
+    ('CHRYSLER', 'Pacifica', 'Minivan', '6', '4'),
+    ('MAZDA', 'MX-5', 'Convertible/Cabriolet', '4', '2'),
+]
+
+
+def linha_vin(vin):
+    """Linha no formato do DecodeVINValues para um VIN"""
+    if vin.startswith('000'):
+        return {'VIN': vin, 'Make': '', 'Model': '', 'ModelYear': '', 'BodyClass': '', 'EngineCylinders': '',
+                'Doors': '', 'ErrorCode': '7', 'ErrorText': '7 - Manufacturer is not registered with NHTSA'}
+    h = zlib.crc32(vin.encode())
+    make, model, body, cilindros, portas = _VEICULOS[h % len(_VEICULOS)]
+    return {'VIN': vin, 'Make': make, 'Model': model, 'ModelYear': str(2005 + h % 20), 'BodyClass': body,
+            'EngineCylinders': cilindros, 'Doors': portas, 'ErrorCode': '0',
+            'ErrorText': '0 - VIN decoded clean. Check Digit (9th position) is correct'}
+
+
+def create_standin(latency_ms=0.0):
+    app = Flask('vpic_standin')
+    lock = threading.Lock()
+    stats = collections.Counter()
+
+    def _responder(vins):
+        with lock:
+            stats['requests'] += 1
+            stats['vins'] += len(vins)
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        resultados = [linha_vin(v) for v in vins]
+        return jsonify({'Count': len(resultados), 'Message': 'Results returned successfully',
+                        'SearchCriteria': None, 'Results': resultados})
+
+    @app.route('/api/vehicles/DecodeVINValuesBatch/', methods=['POST'])
+    def lote():
+        vins = [v.split(',')[0].strip().upper() for v in (request.form.get('data') or '').split(';') if v.strip()]
+        with lock:
+            stats['batches'] += 1
+        return _responder(vins)
+
+    @app.route('/api/vehicles/DecodeVinValues/<vin>')
+    def um(vin):
+        return _responder([vin.strip().upper()])
+
+    @app.route('/_stats')
+    def estatisticas():
+        with lock:
+            return jsonify(dict(stats))
+
+    return app
+
+
+class VpicServer:
+    """Servidor do stand-in numa thread"""
+
+    def __init__(self, latency_ms=0.0, host='127.0.0.1', port=0):
+        self.server = make_server(host, port, create_standin(latency_ms), threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.url = f'http://{host}:{self.server.server_port}/api/vehicles'
+        self._thread = threading.Thread(target=self.server.serve_forever, name='vpic-standin', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stand-in local da API vPIC do NHTSA')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8791)
+    parser.add_argument('--latency-ms', type=float, default=300.0, help='latência por chamada (padrão 300)')
+    args = parser.parse_args(argv)
+
+    servidor = VpicServer(args.latency_ms, args.host, args.port)
+    print(f'Stand-in do vPIC em {servidor.url} (NHTSA_API_BASE={servidor.url})')
+    try:
+        servidor.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""
+Configuração do Gunicorn (carregada automaticamente quando executado a partir de auto-rta/)
+
+Com preload_app o create_app roda uma vez no master: os templates RTA são
+mapeados e pré-processados antes do fork e os workers herdam essas páginas
+em copy-on-write, em vez de cada um montar a própria cópia.
+Use GET /api/memory para conferir memória única x compartilhada por worker.
+"""
+import gc
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() in ['true', '1', 'yes']
+
+
+def when_ready(server):
+    # Move os objetos já criados no master para a geração permanente do GC:
+    # as coletas nos workers não escrevem nesses objetos, então as páginas
+    # continuam compartilhadas após o fork
+    if preload_app:
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # Threads não sobrevivem ao fork: cada worker inicia o despachante da fila
+    # de RTAs e o entregador da caixa de saída do Trello ao subir, retomando o
+    # que ficou pendente num reinício
+    from app.services.rta_jobs import iniciar_rta_jobs
+    from app.services.trello_outbox import iniciar_trello_outbox
+    iniciar_rta_jobs()
+    iniciar_trello_outbox()
@@ -5,9 +5,13 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
 from app import create_app
+from app.services.rta_jobs import iniciar_rta_jobs
+from app.services.trello_outbox import iniciar_trello_outbox
 
 app = create_app()
 
 if __name__ == '__main__':
+    iniciar_rta_jobs()
+    iniciar_trello_outbox()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -6,8 +6,10 @@ Cria cards e anexa arquivos de forma simplificada
 import requests
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from utils.formatters import formatar_veiculos, formatar_pessoas
+from utils.sessao_http import get_sessao
 
 class TrelloClient:
     """
@@ -26,10 +28,13 @@ class TrelloClient:
         else:
             load_dotenv()
             
-        self.URL_TRELLO = os.getenv("URL_TRELLO", "https://api.trello.com/1/cards")
+        self.API_BASE = os.getenv("TRELLO_API_BASE", "https://api.trello.com/1").rstrip("/")
+        self.URL_TRELLO = os.getenv("URL_TRELLO") or f"{self.API_BASE}/cards"
         self.api_key = os.getenv("TRELLO_KEY")
         self.api_token = os.getenv("TRELLO_TOKEN")
         self.list_id = os.getenv("TRELLO_ID_LIST")
+        # Pool de conexões compartilhado por todos os clientes do processo
+        self.session = get_sessao()
         
         # Validar credenciais
         if not all([self.api_key, self.api_token, self.list_id]):
@@ -106,7 +111,7 @@ class TrelloClient:
         }
         
         try:
-            response = requests.post(self.URL_TRELLO, params=params)
+            response = self.session.post(self.URL_TRELLO, params=params)
             response.raise_for_status()
             return response.json().get("id")
         except requests.exceptions.RequestException as e:
@@ -134,7 +139,7 @@ class TrelloClient:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
         
-        url = f"https://api.trello.com/1/cards/{card_id}/attachments"
+        url = f"{self.API_BASE}/cards/{card_id}/attachments"
         params = {
             'key': self.api_key,
             'token': self.api_token
@@ -143,7 +148,7 @@ class TrelloClient:
         try:
             with open(file_path, 'rb') as file:
                 files = {'file': file}
-                response = requests.post(url, params=params, files=files)
+                response = self.session.post(url, params=params, files=files)
                 response.raise_for_status()
                 return {
                     'success': True,
@@ -158,13 +163,14 @@ class TrelloClient:
                 'error': str(e)
             }
     
-    def anexar_multiplos_arquivos(self, card_id, file_paths):
+    def anexar_multiplos_arquivos(self, card_id, file_paths, max_paralelo=None):
         """
-        Anexa múltiplos arquivos a um card
+        Anexa múltiplos arquivos a um card (envios em paralelo, resultado na ordem de file_paths)
         
         Args:
             card_id (str): ID do card
             file_paths (list): Lista de caminhos de arquivos
+            max_paralelo (int, optional): Envios simultâneos (padrão TRELLO_ATTACHMENT_CONCURRENCY ou 4)
             
         Returns:
             dict: Resumo das anexações
@@ -175,17 +181,27 @@ class TrelloClient:
             'total': len(file_paths)
         }
         
-        for file_path in file_paths:
+        def anexar(file_path):
             if not os.path.exists(file_path):
+                return None
+            return self.anexar_arquivo(card_id, file_path)
+        
+        if max_paralelo is None:
+            max_paralelo = int(os.getenv("TRELLO_ATTACHMENT_CONCURRENCY", "4"))
+        max_paralelo = max(1, min(len(file_paths), max_paralelo))
+        if max_paralelo == 1:
+            respostas = [anexar(p) for p in file_paths]
+        else:
+            with ThreadPoolExecutor(max_workers=max_paralelo) as executor:
+                respostas = list(executor.map(anexar, file_paths))
+        
+        for file_path, resultado in zip(file_paths, respostas):
+            if resultado is None:
                 resultados['falha'].append({
                     'arquivo': file_path,
                     'erro': 'Arquivo não encontrado'
                 })
-                continue
-            
-            resultado = self.anexar_arquivo(card_id, file_path)
-            
-            if resultado.get('success'):
+            elif resultado.get('success'):
                 resultados['sucesso'].append({
                     'arquivo': os.path.basename(file_path),
                     'status': 'OK'
@@ -229,14 +245,14 @@ class TrelloClient:
         Returns:
             dict: Dados do card ou None se não encontrado
         """
-        url = f"https://api.trello.com/1/cards/{card_id}"
+        url = f"{self.API_BASE}/cards/{card_id}"
         params = {
             'key': self.api_key,
             'token': self.api_token
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -254,7 +270,7 @@ class TrelloClient:
         Returns:
             bool: True se atualizado com sucesso
         """
-        url = f"https://api.trello.com/1/cards/{card_id}"
+        url = f"{self.API_BASE}/cards/{card_id}"
         params = {
             'key': self.api_key,
             'token': self.api_token,
@@ -262,7 +278,7 @@ class TrelloClient:
         }
         
         try:
-            response = requests.put(url, params=params)
+            response = self.session.put(url, params=params)
             response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
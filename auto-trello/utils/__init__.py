@@ -3,5 +3,7 @@ Utilitários para o módulo Trello
 """
 
 from .formatters import formatar_veiculos, formatar_pessoas
+from .sessao_http import criar_sessao, get_sessao
+from .vin import decodificar_vins
 
-__all__ = ['formatar_veiculos', 'formatar_pessoas']
\ No newline at end of file
+__all__ = ['formatar_veiculos', 'formatar_pessoas', 'criar_sessao', 'get_sessao', 'decodificar_vins']
\ No newline at end of file
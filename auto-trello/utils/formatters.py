@@ -4,6 +4,10 @@ Formatadores de dados para o Trello
 
 import json
 
+import requests
+
+from .vin import _texto_vin, decodificar_vins
+
 def formatar_veiculos(veiculos):
     """
     Formata lista de veículos para descrição do Trello
@@ -32,28 +36,30 @@ def formatar_veiculos(veiculos):
     
     descricao = "\n" + "="*50 + "\nVEÍCULOS:\n" + "="*50 + "\n"
     
+    # Decodificar todos os VINs de uma vez (um lote, com cache) em vez de um por veículo
+    try:
+        decodificados = decodificar_vins([v.get('vin') for v in veiculos_lista])
+    except (requests.exceptions.RequestException, ValueError):
+        # Backend/NHTSA indisponível: usa os dados do próprio veículo
+        decodificados = {}
+    
     for idx, veiculo in enumerate(veiculos_lista, 1):
         vin = veiculo.get('vin', '-')
         financiado = veiculo.get('financiado', '-')
         tempo = veiculo.get('tempo_com_veiculo', '-')
         placa = veiculo.get('placa', '-')
         
-        # Tentar obter informações do veículo pelo VIN
+        # Informações do veículo pelo VIN ou, se não decodificado, do próprio veículo
         marca_modelo_ano = '-'
-        if vin and vin != '-':
-            try:
-                # Importar função de lookup do VIN se disponível
-                from data_funcoes import veiculo_vin
-                marca_modelo_ano = veiculo_vin(vin)
-            except ImportError:
-                # Se não tiver a função, usar dados do próprio veículo
-                ano = veiculo.get('ano', '')
-                marca = veiculo.get('marca', '')
-                modelo = veiculo.get('modelo', '')
-                if ano or marca or modelo:
-                    marca_modelo_ano = f"{ano} {marca} {modelo}".strip()
-            except Exception:
-                marca_modelo_ano = '-'
+        info = decodificados.get(_texto_vin(vin))
+        if info:
+            marca_modelo_ano = f"{info['make']}, {info['model']}, {info['year']}"
+        else:
+            ano = veiculo.get('ano', '')
+            marca = veiculo.get('marca', '')
+            modelo = veiculo.get('modelo', '')
+            if ano or marca or modelo:
+                marca_modelo_ano = f"{ano} {marca} {modelo}".strip()
         
         descricao += (
             f"\n🚗 Veículo {idx}:\n"
@@ -0,0 +1,186 @@
+"""
+Limitador de requisições do Trello (token bucket por API key e por token)
+
+Mesmo algoritmo do backend (auto-rta/backend/app/util/limite_trello.py, que
+publica métricas no lugar dos contadores); o módulo é independente, então não
+importa o backend: alterações no algoritmo valem para os dois arquivos. O
+estado fica em arquivos com flock, então vários processos que usam o mesmo
+diretório (TRELLO_RATE_DIR) dividem o mesmo limite.
+"""
+
+import contextlib
+import hashlib
+import os
+import random
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: o bucket vale só para o processo atual
+    fcntl = None
+
+# Estado de cada bucket no arquivo: tokens, último reabastecimento, pausado até
+_ESTADO = struct.Struct('ddd')
+
+
+class LimiteExcedido(requests.exceptions.RequestException):
+    """A espera pelo limite do Trello passaria de max_espera: a chamada não é feita"""
+
+    def __init__(self, espera):
+        super().__init__(f'Limite de requisições do Trello: tente novamente em {espera:.0f}s')
+        self.retry_after = espera
+
+
+class TokenBucket:
+    """
+    Token bucket com o estado num arquivo (flock), compartilhado por todos os
+    processos (workers do gunicorn) que usam o mesmo diretório.
+
+    Os limites do Trello valem numa janela deslizante: com rajada `burst` e
+    reabastecimento de (limite - burst) / janela por segundo, nenhuma janela
+    passa do limite. Reservas deixam o saldo negativo: quem chega depois
+    espera a sua vez (fila implícita, em ordem de chegada).
+    """
+
+    def __init__(self, path, limite, janela, burst):
+        self.path = path
+        self.capacidade = max(1.0, float(min(burst, limite)))
+        self.taxa = max(limite - self.capacidade, 1.0) / janela
+        # O flock (um open por chamada) já exclui threads do mesmo processo
+        self._lock = threading.Lock() if fcntl is None else contextlib.nullcontext()
+
+    def _alterar(self, funcao):
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                dados = os.pread(fd, _ESTADO.size, 0)
+                agora = time.time()
+                if len(dados) == _ESTADO.size:
+                    tokens, atualizado, pausado_ate = _ESTADO.unpack(dados)
+                    tokens = min(self.capacidade, tokens + max(0.0, agora - atualizado) * self.taxa)
+                else:
+                    tokens, pausado_ate = self.capacidade, 0.0
+                tokens, pausado_ate, resultado = funcao(tokens, pausado_ate, agora)
+                os.pwrite(fd, _ESTADO.pack(tokens, agora, pausado_ate), 0)
+                return resultado
+            finally:
+                os.close(fd)
+
+    def reservar(self, max_espera):
+        """
+        Consome um token se a espera couber em max_espera
+        :return: (reservado, segundos de espera)
+        """
+        def funcao(tokens, pausado_ate, agora):
+            espera = max(0.0, (1 - tokens) / self.taxa, pausado_ate - agora)
+            if espera > max_espera:
+                return tokens, pausado_ate, (False, espera)
+            return tokens - 1, pausado_ate, (True, espera)
+        return self._alterar(funcao)
+
+    def devolver(self):
+        """Devolve um token reservado por uma chamada que não vai acontecer"""
+        self._alterar(lambda tokens, pausado_ate, agora: (tokens + 1, pausado_ate, None))
+
+    def pausar(self, segundos):
+        """429 recebido: ninguém chama o Trello (em nenhum processo) pelos próximos `segundos`"""
+        def funcao(tokens, pausado_ate, agora):
+            return min(tokens, 0.0), max(pausado_ate, agora + segundos), None
+        self._alterar(funcao)
+
+    def disponivel(self):
+        """Tokens disponíveis agora (negativo = reservas na fila)"""
+        return self._alterar(lambda tokens, pausado_ate, agora: (tokens, pausado_ate, tokens))
+
+
+class LimitadorTrello:
+    """
+    Limites do Trello por API key e por token (um bucket para cada, pelo hash
+    da credencial). Toda chamada passa por aguardar(); um 429 pausa os dois
+    buckets pelo Retry-After (ou pelo backoff) em todos os processos.
+    """
+
+    def __init__(self, directory, limite_key=300, limite_token=100, janela=10.0, burst=10,
+                 max_espera=30.0, retries=3, backoff=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.limites = {'key': limite_key, 'token': limite_token}
+        self.janela = janela
+        self.burst = burst
+        self.max_espera = max_espera
+        self.retries = retries
+        self.backoff = backoff
+        self._buckets = {}
+        # Chamadas aguardando a vez neste processo e 429 recebidos (várias threads)
+        self._lock = threading.Lock()
+        self.fila = 0
+        self.limitadas = 0
+
+    def _bucket(self, nome):
+        bucket = self._buckets.get(nome)
+        if bucket is None:
+            tipo = nome.split('-', 1)[0]
+            bucket = self._buckets.setdefault(nome, TokenBucket(
+                os.path.join(self.directory, nome), self.limites[tipo], self.janela, self.burst))
+        return bucket
+
+    def _buckets_da_url(self, url):
+        # Arquivos nomeados pelo hash: a credencial não aparece no disco
+        params = parse_qs(urlsplit(url).query)
+        return [self._bucket(f'{tipo}-{hashlib.sha256(params[tipo][0].encode()).hexdigest()[:16]}')
+                for tipo in ('key', 'token') if params.get(tipo)]
+
+    def aguardar(self, url):
+        """Reserva a vez da chamada e dorme até ela; LimiteExcedido se a espera passaria de max_espera"""
+        buckets = self._buckets_da_url(url)
+        esperas = []
+        for i, bucket in enumerate(buckets):
+            reservado, espera = bucket.reservar(self.max_espera)
+            if not reservado:
+                for anterior in buckets[:i]:
+                    anterior.devolver()
+                raise LimiteExcedido(espera)
+            esperas.append(espera)
+        espera = max(esperas, default=0.0)
+        if espera > 0:
+            with self._lock:
+                self.fila += 1
+            try:
+                time.sleep(espera)
+            finally:
+                with self._lock:
+                    self.fila -= 1
+
+    def limitado(self, url, resposta, tentativa):
+        """Registra um 429 e pausa os buckets; retorna a pausa aplicada (segundos)"""
+        try:
+            pausa = float(resposta.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            pausa = self.backoff * 2 ** tentativa
+        # Jitter: processos que receberam 429 juntos não voltam todos no mesmo instante
+        pausa *= random.uniform(1.0, 1.5)
+        with self._lock:
+            self.limitadas += 1
+        for bucket in self._buckets_da_url(url):
+            bucket.pausar(pausa)
+        return pausa
+
+    def estado(self):
+        """
+        Saldo atual de cada bucket, chamadas na fila e 429 recebidos
+
+        Returns:
+            dict: {'buckets': {nome: tokens}, 'fila': int, 'limitadas': int}
+        """
+        buckets = {}
+        for nome in sorted(os.listdir(self.directory)):
+            if nome.split('-', 1)[0] in self.limites:
+                buckets[nome] = round(self._bucket(nome).disponivel(), 2)
+        return {'buckets': buckets, 'fila': self.fila, 'limitadas': self.limitadas}
@@ -0,0 +1,169 @@
+"""
+Sessão HTTP compartilhada para a API do Trello
+
+Uma requests.Session por processo, com pool de conexões keep-alive e retries,
+em vez de um handshake TCP+TLS novo a cada card e a cada anexo.
+Ajuste por variáveis de ambiente: TRELLO_POOL_MAXSIZE, TRELLO_RETRIES,
+TRELLO_RETRY_BACKOFF e TRELLO_KEEPALIVE_IDLE; limites do Trello com
+TRELLO_RATE_LIMIT, TRELLO_RATE_DIR, TRELLO_RATE_LIMIT_KEY, TRELLO_RATE_LIMIT_TOKEN,
+TRELLO_RATE_WINDOW, TRELLO_RATE_BURST e TRELLO_RATE_MAX_WAIT.
+
+O backend tem a sua versão (auto-rta/backend/app/util/sessao_http.py,
+configurada pelo app.config); este módulo é independente e não a importa.
+"""
+
+from http.cookiejar import DefaultCookiePolicy
+import os
+import socket
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .limite import LimitadorTrello
+
+# POST (criar card, anexo) só é repetido quando a conexão nem chegou a ser aberta
+_METODOS_IDEMPOTENTES = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+_STATUS_REPETIR = (502, 503, 504)
+
+
+def _opcoes_keepalive(idle):
+    opcoes = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if idle:
+        for nome, valor in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', max(1, idle // 4)), ('TCP_KEEPCNT', 4)):
+            if hasattr(socket, nome):
+                opcoes.append((socket.IPPROTO_TCP, getattr(socket, nome), valor))
+    return opcoes
+
+
+class SessaoTrello(requests.Session):
+    """
+    Session que passa cada chamada pelo limitador de requisições do Trello.
+    Um 429 pausa o limitador pelo Retry-After; chamadas idempotentes são
+    repetidas (até limitador.retries vezes), as demais devolvem o 429.
+    """
+
+    limitador = None
+
+    def send(self, request, **kwargs):
+        if self.limitador is None:
+            return super().send(request, **kwargs)
+        tentativa = 0
+        while True:
+            self.limitador.aguardar(request.url)
+            resposta = super().send(request, **kwargs)
+            if resposta.status_code != 429:
+                return resposta
+            pausa = self.limitador.limitado(request.url, resposta, tentativa)
+            if (request.method not in _METODOS_IDEMPOTENTES or tentativa >= self.limitador.retries
+                    or pausa > self.limitador.max_espera):
+                return resposta
+            resposta.close()
+            tentativa += 1
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    def __init__(self, socket_options, **kwargs):
+        self._socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self._socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def criar_sessao(pool_maxsize=10, retries=3, backoff=0.3, keepalive_idle=60, limitador=None):
+    """
+    Cria uma Session com pool keep-alive e retries
+
+    Args:
+        pool_maxsize (int): Conexões mantidas abertas por host
+        retries (int): Tentativas em falha de conexão e em 502/503/504
+        backoff (float): Fator do backoff exponencial entre tentativas
+        keepalive_idle (int): Segundos ociosos até o TCP keep-alive (0 = padrão do sistema)
+        limitador (LimitadorTrello, optional): Token bucket dos limites do Trello
+
+    Returns:
+        requests.Session: Sessão sem cookies (nenhum estado mutável além do pool,
+        que é thread-safe)
+    """
+    opcoes = dict(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=_STATUS_REPETIR,
+        allowed_methods=_METODOS_IDEMPOTENTES,
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(backoff_jitter=backoff, **opcoes)
+    except TypeError:  # urllib3 1.x: backoff sem jitter
+        retry = Retry(**opcoes)
+    adapter = _KeepAliveAdapter(
+        _opcoes_keepalive(keepalive_idle),
+        pool_connections=4,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+    )
+    sessao = SessaoTrello()
+    sessao.limitador = limitador
+    sessao.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    sessao.mount('https://', adapter)
+    sessao.mount('http://', adapter)
+    return sessao
+
+
+_sessao = None
+_sessao_pid = None
+_sessao_lock = threading.Lock()
+
+
+def _apos_fork():
+    # O filho não reutiliza sockets (nem sessões TLS) herdados do processo pai
+    global _sessao, _sessao_pid, _sessao_lock
+    _sessao = None
+    _sessao_pid = None
+    _sessao_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_apos_fork)
+
+
+def get_sessao():
+    """
+    Retorna a sessão compartilhada do processo (criada no primeiro uso)
+
+    Returns:
+        requests.Session: Sessão configurada pelas variáveis de ambiente
+    """
+    global _sessao, _sessao_pid
+    pid = os.getpid()
+    if _sessao is None or _sessao_pid != pid:
+        with _sessao_lock:
+            if _sessao is None or _sessao_pid != pid:
+                limitador = None
+                if os.getenv('TRELLO_RATE_LIMIT', 'True').lower() in ['true', '1', 'yes']:
+                    limitador = LimitadorTrello(
+                        os.getenv('TRELLO_RATE_DIR') or os.path.join(tempfile.gettempdir(), 'auto-trello-rate'),
+                        limite_key=int(os.getenv('TRELLO_RATE_LIMIT_KEY', '300')),
+                        limite_token=int(os.getenv('TRELLO_RATE_LIMIT_TOKEN', '100')),
+                        janela=float(os.getenv('TRELLO_RATE_WINDOW', '10')),
+                        burst=int(os.getenv('TRELLO_RATE_BURST', '10')),
+                        max_espera=float(os.getenv('TRELLO_RATE_MAX_WAIT', '30')),
+                        retries=int(os.getenv('TRELLO_RETRIES', '3')),
+                        backoff=float(os.getenv('TRELLO_RETRY_BACKOFF', '0.3')),
+                    )
+                _sessao = criar_sessao(
+                    pool_maxsize=int(os.getenv('TRELLO_POOL_MAXSIZE', '10')),
+                    retries=int(os.getenv('TRELLO_RETRIES', '3')),
+                    backoff=float(os.getenv('TRELLO_RETRY_BACKOFF', '0.3')),
+                    keepalive_idle=int(os.getenv('TRELLO_KEEPALIVE_IDLE', '60')),
+                    limitador=limitador,
+                )
+                _sessao_pid = pid
+    return _sessao
@@ -0,0 +1,98 @@
+"""
+Decodificação de VINs em lote
+
+Com AUTO_RTA_API_URL (ex.: http://localhost:5000/api) os VINs vão para o
+/api/vin/batch do backend, que mantém o cache em memória e em disco; sem ele,
+vão direto ao DecodeVINValuesBatch do NHTSA (NHTSA_API_BASE), em lotes de 50.
+Em ambos os casos o resultado fica num cache em memória do processo.
+"""
+
+from collections import OrderedDict
+import os
+import threading
+
+import requests
+
+_LOTE_NHTSA = 50
+_CACHE_MAX = 1024
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_sessao = requests.Session()
+
+
+def _pelo_backend(api_url, vins):
+    resp = _sessao.post(f"{api_url.rstrip('/')}/vin/batch", json={'vins': vins}, timeout=60)
+    resp.raise_for_status()
+    return {r['vin']: r for r in resp.json().get('results', []) if r.get('ok')}
+
+
+def _pelo_nhtsa(vins):
+    base = os.getenv('NHTSA_API_BASE', 'https://vpic.nhtsa.dot.gov/api/vehicles').rstrip('/')
+    resultado = {}
+    for i in range(0, len(vins), _LOTE_NHTSA):
+        lote = vins[i:i + _LOTE_NHTSA]
+        resp = _sessao.post(f'{base}/DecodeVINValuesBatch/', data={'format': 'json', 'data': ';'.join(lote)},
+                            timeout=30)
+        resp.raise_for_status()
+        for row in resp.json().get('Results') or []:
+            make = (row.get('Make') or '').strip()
+            model = (row.get('Model') or '').strip()
+            year = (row.get('ModelYear') or '').strip()
+            if make and model and year:
+                resultado[(row.get('VIN') or '').upper()] = {'make': make, 'model': model, 'year': year}
+    return resultado
+
+
+def _texto_vin(valor):
+    """
+    VIN como texto maiúsculo; números (JSON, planilhas) viram dígitos, inclusive
+    floats inteiros como 12345678901.0. Floats com fração, listas, objetos e
+    booleanos não são VINs: None
+    """
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, float):
+        if not valor.is_integer():
+            return None
+        valor = int(valor)
+    if isinstance(valor, (str, int)):
+        return str(valor).strip().upper()
+    return None
+
+
+def decodificar_vins(vins):
+    """
+    Decodifica vários VINs com uma chamada por lote (não uma por VIN)
+
+    Args:
+        vins (list): VINs a decodificar (vazios, '-' e valores que não são texto nem número inteiro são ignorados)
+
+    Returns:
+        dict: VIN (maiúsculo) -> {'make', 'model', 'year', ...}; VINs não
+        decodificados ficam de fora
+
+    Raises:
+        requests.exceptions.RequestException: Falha ao consultar o backend/NHTSA
+        ValueError: Resposta que não é JSON
+    """
+    vins = [vin for vin in map(_texto_vin, vins) if vin and vin != '-']
+    resultado = {}
+    with _cache_lock:
+        for vin in vins:
+            if vin in _cache:
+                _cache.move_to_end(vin)
+                resultado[vin] = _cache[vin]
+    faltas = [vin for vin in dict.fromkeys(vins) if vin not in resultado]
+    if not faltas:
+        return resultado
+
+    api_url = os.getenv('AUTO_RTA_API_URL')
+    novos = _pelo_backend(api_url, faltas) if api_url else _pelo_nhtsa(faltas)
+    with _cache_lock:
+        for vin, info in novos.items():
+            _cache[vin] = info
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    resultado.update(novos)
+    return resultado
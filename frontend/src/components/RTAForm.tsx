@@ -135,6 +135,9 @@ export const RTAForm: React.FC = () => {
           if (info.year) setValue('year', Number(info.year));
           if (info.make) setValue('make', info.make);
           if (info.model) setValue('model', info.model);
+          if (info.bodyStyle && bodyStyles.includes(info.bodyStyle)) setValue('body_style', info.bodyStyle);
+          if (info.cylinders) setValue('cylinders', info.cylinders);
+          if (info.doors) setValue('doors', info.doors);
         }
       }
     };
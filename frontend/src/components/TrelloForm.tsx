@@ -112,6 +112,25 @@ export const TrelloForm: React.FC = () => {
     setPreviews(urls);
   };
 
+  const attachmentsMessage = (json: any, hasImages: boolean) => {
+    if (!hasImages) return '';
+    const attOk = (json.attachments || []).length || 0;
+    const attErr = (json.attachment_errors || []).length || 0;
+    return ` (anexos OK: ${attOk}${attErr ? `, erros: ${attErr}` : ''})`;
+  };
+
+  // Consulta a caixa de saída até a entrega terminar (ou desiste após ~30s)
+  const waitForDelivery = async (outboxId: string) => {
+    for (let i = 0; i < 15; i++) {
+      await new Promise((r) => setTimeout(r, 2000));
+      const resp = await fetch(`${API_BASE_URL}/trello/outbox/${outboxId}`).catch(() => null);
+      if (!resp || !resp.ok) continue;
+      const status = await resp.json().catch(() => null);
+      if (status && (status.status === 'delivered' || status.status === 'failed')) return status;
+    }
+    return null;
+  };
+
   const onSubmit = async (data: TrelloFormData) => {
     setResult(null);
 
@@ -136,11 +155,21 @@ export const TrelloForm: React.FC = () => {
         setResult(`Erro: ${err.error || resp.statusText}`);
       } else {
         const json = await resp.json().catch(() => null);
-        if (json && json.card_id) {
-          const attOk = (json.attachments || []).length || 0;
-          const attErr = (json.attachment_errors || []).length || 0;
-          const attMsg = hasImages ? ` (anexos OK: ${attOk}${attErr ? `, erros: ${attErr}` : ''})` : '';
-          setResult(`Card criado com ID: ${json.card_id}${attMsg}`);
+        if (resp.status === 202 && json && json.outbox_id) {
+          // Aceito pela caixa de saída: acompanha a entrega ao Trello
+          reset();
+          setImages([]);
+          setResult(`Recebido, enviando ao Trello... (acompanhamento: ${json.outbox_id})`);
+          const status = await waitForDelivery(json.outbox_id);
+          if (status && status.status === 'delivered') {
+            setResult(`Card criado com ID: ${status.card_id}${attachmentsMessage(status, hasImages)}`);
+          } else if (status && status.status === 'failed') {
+            setResult(`Erro: ${status.error || 'Falha ao criar card no Trello'}`);
+          } else {
+            setResult(`Recebido (acompanhamento: ${json.outbox_id}); o card será criado assim que o Trello responder`);
+          }
+        } else if (json && json.card_id) {
+          setResult(`Card criado com ID: ${json.card_id}${attachmentsMessage(json, hasImages)}`);
           reset();
           setImages([]);
         } else {
@@ -1,30 +1,56 @@
+const API_BASE_URL = import.meta.env.PROD ? '/api' : 'http://localhost:5000/api';
+
 export type VinInfo = {
   make?: string;
   model?: string;
   year?: string;
+  bodyStyle?: string;
+  bodyClass?: string;
+  cylinders?: number;
+  doors?: number;
 };
 
+// Results (and in-flight lookups) per VIN, so keystrokes don't repeat the request
+const cache = new Map<string, Promise<VinInfo | null | undefined>>();
+
 /**
- * Decode a VIN using the NHTSA VPIC API.
- * Returns make, model and model year when available.
+ * Decode a VIN through the backend (/api/vin), which caches NHTSA VPIC results
+ * and batches lookups. Returns make, model, model year, body style,
+ * cylinders and doors when available.
  */
-export async function decodeVin(vin: string): Promise<VinInfo | null> {
+export function decodeVin(vin: string): Promise<VinInfo | null> {
   const clean = (vin || '').trim().toUpperCase();
-  if (clean.length < 11) return null;
-  const url = `https://vpic.nhtsa.dot.gov/api/vehicles/decodevinvalues/${encodeURIComponent(clean)}?format=json`;
+  if (clean.length < 11) return Promise.resolve(null);
+  let pending = cache.get(clean);
+  if (!pending) {
+    pending = fetchVin(clean);
+    cache.set(clean, pending);
+    // Transient failures are not cached: the next call tries again
+    pending.then((info) => { if (info === undefined) cache.delete(clean); });
+  }
+  return pending.then((info) => info ?? null);
+}
+
+// null: unknown/invalid VIN; undefined: transient failure (network, 5xx)
+async function fetchVin(vin: string): Promise<VinInfo | null | undefined> {
   try {
-    const resp = await fetch(url, { headers: { 'Accept': 'application/json' } });
-    if (!resp.ok) return null;
+    const resp = await fetch(`${API_BASE_URL}/vin/${encodeURIComponent(vin)}`, {
+      headers: { 'Accept': 'application/json' }
+    });
+    if (resp.status === 404 || resp.status === 400) return null;
+    if (!resp.ok) return undefined;
     const data = await resp.json();
-    const row = data?.Results?.[0] || {};
-    const info: VinInfo = {
-      make: row?.Make || '',
-      model: row?.Model || '',
-      year: row?.ModelYear || row?.Model_Year || ''
+    return {
+      make: data?.make || '',
+      model: data?.model || '',
+      year: data?.year || '',
+      bodyStyle: data?.body_style || undefined,
+      bodyClass: data?.body_class || undefined,
+      cylinders: data?.cylinders ?? undefined,
+      doors: data?.doors ?? undefined
     };
-    return info;
   } catch (_e) {
-    return null;
+    return undefined;
   }
 }
 